@@ -0,0 +1,227 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Tuple
+from sqlalchemy import select, delete, update, or_, and_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.local_file_service import local_file_service
+from app.models.user import User
+from app.models.song import Song
+from app.models.album import Album
+from app.models.comment import Comment
+from app.models.lyrics import Lyrics
+from app.models.lyrics_posting import LyricsPosting
+from app.models.liked_song import LikedSong
+from app.models.play_event import PlayEvent
+from app.models.playlist import Playlist, PlaylistSong
+from app.models.artist_profile import ArtistProfile
+from app.models.deletion_job import DeletionJob, DeletionJobStatus
+from app.models.search_document import SearchDocument
+from app.models.stat_rollup import StatRollup
+from app.models.listener_sketch import ListenerSketch
+from app.search.cache import bump_catalog_version
+from app.search.suggest import suggest_service
+from app.response_cache import invalidate_cache
+
+logger = logging.getLogger(__name__)
+
+
+class DeletionStep:
+    """
+    Rows of one table that belong to the user being deleted, removed in bounded batches.
+    `file_column` names a column holding a media path to delete alongside each row.
+    `key` is the column batches are chosen by (the primary key unless given); with a
+    non-unique key a batch covers up to batch_size distinct values.
+    `catalog_kind` marks steps deleting public catalog entries (song, album or artist),
+    which must also leave the response cache and typeahead suggestions.
+    `anonymize` names a nullable user column to clear instead of deleting the rows.
+    """
+
+    def __init__(self, name: str, model, condition: Callable[[int], object], file_column=None, key=None,
+                 catalog_kind=None, anonymize=None):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.file_column = file_column
+        self.key = key if key is not None else model.id
+        self.catalog_kind = catalog_kind
+        self.anonymize = anonymize
+
+    def delete_batch(self, db: Session, user_id: int, batch_size: int) -> Tuple[List[int], int, int]:
+        """Delete (or anonymize) up to batch_size rows; returns (keys, rows affected, files deleted)"""
+        columns = [self.key] if self.file_column is None else [self.key, self.file_column]
+        rows = db.execute(
+            select(*columns).distinct().where(self.condition(user_id)).order_by(self.key).limit(batch_size)
+        ).all()
+        if not rows:
+            return [], 0, 0
+
+        # Media goes first: if we stop half-way, a resumed job still finds the rows
+        files_deleted = 0
+        if self.file_column is not None:
+            for _, file_path in rows:
+                if file_path and local_file_service.delete_file(file_path):
+                    files_deleted += 1
+
+        keys = [row[0] for row in rows]
+        if self.anonymize is not None:
+            result = db.execute(update(self.model).where(self.key.in_(keys)).values({self.anonymize: None}))
+        else:
+            result = db.execute(delete(self.model).where(self.key.in_(keys)))
+        return keys, result.rowcount, files_deleted
+
+
+def _songs_of(user_id: int):
+    return select(Song.id).where(Song.artist_id == user_id)
+
+
+def _playlists_of(user_id: int):
+    return select(Playlist.id).where(Playlist.owner_id == user_id)
+
+
+# Children before parents so no step violates a foreign key
+DELETION_STEPS: List[DeletionStep] = [
+    DeletionStep("likes", LikedSong, lambda user_id: LikedSong.user_id == user_id),
+    DeletionStep("likes_of_songs", LikedSong, lambda user_id: LikedSong.song_id.in_(_songs_of(user_id))),
+    # A listener's streams stay in other artists' rollups, earnings and play counts, as anonymous plays
+    DeletionStep("plays", PlayEvent, lambda user_id: PlayEvent.user_id == user_id, anonymize=PlayEvent.user_id),
+    DeletionStep("plays_of_songs", PlayEvent, lambda user_id: PlayEvent.song_id.in_(_songs_of(user_id))),
+    DeletionStep("playlist_entries", PlaylistSong, lambda user_id: PlaylistSong.playlist_id.in_(_playlists_of(user_id))),
+    DeletionStep("playlist_entries_of_songs", PlaylistSong, lambda user_id: PlaylistSong.song_id.in_(_songs_of(user_id))),
+    DeletionStep("comments", Comment, lambda user_id: Comment.user_id == user_id),
+    DeletionStep("comments_on_songs", Comment, lambda user_id: Comment.song_id.in_(_songs_of(user_id))),
+    DeletionStep(
+        "lyrics_postings", LyricsPosting, lambda user_id: LyricsPosting.song_id.in_(_songs_of(user_id)),
+        key=LyricsPosting.song_id
+    ),
+    DeletionStep("lyrics", Lyrics, lambda user_id: Lyrics.song_id.in_(_songs_of(user_id))),
+    DeletionStep("search_documents", SearchDocument, lambda user_id: or_(
+        and_(SearchDocument.entity_type == "artist", SearchDocument.entity_id == user_id),
+        and_(SearchDocument.entity_type == "song", SearchDocument.entity_id.in_(_songs_of(user_id))),
+        and_(SearchDocument.entity_type == "playlist", SearchDocument.entity_id.in_(_playlists_of(user_id)))
+    )),
+    DeletionStep("stat_rollups", StatRollup, lambda user_id: or_(
+        and_(StatRollup.entity_type == "artist", StatRollup.entity_id == user_id),
+        and_(StatRollup.entity_type == "song", StatRollup.entity_id.in_(_songs_of(user_id)))
+    )),
+    DeletionStep("listener_sketches", ListenerSketch, lambda user_id: or_(
+        and_(ListenerSketch.entity_type == "artist", ListenerSketch.entity_id == user_id),
+        and_(ListenerSketch.entity_type == "song", ListenerSketch.entity_id.in_(_songs_of(user_id)))
+    )),
+    DeletionStep("playlists", Playlist, lambda user_id: Playlist.owner_id == user_id),
+    DeletionStep(
+        "songs", Song, lambda user_id: Song.artist_id == user_id, file_column=Song.file_url, catalog_kind="song"
+    ),
+    DeletionStep("albums", Album, lambda user_id: Album.artist_id == user_id, catalog_kind="album"),
+    DeletionStep("artist_profile", ArtistProfile, lambda user_id: ArtistProfile.user_id == user_id),
+    DeletionStep("user", User, lambda user_id: User.id == user_id, catalog_kind="artist"),
+]
+
+# Response cache tags of a deleted catalog entry: the listing it appeared in, and its own prefix
+_CACHE_TAGS = {"song": ("songs", "song"), "album": ("albums", "album"), "artist": ("artists", "user")}
+
+
+def _lease_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.deletion_job_lease_seconds)
+
+
+def _claim_job(db: Session, job_id: int) -> bool:
+    """Atomically mark a job as running; fails if another worker holds a live lease on it"""
+    result = db.execute(
+        update(DeletionJob).where(
+            DeletionJob.id == job_id,
+            DeletionJob.status != DeletionJobStatus.COMPLETED,
+            DeletionJob.attempts < settings.deletion_job_max_attempts,
+            or_(DeletionJob.status == DeletionJobStatus.PENDING, DeletionJob.updated_at < _lease_cutoff())
+        ).values(
+            status=DeletionJobStatus.RUNNING,
+            attempts=DeletionJob.attempts + 1,
+            updated_at=datetime.now(timezone.utc)
+        )
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def run_deletion_job(job_id: int, bind=None):
+    """
+    Delete everything owned by the job's user, one committed batch at a time.
+    Progress is stored with every batch, so an interrupted job resumes at its current step.
+    """
+    db = Session(bind=bind) if bind is not None else SessionLocal()
+    try:
+        if not _claim_job(db, job_id):
+            return
+        job = db.get(DeletionJob, job_id)
+        batch_size = settings.deletion_batch_size
+
+        step_names = [step.name for step in DELETION_STEPS]
+        start = step_names.index(job.current_step) if job.current_step in step_names else 0
+
+        for step in DELETION_STEPS[start:]:
+            job.current_step = step.name
+            while True:
+                keys, rows_deleted, files_deleted = step.delete_batch(db, job.user_id, batch_size)
+                if rows_deleted:
+                    # Core deletes skip the ORM hooks that invalidate cached search results,
+                    # cached responses and typeahead suggestions
+                    bump_catalog_version(db)
+                    if step.catalog_kind is not None:
+                        listing, prefix = _CACHE_TAGS[step.catalog_kind]
+                        invalidate_cache(db, listing, *(f"{prefix}:{key}" for key in keys))
+                job.rows_deleted += rows_deleted
+                job.files_deleted += files_deleted
+                job.updated_at = datetime.now(timezone.utc)  # Renews the lease
+                db.commit()
+                if rows_deleted and step.catalog_kind is not None:
+                    suggest_service.mark_stale(step.catalog_kind, keys)
+                if rows_deleted < batch_size:
+                    break
+
+        job.status = DeletionJobStatus.COMPLETED
+        job.completed_at = datetime.now(timezone.utc)
+        job.error = None
+        db.commit()
+        logger.info(f"Deletion job {job_id} completed: {job.rows_deleted} rows, {job.files_deleted} files")
+
+    except Exception as e:
+        logger.error(f"Deletion job {job_id} failed: {e}")
+        db.rollback()
+        job = db.get(DeletionJob, job_id)
+        if job is not None:
+            job.status = DeletionJobStatus.FAILED
+            job.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+def process_pending_deletion_jobs(bind=None):
+    """Run every job that is pending, or whose worker stopped renewing its lease"""
+    db = Session(bind=bind) if bind is not None else SessionLocal()
+    try:
+        job_ids = [
+            job_id for (job_id,) in db.query(DeletionJob.id).filter(
+                DeletionJob.status != DeletionJobStatus.COMPLETED,
+                DeletionJob.attempts < settings.deletion_job_max_attempts,
+                or_(DeletionJob.status == DeletionJobStatus.PENDING, DeletionJob.updated_at < _lease_cutoff())
+            ).order_by(DeletionJob.id)
+        ]
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        run_deletion_job(job_id, bind)
+
+
+def schedule_account_deletion(db: Session, user: User) -> DeletionJob:
+    """Tombstone the user immediately and queue the cleanup of everything they own"""
+    user.deleted_at = datetime.now(timezone.utc)
+    user.is_active = False
+    job = DeletionJob(user_id=user.id, status=DeletionJobStatus.PENDING)
+    db.add(job)
+    invalidate_cache(db, f"user:{user.id}", "artists")
+    db.commit()
+    db.refresh(job)
+    return job
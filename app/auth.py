@@ -12,6 +12,7 @@ from app.schemas.auth import TokenData
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -52,7 +53,7 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 def get_current_user(db: Session = Depends(get_db), token_data: TokenData = Depends(verify_token)):
     user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
+    if user is None or user.deleted_at is not None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
@@ -61,6 +62,24 @@ def get_current_user(db: Session = Depends(get_db), token_data: TokenData = Depe
     return user
 
 
+def get_optional_user(
+    db: Session = Depends(get_db),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[User]:
+    """The signed-in user, or None for anonymous requests and invalid tokens"""
+    if credentials is None:
+        return None
+    try:
+        payload = jwt.decode(credentials.credentials, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    user = db.query(User).filter(User.username == username).first()
+    return user if user is not None and user.deleted_at is None else None
+
+
 def require_role(required_roles: list):
     def role_checker(current_user: User = Depends(get_current_user)):
         if current_user.role.value not in required_roles:
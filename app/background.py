@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """A blocking function run every `interval` seconds on a worker thread"""
+
+    def __init__(self, name: str, func: Callable[[], None], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+
+
+class BackgroundScheduler:
+    """Runs periodic maintenance work for the lifetime of the application"""
+
+    def __init__(self):
+        self.tasks: List[PeriodicTask] = []
+        self._running: List[asyncio.Task] = []
+
+    def add(self, name: str, func: Callable[[], None], interval: float):
+        self.tasks.append(PeriodicTask(name, func, interval))
+
+    async def start(self):
+        for task in self.tasks:
+            self._running.append(asyncio.create_task(self._run(task), name=f"periodic:{task.name}"))
+        logger.info(f"Started {len(self.tasks)} background tasks")
+
+    async def stop(self):
+        for running in self._running:
+            running.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._running.clear()
+        self.tasks.clear()
+
+    async def _run(self, task: PeriodicTask):
+        while True:
+            try:
+                # Blocking DB/file work stays off the event loop
+                await asyncio.to_thread(task.func)
+            except Exception as e:
+                logger.error(f"Background task '{task.name}' failed: {e}", exc_info=True)
+            await asyncio.sleep(task.interval)
+
+
+scheduler = BackgroundScheduler()
@@ -0,0 +1,24 @@
+from typing import List
+from fastapi import HTTPException, Query, status
+from app.schemas.batch import MAX_BATCH_SIZE
+
+
+def batch_ids(
+    ids: str = Query(..., description=f"Comma-separated IDs (at most {MAX_BATCH_SIZE})")
+) -> List[int]:
+    """Parse ?ids=1,2,3 into a de-duplicated list of IDs, keeping request order"""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma-separated list of integers"
+        )
+    
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Provide between 1 and {MAX_BATCH_SIZE} ids"
+        )
+    return parsed
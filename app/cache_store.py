@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """
+    LRU of encoded values bounded by their total size in bytes, private to this worker.
+    `on_remove` is called with each key that leaves the cache other than through delete(),
+    so an index kept beside the cache can follow evictions and expiries. It runs after the
+    cache's lock is released, so it may take locks of its own.
+    """
+    name = "memory"
+
+    def __init__(self, max_bytes: int, evictions: Optional[Counter] = None,
+                 on_remove: Optional[Callable[[str], None]] = None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = evictions
+        self.on_remove = on_remove
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._removed: List[str] = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            self._remove(key)
+        self._notify()
+        return None
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl: int):
+        cost = len(key) + len(value)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self.size += cost
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                if self.evictions is not None:
+                    self.evictions.inc()
+        self._notify()
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key, notify=False)
+
+    def _remove(self, key: str, notify: bool = True):
+        value, _ = self._entries.pop(key)
+        self.size -= len(key) + len(value)
+        if notify and self.on_remove is not None:
+            self._removed.append(key)
+
+    def _notify(self):
+        if not self._removed:
+            return
+        with self._lock:
+            removed, self._removed = self._removed, []
+        for key in removed:
+            self.on_remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._removed = []
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class RedisCache:
+    """
+    Shared by every worker. Entries expire with their TTL; Redis' own maxmemory policy
+    bounds the total size. Errors are logged and treated as misses, never raised.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, password: Optional[str] = None, label: str = "Cache"):
+        import redis  # Optional dependency, only needed when a cache backend is "redis"
+        self._client = redis.Redis.from_url(url, password=password, socket_timeout=0.25)
+        self.label = label
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(key)
+        except Exception as e:
+            logger.warning(f"{self.label} read failed: {e}")
+            return None
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        try:
+            return self._client.mget(keys) if keys else []
+        except Exception as e:
+            logger.warning(f"{self.label} read failed: {e}")
+            return [None] * len(keys)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        try:
+            self._client.setex(key, ttl, value)
+        except Exception as e:
+            logger.warning(f"{self.label} write failed: {e}")
+
+    def delete(self, *keys: str):
+        try:
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"{self.label} delete failed: {e}")
+
+    def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+def create_store(backend: str, max_bytes: int, label: str, evictions: Optional[Counter] = None,
+                 on_remove: Optional[Callable[[str], None]] = None):
+    """A RedisCache for backend "redis" (when the package is installed), otherwise a LocalCache"""
+    if backend == "redis":
+        try:
+            return RedisCache(settings.redis_url, settings.redis_password, label)
+        except ImportError:
+            logger.warning(f"{label} backend is 'redis' but the redis package is not installed; using memory")
+    return LocalCache(max_bytes, evictions, on_remove)
@@ -0,0 +1,165 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app.config import settings
+from app.models.song import Song
+from app.models.play_event import PlayEvent
+
+logger = logging.getLogger(__name__)
+
+# Plays older than this many half-lives weigh under 0.1% and are not replayed on startup
+HISTORY_HALF_LIVES = 10
+# Scores are re-based before the forward-decay weights grow past 2**RESCALE_HALF_LIVES
+RESCALE_HALF_LIVES = 32
+# Songs whose decayed score falls below this are forgotten when scores are re-based
+MIN_SCORE = 1e-3
+# Each refresh re-reads plays this close to the newest one seen, so a play committed late
+# (with an earlier played_at than rows already read) is still counted; ids dedupe the overlap
+OVERLAP_SECONDS = 60
+READ_BATCH_SIZE = 50_000
+
+
+class TopK:
+    """
+    The k songs with the highest scores, for scores that only grow. A min-heap holds the
+    members; an update pushes a new entry and leaves the old one behind, to be skipped
+    when it surfaces (its score no longer matches the member's).
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.members: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def offer(self, song_id: int, score: float):
+        if song_id not in self.members:
+            if len(self.members) >= self.k:
+                self._drop_stale()
+                if score <= self._heap[0][0]:
+                    return
+                _, evicted = heapq.heappop(self._heap)
+                del self.members[evicted]
+        self.members[song_id] = score
+        heapq.heappush(self._heap, (score, song_id))
+        if len(self._heap) > 4 * self.k:
+            self._rebuild()
+
+    def _drop_stale(self):
+        while self._heap and self.members.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _rebuild(self):
+        self._heap = [(score, song_id) for song_id, score in self.members.items()]
+        heapq.heapify(self._heap)
+
+    def scale(self, factor: float):
+        self.members = {song_id: score * factor for song_id, score in self.members.items()}
+        self._rebuild()
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        return heapq.nlargest(limit, self.members.items(), key=lambda item: item[1])
+
+
+class TrendingCharts:
+    """
+    Exponentially decayed play counts of every song, with the top songs overall and per genre.
+
+    Uses forward decay: a play at time t adds 2 ** ((t - landmark) / half_life), so stored
+    scores never shrink and rankings can be kept in heaps updated on every play. Dividing
+    by the weight of "now" turns a score back into decayed plays. Every worker tails
+    play_events into its own copy, so charts are served from memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.scores: Dict[int, float] = {}
+            self.overall = TopK(settings.trending_top_k)
+            self.by_genre: Dict[int, TopK] = {}
+            self.landmark = time.time()
+            self.loaded = False
+            self.refreshed_at = 0.0
+            self._since: Optional[datetime] = None  # played_at of the newest play applied
+            self._seen: Dict[int, datetime] = {}  # ids of plays applied within the overlap window
+
+    @property
+    def _half_life(self) -> float:
+        return settings.trending_half_life_hours * 3600
+
+    def record(self, song_id: int, genre_id: Optional[int], played_at: float):
+        """Count one play (played_at in epoch seconds); the caller holds the lock"""
+        if played_at - self.landmark > RESCALE_HALF_LIVES * self._half_life:
+            self._rebase(played_at)
+        score = self.scores.get(song_id, 0.0) + 2 ** ((played_at - self.landmark) / self._half_life)
+        self.scores[song_id] = score
+        self.overall.offer(song_id, score)
+        if genre_id is not None:
+            chart = self.by_genre.get(genre_id)
+            if chart is None:
+                chart = self.by_genre[genre_id] = TopK(settings.trending_top_k)
+            chart.offer(song_id, score)
+
+    def _rebase(self, landmark: float):
+        factor = 2 ** ((self.landmark - landmark) / self._half_life)
+        self.landmark = landmark
+        self.scores = {song_id: score * factor for song_id, score in self.scores.items() if score * factor >= MIN_SCORE}
+        for chart in [self.overall, *self.by_genre.values()]:
+            chart.scale(factor)
+
+    def refresh(self, bind):
+        """Apply plays recorded since the last refresh (on first use, the last HISTORY_HALF_LIVES)"""
+        with self._lock:
+            if self._since is None:
+                since = datetime.now(timezone.utc) - timedelta(seconds=HISTORY_HALF_LIVES * self._half_life)
+            else:
+                since = self._since - timedelta(seconds=OVERLAP_SECONDS)
+            query = select(PlayEvent.id, PlayEvent.song_id, Song.genre_id, PlayEvent.played_at).join(
+                Song, Song.id == PlayEvent.song_id
+            ).where(PlayEvent.played_at >= since).order_by(PlayEvent.played_at, PlayEvent.id)
+
+            applied = 0
+            with bind.connect() as conn:
+                result = conn.execution_options(yield_per=READ_BATCH_SIZE).execute(query)
+                for rows in result.partitions():
+                    for play_id, song_id, genre_id, played_at in rows:
+                        if play_id in self._seen:
+                            continue
+                        if played_at.tzinfo is None:
+                            played_at = played_at.replace(tzinfo=timezone.utc)
+                        self._seen[play_id] = played_at
+                        self.record(song_id, genre_id, played_at.timestamp())
+                        if self._since is None or played_at > self._since:
+                            self._since = played_at
+                        applied += 1
+
+            if self._since is not None:
+                horizon = self._since - timedelta(seconds=OVERLAP_SECONDS)
+                self._seen = {play_id: at for play_id, at in self._seen.items() if at >= horizon}
+            if not self.loaded:
+                logger.info(f"Loaded trending charts: {applied} plays, {len(self.scores)} songs")
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+
+    def ensure_ready(self, bind):
+        """Load on first use and catch up if the scheduler has not refreshed recently"""
+        if not self.loaded or time.monotonic() - self.refreshed_at >= settings.trending_refresh_interval:
+            self.refresh(bind)
+
+    def trending(self, limit: int, genre_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(song id, decayed play count) of the top songs, best first"""
+        with self._lock:
+            chart = self.overall if genre_id is None else self.by_genre.get(genre_id)
+            if chart is None:
+                return []
+            now = 2 ** ((time.time() - self.landmark) / self._half_life)
+            return [(song_id, score / now) for song_id, score in chart.top(limit)]
+
+
+trending_charts = TrendingCharts()
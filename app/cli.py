@@ -8,6 +8,7 @@ from app.models.song import Song, SongStatus
 from app.models.album import Album
 from app.models.playlist import Playlist, PlaylistSong
 from app.auth import get_password_hash
+from app.fractional_index import keys_between
 from app.database import Base
 
 def create_admin_user():
@@ -277,8 +278,9 @@ def create_sample_playlists():
                 db.flush()  # Get the ID
                 
                 # Add some songs to the playlist
-                for song in songs[:3]:  # Add first 3 songs
-                    playlist_song = PlaylistSong(playlist_id=playlist.id, song_id=song.id)
+                positions = keys_between(None, None, 3)
+                for song, position in zip(songs[:3], positions):  # Add first 3 songs
+                    playlist_song = PlaylistSong(playlist_id=playlist.id, song_id=song.id, position=position)
                     db.add(playlist_song)
                 
                 created_count += 1
@@ -313,6 +315,84 @@ def create_all_sample_data():
     print("- 3 playlists for testuser")
     print("\nEnjoy testing your GSpotify frontend! 🎶")
 
+def reindex_search():
+    """Rebuild the full-text and lyrics search indexes from the catalog"""
+    from app.search import rebuild_index, rebuild_lyrics_index, bump_catalog_version
+    print("Rebuilding search index...")
+    try:
+        with engine.begin() as conn:
+            counts = rebuild_index(conn)
+            lyrics = rebuild_lyrics_index(conn)
+            bump_catalog_version(conn)
+        print(f"Indexed {counts['song']} songs, {counts['artist']} artists, {counts['playlist']} playlists")
+        print(f"Indexed lyrics of {lyrics} songs")
+    except Exception as e:
+        print(f"Error rebuilding search index: {e}")
+
+def build_similar_songs():
+    """Rebuild the similar songs model from likes and playlists"""
+    from app.recommendations import similar_songs_service
+    print("Building similar songs model...")
+    try:
+        model = similar_songs_service.rebuild(engine)
+        print(f"Stored {len(model.neighbours)} neighbours for {len(model)} songs in {similar_songs_service.path}")
+    except Exception as e:
+        print(f"Error building similar songs model: {e}")
+
+def train_recommendations():
+    """Retrain the personal recommendation model from likes, playlists and plays"""
+    from app.recommendations import recommendation_service
+    print("Training recommendation model...")
+    try:
+        model = recommendation_service.rebuild(engine)
+        print(f"Trained factors for {len(model.user_ids)} users and {len(model.song_ids)} songs in {recommendation_service.directory}")
+    except Exception as e:
+        print(f"Error training recommendation model: {e}")
+
+def bench_search(args):
+    """Benchmark search latency on a synthetic catalog"""
+    import argparse
+    from app.search import bench
+    parser = argparse.ArgumentParser(prog="bench-search")
+    parser.add_argument("--database", default="sqlite:///./bench_search.db", help="Benchmark database (never the app database)")
+    parser.add_argument("--songs", type=int, default=1_000_000)
+    parser.add_argument("--artists", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    options = parser.parse_args(args)
+    bench.main(options.database, options.songs, options.artists, options.repeats)
+
+def bench_fuzzy(args):
+    """Benchmark the typo-tolerant index on a synthetic vocabulary"""
+    import argparse
+    from app.search import bench
+    parser = argparse.ArgumentParser(prog="bench-fuzzy")
+    parser.add_argument("--terms", type=int, default=200_000, help="Vocabulary size (and cap)")
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--database", default=None, help="Use the vocabulary of an existing catalog instead")
+    options = parser.parse_args(args)
+    bench.fuzzy_main(options.terms, options.queries, options.database)
+
+def export_data(args):
+    """Export songs, users, likes, playlist entries and plays to columnar chunk files"""
+    import argparse
+    from app.export import Exporter, EXPORT_TABLES, DEFAULT_CHUNK_ROWS
+    parser = argparse.ArgumentParser(prog="export")
+    parser.add_argument("directory", help="Output directory; its manifest.json holds the watermarks of earlier exports")
+    parser.add_argument("--tables", nargs="+", choices=list(EXPORT_TABLES), default=list(EXPORT_TABLES))
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk file")
+    parser.add_argument("--format", choices=["auto", "npz", "parquet"], default="auto", help="auto: parquet if pyarrow is installed")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermarks and export everything again")
+    options = parser.parse_args(args)
+    try:
+        exporter = Exporter(engine, options.directory, options.chunk_rows, options.format)
+        counts = exporter.export(options.tables, options.full)
+        for name, rows in counts.items():
+            print(f"Exported {rows} {name} rows")
+        print(f"Wrote {exporter.format} chunks to {options.directory}")
+    except Exception as e:
+        print(f"Error exporting data: {e}")
+        sys.exit(1)
+
 def show_help():
     """Show available commands"""
     print("Available commands:")
@@ -324,6 +404,12 @@ def show_help():
     print("  create-songs    - Create sample songs")
     print("  create-playlists - Create sample playlists")
     print("  create-all-data - Create all sample data (recommended)")
+    print("  reindex-search  - Rebuild the full-text and lyrics search indexes")
+    print("  build-similar   - Rebuild the similar songs model from likes and playlists")
+    print("  train-recommendations - Retrain personal recommendations (ALS) from likes, playlists and plays")
+    print("  bench-search    - Benchmark search on a synthetic catalog (--songs, --database)")
+    print("  bench-fuzzy     - Benchmark typo-tolerant lookups (--terms, --queries)")
+    print("  export DIR      - Export catalog, likes and plays as columnar chunks; plays are incremental after the first run (--full, --tables, --format)")
     print("  help            - Show this help message")
 
 if __name__ == "__main__":
@@ -349,6 +435,18 @@ if __name__ == "__main__":
         create_sample_playlists()
     elif command == "create-all-data":
         create_all_sample_data()
+    elif command == "reindex-search":
+        reindex_search()
+    elif command == "build-similar":
+        build_similar_songs()
+    elif command == "train-recommendations":
+        train_recommendations()
+    elif command == "bench-search":
+        bench_search(sys.argv[2:])
+    elif command == "bench-fuzzy":
+        bench_fuzzy(sys.argv[2:])
+    elif command == "export":
+        export_data(sys.argv[2:])
     elif command == "help":
         show_help()
     else:
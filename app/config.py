@@ -24,6 +24,14 @@ class Settings(BaseSettings):
     database_pool_timeout: int = 30
     database_pool_recycle: int = 3600
     
+    # SQL Instrumentation
+    sql_instrumentation_enabled: bool = True
+    n_plus_one_threshold: int = 10  # Max repeats of one statement shape per request (0 disables)
+    n_plus_one_raise: bool = False  # Raise instead of warn (enabled by the test suite)
+    slow_query_threshold_ms: float = 500.0  # Log statements slower than this (0 disables)
+    slow_query_explain: bool = True  # Capture EXPLAIN output for slow reads
+    slow_query_explain_interval: int = 300  # seconds between EXPLAINs of the same statement
+    
     # Redis Configuration (for caching and sessions)
     redis_url: str = "redis://localhost:6379"
     redis_password: Optional[str] = None
@@ -49,6 +57,60 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_format: str = "colored"  # colored, json, compact, or text
     
+    # Playlists
+    playlist_position_max_length: int = 32  # Rebalance a playlist once an order key grows past this
+    
+    # Search
+    suggest_refresh_interval: int = 2  # seconds between applying queued changes to the suggest index
+    suggest_rebuild_interval: int = 3600  # seconds between full rebuilds (refreshes popularity order)
+    fuzzy_max_terms: int = 200_000  # vocabulary cap of the typo-tolerant index (most frequent words kept)
+    fuzzy_rebuild_interval: int = 3600  # seconds between full rebuilds (drops words no longer in the catalog)
+    search_cache_enabled: bool = True
+    search_cache_backend: str = "memory"  # "memory" (per worker) or "redis" (shared; needs the redis package)
+    search_cache_max_bytes: int = 32 * 1024 * 1024  # budget of the in-process cache
+    search_cache_ttl: int = 60  # seconds; bounds staleness of play counts, which do not bump the version
+    
+    # Response cache (public catalog GETs)
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "memory"  # "memory" (per worker, synced via cache_invalidations) or "redis" (shared; needs the redis package)
+    response_cache_max_bytes: int = 64 * 1024 * 1024  # budget of the in-process cache
+    response_cache_ttl: int = 30  # seconds; bounds staleness of play counts, which invalidate nothing
+    response_cache_sync_interval: int = 1  # seconds between applying other workers' invalidations
+    
+    # Recommendations
+    recommendations_dir: str = "data/recommendations"  # model files, shared by every worker on the host
+    similar_songs_top_k: int = 50  # neighbours stored per song
+    similar_songs_min_count: int = 2  # songs must share at least this many likers/playlists
+    similar_songs_max_basket: int = 500  # larger playlists and like lists are sampled down to this
+    similar_songs_rebuild_interval: int = 6 * 3600  # seconds
+    als_factors: int = 32  # latent dimensions of the personal recommendation model
+    als_iterations: int = 10
+    als_regularization: float = 0.05
+    als_alpha: float = 10.0  # confidence gained per unit of preference (likes 4, playlist adds 2, log plays)
+    als_rebuild_interval: int = 24 * 3600  # seconds
+    radio_artist_spacing: int = 3  # an artist is not repeated within this many consecutive radio tracks
+    
+    # Charts
+    trending_half_life_hours: float = 24.0  # a play counts half as much after this long
+    trending_top_k: int = 100  # songs kept per chart, overall and per genre
+    trending_refresh_interval: int = 2  # seconds between folding new plays into the charts
+    stats_rollup_interval: int = 60  # seconds between analytics rollup runs
+    stats_rollup_reopen_hours: int = 1  # hours before the watermark re-aggregated each run, for late commits
+    
+    # Earnings
+    earnings_default_rate_per_play: float = 0.003  # paid for periods before the first payout_rates row
+    earnings_currency: str = "USD"
+    earnings_close_interval: int = 3600  # seconds between checks for months ready to close
+    
+    # Background Tasks
+    enable_background_tasks: bool = True  # Periodic maintenance loops started with the app
+    deletion_batch_size: int = 500  # Rows removed per transaction by account deletion
+    deletion_sweep_interval: int = 30  # seconds between checks for pending deletion jobs
+    deletion_job_lease_seconds: int = 300  # A running job not updated for this long is picked up again
+    deletion_job_max_attempts: int = 5
+    health_probe_interval: int = 5  # seconds between background health probes
+    health_stale_after: int = 30  # seconds before a probe result no longer counts as healthy
+    
     # File Upload Configuration
     max_file_size: int = 50 * 1024 * 1024  # 50MB
     allowed_file_types: List[str] = [".mp3", ".wav", ".flac", ".aac", ".ogg"]
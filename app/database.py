@@ -1,17 +1,18 @@
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
 from typing import Generator
 import logging
 from app.config import settings
+from app.query_stats import install_query_hooks
+from app.pool_stats import InstrumentedQueuePool, register_pool_metrics
 
 logger = logging.getLogger(__name__)
 
 # Create database engine with connection pooling
 engine = create_engine(
     settings.database_url,
-    poolclass=QueuePool,
+    poolclass=InstrumentedQueuePool,  # Records checkout waits and timeouts
     pool_size=settings.database_pool_size,
     max_overflow=settings.database_max_overflow,
     pool_timeout=settings.database_pool_timeout,
@@ -22,20 +23,17 @@ engine = create_engine(
 )
 
 # Add connection event listeners for better monitoring
+# (checkout/checkin are already logged by echo_pool in debug mode)
 @event.listens_for(engine, "connect")
 def receive_connect(dbapi_connection, connection_record):
     """Log database connections"""
     logger.debug("Database connection established")
 
-@event.listens_for(engine, "checkout")
-def receive_checkout(dbapi_connection, connection_record, connection_proxy):
-    """Log connection checkouts"""
-    logger.debug("Database connection checked out from pool")
+# Count statements and DB time per request
+install_query_hooks()
 
-@event.listens_for(engine, "checkin")
-def receive_checkin(dbapi_connection, connection_record):
-    """Log connection checkins"""
-    logger.debug("Database connection returned to pool")
+# Pool size, checked-out connections and overflow for /metrics
+register_pool_metrics(engine)
 
 # Create session factory
 SessionLocal = sessionmaker(
@@ -76,7 +74,7 @@ def check_db_connection():
     try:
         with engine.connect() as connection:
             connection.execute(text("SELECT 1"))
-        logger.info("Database connection is healthy")
+        logger.debug("Database connection is healthy")
         return True
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
@@ -0,0 +1,187 @@
+import logging
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.song import Song
+from app.models.stat_rollup import StatRollup, RollupWatermark
+from app.models.earnings import PayoutRate, EarningsPeriod, EarningsStatement, EarningsStatementLine
+
+logger = logging.getLogger(__name__)
+
+EPOCH = date(1970, 1, 1)
+CENT = Decimal("0.01")
+
+
+def _day(day: date) -> int:
+    """Day bucket of the rollups"""
+    return (day - EPOCH).days
+
+
+def next_period(period_start: date) -> date:
+    return date(period_start.year + period_start.month // 12, period_start.month % 12 + 1, 1)
+
+
+def rate_segments(db: Session, start: date, end: date) -> List[Tuple[date, date, Decimal]]:
+    """(from, to, rate per play) covering [start, end), split wherever a new rate takes effect"""
+    rate = Decimal(str(settings.earnings_default_rate_per_play))
+    changes = []
+    for effective_from, rate_per_play in db.query(PayoutRate.effective_from, PayoutRate.rate_per_play).filter(
+        PayoutRate.effective_from < end
+    ).order_by(PayoutRate.effective_from):
+        if effective_from <= start:
+            rate = rate_per_play
+        else:
+            changes.append((effective_from, rate_per_play))
+
+    segments, segment_start = [], start
+    for effective_from, rate_per_play in changes:
+        segments.append((segment_start, effective_from, rate))
+        segment_start, rate = effective_from, rate_per_play
+    segments.append((segment_start, end, rate))
+    return segments
+
+
+def current_rate(db: Session, day: date) -> Decimal:
+    return rate_segments(db, day, day + timedelta(days=1))[0][2]
+
+
+def _close_period(db: Session, start: date):
+    """Write the period's statements from the day rollups of every song, all in the caller's transaction"""
+    end = next_period(start)
+    lines: Dict[int, List] = {}  # song id -> [artist id, plays, amount]
+    for segment_start, segment_end, rate in rate_segments(db, start, end):
+        plays = func.sum(StatRollup.plays)
+        rows = db.execute(
+            select(StatRollup.entity_id, Song.artist_id, plays)
+            .join(Song, Song.id == StatRollup.entity_id)
+            .where(
+                StatRollup.entity_type == "song",
+                StatRollup.granularity == "day",
+                StatRollup.bucket >= _day(segment_start),
+                StatRollup.bucket < _day(segment_end)
+            )
+            .group_by(StatRollup.entity_id, Song.artist_id)
+            .having(plays > 0)
+        )
+        for song_id, artist_id, song_plays in rows:
+            line = lines.setdefault(song_id, [artist_id, 0, Decimal(0)])
+            line[1] += song_plays
+            line[2] += rate * song_plays
+
+    # Inserted first: a second worker closing the same period fails here on the primary key
+    period = EarningsPeriod(period_start=start, plays=0, amount=Decimal(0))
+    db.add(period)
+    db.flush()
+
+    by_artist: Dict[int, List[Tuple[int, int, Decimal]]] = {}
+    for song_id, (artist_id, plays, amount) in lines.items():
+        by_artist.setdefault(artist_id, []).append((song_id, plays, amount))
+    statements = [
+        {
+            "artist_id": artist_id,
+            "period_start": start,
+            "plays": sum(plays for _, plays, _ in songs),
+            "amount": sum(amount for _, _, amount in songs).quantize(CENT, ROUND_HALF_UP),
+        }
+        for artist_id, songs in by_artist.items()
+    ]
+    if statements:
+        db.execute(insert(EarningsStatement), statements)
+        statement_ids = dict(db.execute(
+            select(EarningsStatement.artist_id, EarningsStatement.id).where(EarningsStatement.period_start == start)
+        ).all())
+        db.execute(insert(EarningsStatementLine), [
+            {"statement_id": statement_ids[artist_id], "song_id": song_id, "plays": plays, "amount": amount}
+            for artist_id, songs in by_artist.items()
+            for song_id, plays, amount in songs
+        ])
+
+    period.plays = sum(statement["plays"] for statement in statements)
+    period.amount = sum((statement["amount"] for statement in statements), Decimal(0))
+    logger.info(f"Closed earnings period {start}: {len(statements)} statements, {period.plays} plays, {period.amount}")
+
+
+def _rollups_final_before(db: Session, day: date) -> bool:
+    """Whether the rollup aggregator will no longer rewrite any hour before `day`"""
+    watermark = db.get(RollupWatermark, "stats")
+    return watermark is not None and watermark.hour is not None and (
+        watermark.hour - settings.stats_rollup_reopen_hours >= _day(day) * 24
+    )
+
+
+def closed_until(db: Session) -> Optional[date]:
+    """Start of the month after the last closed period; None while nothing is closed"""
+    last = db.query(func.max(EarningsPeriod.period_start)).scalar()
+    return next_period(last) if last is not None else None
+
+
+def first_open_period(db: Session) -> Optional[date]:
+    """Oldest month without statements: the one after the last closed period, or the first with plays"""
+    closed = closed_until(db)
+    if closed is not None:
+        return closed
+    first_day = db.query(func.min(StatRollup.bucket)).filter(
+        StatRollup.entity_type == "song", StatRollup.granularity == "day"
+    ).scalar()
+    return (EPOCH + timedelta(days=first_day)).replace(day=1) if first_day is not None else None
+
+
+def close_earnings_periods(bind=None):
+    """
+    Close every calendar month whose rollups are final, oldest first, one transaction each.
+    Only months after the last closed one are computed; closed statements are never rewritten.
+    """
+    db = Session(bind=bind) if bind is not None else SessionLocal()
+    try:
+        while True:
+            start = first_open_period(db)
+            if start is None or not _rollups_final_before(db, next_period(start)):
+                return
+            try:
+                _close_period(db, start)
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                logger.info(f"Earnings period {start} was closed by another worker")
+                return
+    finally:
+        db.close()
+
+
+def artist_earnings(db: Session, artist_id: int, today: date, statements: int = 12) -> Dict:
+    """
+    Settled totals from the artist's statements plus an estimate for the open months from
+    their day rollups at today's rate; every read is an index lookup on the artist
+    """
+    settled_plays, settled_amount = db.query(
+        func.coalesce(func.sum(EarningsStatement.plays), 0),
+        func.coalesce(func.sum(EarningsStatement.amount), 0)
+    ).filter(EarningsStatement.artist_id == artist_id).one()
+
+    open_from = first_open_period(db)
+    pending_plays = 0
+    if open_from is not None:
+        pending_plays = db.query(func.coalesce(func.sum(StatRollup.plays), 0)).filter(
+            StatRollup.entity_type == "artist",
+            StatRollup.entity_id == artist_id,
+            StatRollup.granularity == "day",
+            StatRollup.bucket >= _day(open_from)
+        ).scalar()
+
+    rate = current_rate(db, today)
+    recent = db.query(EarningsStatement).filter(
+        EarningsStatement.artist_id == artist_id
+    ).order_by(EarningsStatement.period_start.desc()).limit(statements).all()
+    return {
+        "settled_plays": settled_plays,
+        "settled_earnings": Decimal(str(settled_amount)).quantize(CENT, ROUND_HALF_UP),
+        "pending_plays": pending_plays,
+        "pending_earnings": (rate * pending_plays).quantize(CENT, ROUND_HALF_UP),
+        "rate_per_play": rate,
+        "statements": recent,
+    }
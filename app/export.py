@@ -0,0 +1,220 @@
+import enum
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Integer, func, select
+from app.models.user import User
+from app.models.song import Song
+from app.models.liked_song import LikedSong
+from app.models.playlist import PlaylistSong
+from app.models.play_event import PlayEvent
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+DEFAULT_CHUNK_ROWS = 100_000
+# Ids are allocated at insert but rows become visible at commit, so a lower id can commit
+# after a higher one. An event table's watermark only passes rows this old; transactions
+# that insert them are assumed to finish within half of it.
+SETTLE_LAG = timedelta(minutes=10)
+
+
+class ExportTable:
+    """
+    Columns of one table written to chunk files. Tables with `settled_by` set are append-only
+    event tables: each export continues after the highest id of the previous one, and stops
+    at the highest id whose `settled_by` timestamp is at least SETTLE_LAG old. The others can
+    change in place and are written as a full snapshot every time.
+    """
+
+    def __init__(self, name: str, columns: List, settled_by=None):
+        self.name = name
+        self.columns = columns
+        self.settled_by = settled_by
+        self.incremental = settled_by is not None
+        self.key = columns[0]  # the id; chunks are read in its order
+
+
+# Emails and password hashes stay out of exports
+EXPORT_TABLES: Dict[str, ExportTable] = {table.name: table for table in [
+    ExportTable("songs", [
+        Song.id, Song.title, Song.artist_id, Song.album_id, Song.genre_id, Song.duration_seconds,
+        Song.status, Song.release_date, Song.play_count, Song.created_at
+    ]),
+    ExportTable("users", [
+        User.id, User.username, User.role, User.is_active, User.created_at, User.deleted_at
+    ]),
+    # Unlikes and removals delete rows and reorders rewrite positions, so these are snapshots too
+    ExportTable("likes", [LikedSong.id, LikedSong.user_id, LikedSong.song_id, LikedSong.liked_at]),
+    ExportTable("playlist_songs", [
+        PlaylistSong.id, PlaylistSong.playlist_id, PlaylistSong.song_id, PlaylistSong.position, PlaylistSong.added_at
+    ]),
+    ExportTable(
+        "play_events", [PlayEvent.id, PlayEvent.user_id, PlayEvent.song_id, PlayEvent.played_at],
+        settled_by=PlayEvent.played_at
+    ),
+]}
+
+
+def _column_arrays(column, values: List) -> Dict[str, np.ndarray]:
+    """
+    One column of a chunk as NumPy arrays: int64, bool, datetime64[us] (UTC, NaT for null)
+    or unicode strings. Nullable numeric and text columns get a `<name>_null` mask.
+    """
+    arrays = {}
+    nulls = np.array([value is None for value in values], dtype=bool)
+    if isinstance(column.type, DateTime):
+        arrays[column.name] = np.array([
+            None if value is None else (value.astimezone(timezone.utc) if value.tzinfo else value).replace(tzinfo=None)
+            for value in values
+        ], dtype="datetime64[us]")
+        return arrays
+    if isinstance(column.type, Boolean):
+        arrays[column.name] = np.array([bool(value) for value in values], dtype=bool)
+    elif isinstance(column.type, Integer):
+        arrays[column.name] = np.array([0 if value is None else value for value in values], dtype=np.int64)
+    else:
+        arrays[column.name] = np.array([
+            "" if value is None else value.value if isinstance(value, enum.Enum) else str(value)
+            for value in values
+        ], dtype=str)
+    if column.nullable and not column.primary_key:
+        arrays[f"{column.name}_null"] = nulls
+    return arrays
+
+
+def _write_npz(path: str, arrays: Dict[str, np.ndarray]):
+    # Through a file object: given a path, NumPy would append .npz to the temporary name
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def _write_parquet(path: str, arrays: Dict[str, np.ndarray]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    columns = {
+        name: pa.array(values, mask=arrays.get(f"{name}_null"))
+        for name, values in arrays.items() if not (name.endswith("_null") and name[:-5] in arrays)
+    }
+    pq.write_table(pa.table(columns), path, compression="zstd")
+
+
+def resolve_format(requested: str) -> str:
+    """parquet when asked for or, for "auto", when pyarrow is installed; otherwise npz"""
+    if requested in ("auto", "parquet"):
+        try:
+            import pyarrow.parquet  # noqa: F401
+            return "parquet"
+        except ImportError:
+            if requested == "parquet":
+                raise
+            logger.info("pyarrow is not installed; exporting .npz chunks")
+    return "npz"
+
+
+class Exporter:
+    """
+    Streams tables into compressed columnar chunk files under `directory`, one subdirectory
+    per table. Rows come through a server-side cursor (yield_per) and at most `chunk_rows`
+    of them are held at a time, so memory does not grow with the table. `manifest.json`
+    records every file and, for incremental tables, the highest id exported; it is rewritten
+    after each chunk, so an interrupted export resumes where it stopped.
+    """
+
+    def __init__(self, bind, directory: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, fmt: str = "auto"):
+        self.bind = bind
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.format = resolve_format(fmt)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        path = os.path.join(self.directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {"tables": {}}
+
+    def _save_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def export(self, names: Optional[Iterable[str]] = None, full: bool = False) -> Dict[str, int]:
+        """Export the given tables (all by default); returns rows written per table"""
+        os.makedirs(self.directory, exist_ok=True)
+        return {name: self.export_table(EXPORT_TABLES[name], full) for name in (names or EXPORT_TABLES)}
+
+    def export_table(self, table: ExportTable, full: bool = False) -> int:
+        state = self.manifest["tables"].setdefault(table.name, {"watermark": None, "files": []})
+        if full and table.incremental:
+            self._remove(state["files"])
+            state.update(watermark=None, files=[])
+        if table.incremental:
+            folder = table.name
+        else:
+            folder = os.path.join(table.name, f"snapshot-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}")
+        os.makedirs(os.path.join(self.directory, folder), exist_ok=True)
+
+        query = select(*table.columns).order_by(table.key)
+        if table.incremental and state["watermark"] is not None:
+            query = query.where(table.key > state["watermark"])
+        started = time.perf_counter()
+        files = []
+        with self.bind.connect() as conn:
+            # Rows inserted while the export runs wait for the next one, so chunks stay in id order.
+            # For event tables, the newest rows also wait until every lower id has committed.
+            high_query = select(func.max(table.key))
+            if table.incremental:
+                high_query = high_query.where(table.settled_by < datetime.now(timezone.utc) - SETTLE_LAG)
+            high = conn.execute(high_query).scalar()
+            if high is not None:
+                result = conn.execution_options(yield_per=self.chunk_rows).execute(query.where(table.key <= high))
+                for rows in result.partitions():
+                    files.append(self._write_chunk(table, folder, rows))
+                    if table.incremental:
+                        state["files"].append(files[-1])
+                        state["watermark"] = files[-1]["last_id"]
+                        self._save_manifest()
+
+        if not table.incremental:
+            # The new snapshot replaces the previous one only once it is complete
+            previous, state["files"] = state["files"], files
+            self._save_manifest()
+            current = {entry["path"] for entry in files}
+            self._remove([entry for entry in previous if entry["path"] not in current])
+        state["exported_at"] = datetime.now(timezone.utc).isoformat()
+        self._save_manifest()
+        written = sum(entry["rows"] for entry in files)
+        logger.info(f"Exported {written} {table.name} rows in {time.perf_counter() - started:.1f}s")
+        return written
+
+    def _write_chunk(self, table: ExportTable, folder: str, rows: List) -> Dict:
+        arrays = {}
+        for column, values in zip(table.columns, zip(*rows)):
+            arrays.update(_column_arrays(column, list(values)))
+        first, last = rows[0][0], rows[-1][0]
+        name = os.path.join(folder, f"{table.name}-{first:012d}-{last:012d}.{self.format}")
+        path = os.path.join(self.directory, name)
+        # Written under a temporary name: a file listed in the manifest is always complete
+        temporary = f"{path}.tmp"
+        (_write_parquet if self.format == "parquet" else _write_npz)(temporary, arrays)
+        os.replace(temporary, path)
+        return {"path": name, "rows": len(rows), "first_id": first, "last_id": last}
+
+    def _remove(self, files: List[Dict]):
+        """Delete the files of a superseded snapshot, and its folder once empty"""
+        folders = set()
+        for entry in files:
+            path = os.path.join(self.directory, entry["path"])
+            if os.path.exists(path):
+                os.remove(path)
+            folders.add(os.path.dirname(path))
+        for folder in folders:
+            if os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
@@ -0,0 +1,165 @@
+"""
+Fractional (lexicographic) order keys.
+
+A key is an "integer part" whose first character encodes its length, followed by
+an optional fraction. Keys compare correctly as plain byte strings, so a new key
+can always be generated between any two neighbours without renumbering the rest.
+Appending increments the integer part, which keeps keys short for the common case.
+"""
+from typing import List, Optional
+
+BASE_62_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_ZERO = BASE_62_DIGITS[0]
+_SMALLEST_INTEGER = "A" + _ZERO * 26
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Fraction strictly between fractions a and b (b=None means the end of the range)"""
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} >= {b!r}")
+    if a[-1:] == _ZERO or (b and b[-1] == _ZERO):
+        raise ValueError("Fraction has a trailing zero")
+
+    if b:
+        # Skip the common prefix
+        n = 0
+        while (a[n] if n < len(a) else _ZERO) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = BASE_62_DIGITS.index(a[0]) if a else 0
+    digit_b = BASE_62_DIGITS.index(b[0]) if b is not None else len(BASE_62_DIGITS)
+    if digit_b - digit_a > 1:
+        return BASE_62_DIGITS[(digit_a + digit_b + 1) // 2]
+    if b and len(b) > 1:
+        return b[0]
+    return BASE_62_DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key!r}")
+    return key[:length]
+
+
+def validate_key(key: str):
+    if not key or key == _SMALLEST_INTEGER:
+        raise ValueError(f"Invalid order key: {key!r}")
+    integer = _integer_part(key)
+    if key[len(integer):][-1:] == _ZERO:
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def _increment_integer(x: str) -> Optional[str]:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = BASE_62_DIGITS.index(digits[i]) + 1
+        if d < len(BASE_62_DIGITS):
+            digits[i] = BASE_62_DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = _ZERO
+
+    # Carried past the most significant digit: grow the integer part
+    if head == "Z":
+        return "a" + _ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(_ZERO)
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(x: str) -> Optional[str]:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = BASE_62_DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = BASE_62_DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = BASE_62_DIGITS[-1]
+
+    if head == "a":
+        return "Z" + BASE_62_DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(BASE_62_DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Key sorting strictly after a and before b (None means the start or end of the list)"""
+    if a is not None:
+        validate_key(a)
+    if b is not None:
+        validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} >= {b!r}")
+
+    if a is None:
+        if b is None:
+            return "a" + _ZERO
+        integer_b = _integer_part(b)
+        if integer_b == _SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b
+        key = _decrement_integer(integer_b)
+        if key is None:
+            raise ValueError("Cannot decrement any further")
+        return key
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        key = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    key = _increment_integer(integer_a)
+    if key is None:
+        raise ValueError("Cannot increment any further")
+    if key < b:
+        return key
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], n: int) -> List[str]:
+    """n ordered keys strictly between a and b, spread to keep them short"""
+    if n <= 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = [key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], None))
+        return keys
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(None, keys[-1]))
+        keys.reverse()
+        return keys
+
+    mid = n // 2
+    c = key_between(a, b)
+    return keys_between(a, c, mid) + [c] + keys_between(c, b, n - mid - 1)
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+from sqlalchemy import text
+from app.config import settings
+from app.database import engine
+from app.local_file_service import local_file_service
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentHealth:
+    """Outcome of the most recent probe of one component"""
+
+    def __init__(self, healthy: bool, latency_ms: float, checked_at: float, error: Optional[str] = None):
+        self.healthy = healthy
+        self.latency_ms = latency_ms
+        self.checked_at = checked_at
+        self.error = error
+
+    def to_dict(self) -> Dict[str, object]:
+        stale = time.time() - self.checked_at > settings.health_stale_after
+        result = {
+            "status": "healthy" if self.healthy and not stale else "unhealthy",
+            "latency_ms": round(self.latency_ms, 3),
+            "checked_at": self.checked_at,
+        }
+        if stale:
+            result["error"] = "Health probe result is stale"
+        elif self.error:
+            result["error"] = self.error
+        return result
+
+
+class HealthProber:
+    """
+    Runs component checks from a background task and keeps the latest results,
+    so health endpoints answer from memory instead of touching the database.
+    """
+
+    def __init__(self):
+        self._checks: Dict[str, Callable[[], None]] = {}
+        self._results: Dict[str, ComponentHealth] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, check: Callable[[], None]):
+        """Add a check; it signals failure by raising"""
+        self._checks[name] = check
+
+    def probe(self):
+        """Run every check once (blocking) and store the results"""
+        for name, check in list(self._checks.items()):
+            start = time.perf_counter()
+            try:
+                check()
+                healthy, error = True, None
+            except Exception as e:
+                healthy, error = False, str(e)
+                logger.warning(f"Health check '{name}' failed: {e}")
+            result = ComponentHealth(healthy, (time.perf_counter() - start) * 1000, time.time(), error)
+            with self._lock:
+                self._results[name] = result
+
+    def has_results(self) -> bool:
+        return bool(self._results)
+
+    def results(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            results = dict(self._results)
+        return {name: result.to_dict() for name, result in results.items()}
+
+
+def check_database():
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def check_storage():
+    path = local_file_service.base_upload_path
+    if not path.is_dir():
+        raise RuntimeError(f"Upload directory {path} is missing")
+    if not os.access(path, os.W_OK):
+        raise RuntimeError(f"Upload directory {path} is not writable")
+
+
+health_prober = HealthProber()
+health_prober.register("database", check_database)
+health_prober.register("storage", check_storage)
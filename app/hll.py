@@ -0,0 +1,99 @@
+import math
+import zlib
+from typing import Iterable, Optional
+import numpy as np
+
+# 2**13 registers: standard error 1.04 / sqrt(8192), about 1.1%, in 8 KB before compression
+PRECISION = 13
+REGISTERS = 1 << PRECISION
+# Bits of the hash left for the rank once the register index is taken
+RANK_BITS = 64 - PRECISION
+
+
+def hash_ids(ids) -> np.ndarray:
+    """splitmix64 finalizer: well-mixed 64-bit hashes of integer ids, vectorized"""
+    h = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+    h = h + np.uint64(0x9E3779B97F4A7C15)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def registers_of(hashes: np.ndarray):
+    """(register index, rank) of each hash: the top bits pick the register, the rank is one
+    more than the number of leading zeros in the rest"""
+    index = (hashes >> np.uint64(RANK_BITS)).astype(np.intp)
+    rest = hashes & np.uint64((1 << RANK_BITS) - 1)
+    # frexp gives the exact bit length of integers below 2**53
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    return index, (RANK_BITS + 1 - bit_length).astype(np.uint8)
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count. Adding an id twice changes nothing and two sketches merge by
+    taking the larger value of each register, so sketches of different days or workers combine
+    into the sketch of their union. Estimates use Ertl's improved estimator, which stays
+    unbiased from a handful of ids to billions without HLL++'s bias tables.
+    """
+
+    def __init__(self, registers: Optional[np.ndarray] = None):
+        self.registers = registers if registers is not None else np.zeros(REGISTERS, dtype=np.uint8)
+
+    def add_many(self, ids: Iterable[int]):
+        index, rank = registers_of(hash_ids(np.fromiter(ids, dtype=np.int64)))
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, id: int):
+        self.add_many([id])
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = REGISTERS
+        histogram = np.bincount(self.registers, minlength=RANK_BITS + 2)
+        z = m * _tau(1 - histogram[RANK_BITS + 1] / m)
+        for k in range(RANK_BITS, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        if math.isinf(z):
+            return 0
+        return round(m * m / (2 * math.log(2)) / z)
+
+    def to_bytes(self) -> bytes:
+        """Compressed registers: a sketch of a few listeners is tens of bytes, a full one ~3.6 KB"""
+        return zlib.compress(self.registers.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+        if registers.size != REGISTERS:
+            raise ValueError(f"sketch has {registers.size} registers, expected {REGISTERS}")
+        return cls(registers.copy())
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
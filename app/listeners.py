@@ -0,0 +1,128 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+import numpy as np
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from app.hll import HyperLogLog, hash_ids, registers_of
+from app.models.song import Song
+from app.models.play_event import PlayEvent
+from app.models.listener_sketch import ListenerSketch
+
+logger = logging.getLogger(__name__)
+
+# Entity ids are packed above the day in one integer key while grouping
+DAY_BITS = 20
+# Existing sketches are looked up this many entity ids at a time
+READ_BATCH_SIZE = 500
+
+
+def refresh_listener_sketches(db: Session, first: int, last: int):
+    """
+    Add the listeners of the plays in hours [first, last] to the day sketches of their song,
+    artist and the platform, in the caller's transaction. Adding a listener twice is a no-op,
+    so re-reading hours the rollups reopen needs no bookkeeping; unchanged sketches are not
+    rewritten.
+    """
+    lower = datetime.fromtimestamp(first * 3600 - 1, timezone.utc)
+    upper = datetime.fromtimestamp((last + 1) * 3600 + 1, timezone.utc)
+    rows = db.execute(
+        select(PlayEvent.user_id, PlayEvent.song_id, Song.artist_id, PlayEvent.played_at)
+        .join(Song, Song.id == PlayEvent.song_id)
+        .where(PlayEvent.played_at >= lower, PlayEvent.played_at < upper, PlayEvent.user_id.isnot(None))
+    ).all()
+    if not rows:
+        return
+
+    users, songs, artists, played_at = zip(*rows)
+    seconds = np.array([
+        (moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)).timestamp()
+        for moment in played_at
+    ], dtype=np.int64)
+    keep = (seconds // 3600 >= first) & (seconds // 3600 <= last)
+    if not keep.any():
+        return
+    days = seconds[keep] // 86400
+    index, rank = registers_of(hash_ids(np.asarray(users, dtype=np.int64)[keep]))
+
+    updates: Dict[Tuple[str, int, int], Tuple[np.ndarray, np.ndarray]] = {}
+    for entity_type, entity_ids in [
+        ("song", np.asarray(songs, dtype=np.int64)[keep]),
+        ("artist", np.asarray(artists, dtype=np.int64)[keep]),
+        ("platform", np.zeros(len(days), dtype=np.int64)),
+    ]:
+        keys = (entity_ids << DAY_BITS) | days
+        # Group by sketch, then keep the highest rank per register within each group
+        order = np.lexsort((index, keys))
+        keys, entity_index, entity_rank = keys[order], index[order], rank[order]
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (entity_index[1:] != entity_index[:-1])])
+        keys, entity_index, entity_rank = keys[starts], entity_index[starts], np.maximum.reduceat(entity_rank, starts)
+        bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1], True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            key = int(keys[start])
+            updates[(entity_type, key >> DAY_BITS, key & ((1 << DAY_BITS) - 1))] = (
+                entity_index[start:end], entity_rank[start:end]
+            )
+
+    # Only the sketches being extended are read, through the unique index
+    wanted: Dict[Tuple[str, int], list] = {}
+    for entity_type, entity_id, day in updates:
+        wanted.setdefault((entity_type, day), []).append(entity_id)
+    existing = {}
+    for (entity_type, day), entity_ids in wanted.items():
+        for i in range(0, len(entity_ids), READ_BATCH_SIZE):
+            for sketch_id, entity_id, sketch in db.execute(
+                select(ListenerSketch.id, ListenerSketch.entity_id, ListenerSketch.sketch).where(
+                    ListenerSketch.entity_type == entity_type,
+                    ListenerSketch.day == day,
+                    ListenerSketch.entity_id.in_(entity_ids[i:i + READ_BATCH_SIZE])
+                )
+            ):
+                existing[(entity_type, entity_id, day)] = (sketch_id, sketch)
+    inserts, rewrites = [], []
+    for (entity_type, entity_id, day), (registers, ranks) in updates.items():
+        current = existing.get((entity_type, entity_id, day))
+        sketch = HyperLogLog.from_bytes(current[1]) if current is not None else HyperLogLog()
+        if current is not None and np.all(sketch.registers[registers] >= ranks):
+            continue
+        np.maximum.at(sketch.registers, registers, ranks)
+        if current is None:
+            inserts.append({"entity_type": entity_type, "entity_id": entity_id, "day": day, "sketch": sketch.to_bytes()})
+        else:
+            rewrites.append({"id": current[0], "sketch": sketch.to_bytes()})
+    if inserts:
+        db.execute(insert(ListenerSketch), inserts)
+    if rewrites:
+        db.execute(update(ListenerSketch), rewrites)
+    logger.debug(f"Listener sketches for hours {first}-{last}: {len(inserts)} new, {len(rewrites)} updated")
+
+
+def unique_listeners(db: Session, entity_type: str, entity_id: int, first: int, last: int) -> Tuple[int, Dict[int, int]]:
+    """Estimated distinct listeners over days [first, last], and per day (days with none omitted)"""
+    union = HyperLogLog()
+    per_day = {}
+    for day, data in db.execute(
+        select(ListenerSketch.day, ListenerSketch.sketch).where(
+            ListenerSketch.entity_type == entity_type,
+            ListenerSketch.entity_id == entity_id,
+            ListenerSketch.day.between(first, last)
+        )
+    ):
+        sketch = HyperLogLog.from_bytes(data)
+        per_day[day] = sketch.count()
+        union.merge(sketch)
+    return union.count(), per_day
+
+
+def listener_stats(db: Session, entity_type: str, entity_id: int, day_range) -> Dict:
+    """Response body for a day TimeRange (app.rollups): the union estimate and zero-filled days"""
+    total, per_day = unique_listeners(db, entity_type, entity_id, day_range.first, day_range.last)
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "unique_listeners": total,
+        "points": [
+            {"start": day_range.bucket_start(day), "listeners": per_day.get(day, 0)}
+            for day in range(day_range.first, day_range.last + 1)
+        ]
+    }
@@ -2,11 +2,16 @@ import logging
 import logging.config
 import sys
 import json
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Dict, Any, Optional
 from app.config import settings
 
 
+# Request ID of the request being handled, for log records emitted outside the middleware
+request_id_context: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
 # ANSI color codes for beautiful terminal output
 class Colors:
     RESET = '\033[0m'
@@ -100,6 +105,14 @@ class ColoredFormatter(logging.Formatter):
             duration_color = Colors.SUCCESS if duration < 1.0 else Colors.WARNING if duration < 3.0 else Colors.ERROR
             extra_info.append(f"duration={duration_color}{duration:.3f}s{Colors.RESET}")
         
+        query_count = getattr(record, 'query_count', None)
+        if query_count is not None:
+            extra_info.append(f"queries={query_count}")
+        
+        db_time = getattr(record, 'db_time', None)
+        if db_time is not None:
+            extra_info.append(f"db={db_time:.3f}s")
+        
         status_code = getattr(record, 'status_code', None)
         if status_code is not None:
             if 200 <= status_code < 300:
@@ -151,9 +164,22 @@ class CompactJSONFormatter(logging.Formatter):
         if duration is not None:
             log_entry['duration'] = f"{duration:.3f}s"
         
+        query_count = getattr(record, 'query_count', None)
+        if query_count is not None:
+            log_entry['queries'] = query_count
+        
+        db_time = getattr(record, 'db_time', None)
+        if db_time is not None:
+            log_entry['db_time'] = f"{db_time:.3f}s"
+        
         status_code = getattr(record, 'status_code', None)
         if status_code is not None:
             log_entry['status'] = status_code
+        
+        for field in ('sql', 'bind_shape', 'fingerprint', 'query_plan'):
+            value = getattr(record, field, None)
+            if value is not None:
+                log_entry[field] = value
             
         # Add exception info if present
         if record.exc_info:
@@ -183,6 +209,17 @@ class JSONFormatter(logging.Formatter):
             log_entry['request_id'] = getattr(record, 'request_id')
         if hasattr(record, 'endpoint'):
             log_entry['endpoint'] = getattr(record, 'endpoint')
+        if hasattr(record, 'status_code'):
+            log_entry['status_code'] = getattr(record, 'status_code')
+        if hasattr(record, 'duration'):
+            log_entry['duration'] = getattr(record, 'duration')
+        if hasattr(record, 'query_count'):
+            log_entry['query_count'] = getattr(record, 'query_count')
+        if hasattr(record, 'db_time'):
+            log_entry['db_time'] = getattr(record, 'db_time')
+        for field in ('sql', 'bind_shape', 'fingerprint', 'query_plan'):
+            if hasattr(record, field):
+                log_entry[field] = getattr(record, field)
             
         # Add exception info if present
         if record.exc_info:
@@ -295,10 +332,20 @@ def log_request(request_id: str, method: str, url: str, user_id: Optional[str] =
         )
 
 
-def log_response(request_id: str, status_code: int, duration: float):
+def log_response(request_id: str, status_code: int, duration: float,
+                 query_count: Optional[int] = None, db_time: Optional[float] = None):
     """Log outgoing response with beautiful formatting"""
     logger = get_logger("gspotify.responses")
     
+    extra = {
+        "request_id": request_id,
+        "status_code": status_code,
+        "duration": duration
+    }
+    if query_count is not None:
+        extra["query_count"] = query_count
+        extra["db_time"] = db_time
+    
     # Add emoji and formatting for development
     if settings.is_development and settings.log_format != "json":
         if 200 <= status_code < 300:
@@ -308,20 +355,6 @@ def log_response(request_id: str, status_code: int, duration: float):
         else:
             emoji = "❌"
             
-        logger.info(
-            f"{emoji} Response {status_code} in {duration:.3f}s",
-            extra={
-                "request_id": request_id,
-                "status_code": status_code,
-                "duration": duration
-            }
-        )
+        logger.info(f"{emoji} Response {status_code} in {duration:.3f}s", extra=extra)
     else:
-        logger.info(
-            f"Response {status_code} in {duration:.3f}s",
-            extra={
-                "request_id": request_id,
-                "status_code": status_code,
-                "duration": duration
-            }
-        ) 
\ No newline at end of file
+        logger.info(f"Response {status_code} in {duration:.3f}s", extra=extra)
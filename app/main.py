@@ -1,22 +1,35 @@
 import time
 import uuid
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import logging
 
 # Import routers
-from app.routers import auth, users, songs, admin, artist, misc, files
+from app.routers import auth, users, songs, admin, artist, misc, files, charts
 
 # Import configuration and logging
 from app.config import settings
-from app.logging_config import setup_logging, log_request, log_response, get_logger
-from app.database import create_tables, check_db_connection
+from app.logging_config import setup_logging, log_request, log_response, get_logger, request_id_context
+from app.database import engine, create_tables, check_db_connection
+from app.pool_stats import pool_status
+from app.health import health_prober
+from app.metrics import registry as metrics_registry
+from app.query_stats import track_queries, check_n_plus_one
+from app.background import scheduler
+from app.account_deletion import process_pending_deletion_jobs
+from app.search import suggest_service, fuzzy_service, search_cache
+from app.recommendations import similar_songs_service, recommendation_service
+from app.charts import trending_charts
+from app.rollups import refresh_rollups
+from app.earnings import close_earnings_periods
+from app.response_cache import response_cache, ResponseCacheMiddleware
 
 # Setup logging
 setup_logging()
@@ -30,30 +43,35 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         # Generate request ID
         request_id = str(uuid.uuid4())
         request.state.request_id = request_id
+        request_id_context.set(request_id)
         
         # Log request
         start_time = time.time()
         user_id = getattr(request.state, 'user_id', None) if hasattr(request.state, 'user_id') else None
         log_request(request_id, request.method, str(request.url), user_id)
         
-        # Process request
-        try:
-            response = await call_next(request)
-            
-            # Log response
-            duration = time.time() - start_time
-            log_response(request_id, response.status_code, duration)
-            
-            # Add request ID to response headers
-            response.headers["X-Request-ID"] = request_id
-            
-            return response
-            
-        except Exception as e:
-            duration = time.time() - start_time
-            logger.error(f"Request failed: {e}", extra={"request_id": request_id})
-            log_response(request_id, 500, duration)
-            raise
+        # Process request, counting the SQL statements it issues
+        with track_queries() as query_stats:
+            try:
+                response = await call_next(request)
+                
+                # Log response
+                duration = time.time() - start_time
+                log_response(request_id, response.status_code, duration,
+                             query_stats.count, query_stats.total_time)
+                
+                # Add request ID and DB timing to response headers
+                response.headers["X-Request-ID"] = request_id
+                response.headers["Server-Timing"] = query_stats.server_timing()
+                
+            except Exception as e:
+                duration = time.time() - start_time
+                logger.error(f"Request failed: {e}", extra={"request_id": request_id})
+                log_response(request_id, 500, duration, query_stats.count, query_stats.total_time)
+                raise
+        
+        check_n_plus_one(query_stats, label=f"{request.method} {request.url.path}")
+        return response
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -102,11 +120,35 @@ async def lifespan(app: FastAPI):
     # Create tables
     create_tables()
     
+    # Periodic maintenance
+    if settings.enable_background_tasks:
+        scheduler.add("health_probe", health_prober.probe, settings.health_probe_interval)
+        scheduler.add("suggest_rebuild", lambda: suggest_service.rebuild(engine), settings.suggest_rebuild_interval)
+        scheduler.add("suggest_refresh", lambda: suggest_service.apply_pending(engine), settings.suggest_refresh_interval)
+        scheduler.add("fuzzy_rebuild", lambda: fuzzy_service.rebuild(engine), settings.fuzzy_rebuild_interval)
+        # Checked more often than it is due so a rebuild by another worker is not repeated here
+        scheduler.add(
+            "similar_songs_rebuild", lambda: similar_songs_service.rebuild_if_stale(engine),
+            settings.similar_songs_rebuild_interval / 6
+        )
+        scheduler.add(
+            "recommendations_train", lambda: recommendation_service.rebuild_if_stale(engine),
+            settings.als_rebuild_interval / 24
+        )
+        scheduler.add("trending_refresh", lambda: trending_charts.refresh(engine), settings.trending_refresh_interval)
+        scheduler.add("stats_rollup", refresh_rollups, settings.stats_rollup_interval)
+        scheduler.add("earnings_close", close_earnings_periods, settings.earnings_close_interval)
+        scheduler.add("response_cache_sync", lambda: response_cache.sync(engine), settings.response_cache_sync_interval)
+        # Picks up deletion jobs interrupted by a restart or a crashed worker
+        scheduler.add("account_deletion", process_pending_deletion_jobs, settings.deletion_sweep_interval)
+        await scheduler.start()
+    
     logger.info("GSpotify API started successfully")
     yield
     
     # Shutdown
     logger.info("Shutting down GSpotify API...")
+    await scheduler.stop()
 
 
 # Create FastAPI application
@@ -126,6 +168,9 @@ if settings.is_production:
         allowed_hosts=["*"]  # Configure with your actual domains
     )
 
+# Inside CORS, so cached responses get the headers of the requesting origin
+app.add_middleware(ResponseCacheMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -135,7 +180,7 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
-# Add custom middleware
+# Add custom middleware (the last one added runs first)
 app.add_middleware(RequestLoggingMiddleware)
 if settings.is_production:
     app.add_middleware(RateLimitMiddleware, requests_per_minute=settings.rate_limit_requests)
@@ -176,10 +221,18 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 
 # Health check endpoints
+async def _health_results():
+    """Latest background probe results; probes inline only when no prober is running yet"""
+    if not health_prober.has_results() or not settings.enable_background_tasks:
+        await asyncio.to_thread(health_prober.probe)
+    return health_prober.results()
+
+
 @app.get("/health")
 async def health_check():
-    """Basic health check endpoint"""
-    db_healthy = check_db_connection()
+    """Basic health check endpoint (served from the background prober)"""
+    components = await _health_results()
+    db_healthy = components["database"]["status"] == "healthy"
     
     return {
         "status": "healthy" if db_healthy else "unhealthy",
@@ -192,26 +245,31 @@ async def health_check():
 
 @app.get("/health/detailed")
 async def detailed_health_check():
-    """Detailed health check with component status"""
-    db_healthy = check_db_connection()
-    
-    # Add more health checks here (Redis, S3, etc.)
-    components = {
-        "database": "healthy" if db_healthy else "unhealthy",
-        "api": "healthy"
-    }
+    """Detailed health check with component status, latency and last check time"""
+    components = await _health_results()
     
-    overall_status = "healthy" if all(status == "healthy" for status in components.values()) else "unhealthy"
+    overall_status = "healthy" if all(c["status"] == "healthy" for c in components.values()) else "unhealthy"
     
     return {
         "status": overall_status,
         "version": settings.app_version,
         "environment": settings.environment,
         "components": components,
+        "database_pool": pool_status(engine),
+        "search_cache": search_cache.stats(),
+        "response_cache": response_cache.stats(),
         "timestamp": time.time()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (connection pool occupancy, checkout waits and timeouts)"""
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -233,6 +291,7 @@ app.include_router(admin.router)
 app.include_router(artist.router)
 app.include_router(misc.router)
 app.include_router(files.router)
+app.include_router(charts.router)
 
 if __name__ == "__main__":
     import uvicorn
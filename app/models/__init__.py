@@ -0,0 +1,19 @@
+# Import every model so relationship() strings resolve no matter which module is loaded first
+from app.models.user import User, UserRole
+from app.models.artist_profile import ArtistProfile
+from app.models.genre import Genre
+from app.models.album import Album
+from app.models.song import Song, SongStatus
+from app.models.lyrics import Lyrics
+from app.models.comment import Comment
+from app.models.liked_song import LikedSong
+from app.models.playlist import Playlist, PlaylistSong
+from app.models.deletion_job import DeletionJob, DeletionJobStatus
+from app.models.search_document import SearchDocument
+from app.models.lyrics_posting import LyricsPosting
+from app.models.catalog_version import CatalogVersion
+from app.models.play_event import PlayEvent
+from app.models.stat_rollup import StatRollup, RollupWatermark
+from app.models.earnings import PayoutRate, EarningsPeriod, EarningsStatement, EarningsStatementLine
+from app.models.listener_sketch import ListenerSketch
+from app.models.cache_invalidation import CacheInvalidation
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class CacheInvalidation(Base):
+    """
+    A response cache tag invalidated by a committed change. With the in-memory backend,
+    every worker tails this table to drop its own cached responses (app.response_cache);
+    rows are pruned after an hour.
+    """
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True)
+    tag = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DDL, event
+from app.database import Base
+
+
+class CatalogVersion(Base):
+    """
+    Counters bumped in the same transaction as the writes they describe, so every
+    worker can tell whether results it computed earlier are still current.
+    """
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Seeded with the table so bumps are always a plain UPDATE (no insert race between workers)
+event.listen(
+    CatalogVersion.__table__, "after_create",
+    DDL("INSERT INTO catalog_versions (name, version) VALUES ('search', 0), ('browse', 0)")
+)
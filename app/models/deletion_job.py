@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+
+
+class DeletionJobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class DeletionJob(Base):
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: the user row is the last thing the job deletes
+    user_id = Column(Integer, nullable=False, index=True)
+    status = Column(Enum(DeletionJobStatus), default=DeletionJobStatus.PENDING, nullable=False, index=True)
+    current_step = Column(String, nullable=True)
+    rows_deleted = Column(Integer, default=0, nullable=False)
+    files_deleted = Column(Integer, default=0, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
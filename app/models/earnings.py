@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Numeric, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PayoutRate(Base):
+    """Amount paid per play from effective_from until the next rate takes over"""
+    __tablename__ = "payout_rates"
+
+    id = Column(Integer, primary_key=True)
+    effective_from = Column(Date, nullable=False, unique=True)
+    rate_per_play = Column(Numeric(12, 6), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EarningsPeriod(Base):
+    """A closed calendar month; its statements are final and its rates can no longer change"""
+    __tablename__ = "earnings_periods"
+
+    period_start = Column(Date, primary_key=True)
+    plays = Column(Integer, nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)
+    closed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class EarningsStatement(Base):
+    """
+    What one artist earned in one closed period. Written once and never updated; no foreign
+    key to users, so statements outlive a deleted account.
+    """
+    __tablename__ = "earnings_statements"
+
+    id = Column(Integer, primary_key=True)
+    artist_id = Column(Integer, nullable=False)
+    period_start = Column(Date, ForeignKey("earnings_periods.period_start"), nullable=False)
+    plays = Column(Integer, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)  # Sum of the lines, rounded to cents
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Serves an artist's statements newest first
+    __table_args__ = (
+        UniqueConstraint("artist_id", "period_start", name="unique_earnings_statement_period"),
+    )
+
+
+class EarningsStatementLine(Base):
+    """Plays and unrounded earnings of one song within a statement"""
+    __tablename__ = "earnings_statement_lines"
+
+    id = Column(Integer, primary_key=True)
+    statement_id = Column(Integer, ForeignKey("earnings_statements.id"), nullable=False, index=True)
+    song_id = Column(Integer, nullable=False)
+    plays = Column(Integer, nullable=False)
+    amount = Column(Numeric(14, 6), nullable=False)
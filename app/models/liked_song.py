@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -13,7 +13,13 @@ class LikedSong(Base):
     liked_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Ensure a user can't like the same song twice
-    __table_args__ = (UniqueConstraint('user_id', 'song_id', name='unique_user_song_like'),)
+    # Newest-first pages of a user's likes are served by ix_liked_songs_user_liked_at,
+    # the analytics rollups' time-range reads by ix_liked_songs_liked_at
+    __table_args__ = (
+        UniqueConstraint('user_id', 'song_id', name='unique_user_song_like'),
+        Index('ix_liked_songs_user_liked_at', 'user_id', 'liked_at', 'id'),
+        Index('ix_liked_songs_liked_at', 'liked_at'),
+    )
     
     # Relationships
     user = relationship("User", back_populates="liked_songs")
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, UniqueConstraint
+from app.database import Base
+
+
+class ListenerSketch(Base):
+    """
+    HyperLogLog sketch (app.hll) of the signed-in users who played a song, an artist's songs,
+    or anything on the platform (entity_id 0) during one UTC day. Filled by app.listeners
+    alongside the rollups; `day` counts days since the Unix epoch like StatRollup.bucket.
+    """
+    __tablename__ = "listener_sketches"
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    day = Column(Integer, nullable=False)
+    sketch = Column(LargeBinary, nullable=False)  # zlib-compressed registers
+
+    # Serves both range reads of one entity and the aggregator's lookups of the sketches it extends
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "day", name="unique_listener_sketch_day"),
+    )
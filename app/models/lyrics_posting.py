@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, ForeignKey
+from app.database import Base
+
+
+class LyricsPosting(Base):
+    """
+    One term of one song's lyrics with every position it occurs at.
+    Positions are word offsets, delta-encoded as varints (see app.search.lyrics).
+    A term lookup is one range of the (term, song_id) primary key; on SQLite the table is
+    WITHOUT ROWID, so that range also holds the positions.
+    """
+    __tablename__ = "lyrics_postings"
+
+    term = Column(String(64), primary_key=True)
+    song_id = Column(Integer, ForeignKey("songs.id"), primary_key=True, index=True)
+    positions = Column(LargeBinary, nullable=False)
+
+    __table_args__ = {"sqlite_with_rowid": False}
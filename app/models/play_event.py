@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PlayEvent(Base):
+    """One stream of a song; user_id is null for anonymous listeners"""
+    __tablename__ = "play_events"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False, index=True)
+    played_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    
+    __table_args__ = (Index("ix_play_events_user_song", "user_id", "song_id"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -9,13 +9,13 @@ class Playlist(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     owner = relationship("User", back_populates="playlists")
-    playlist_songs = relationship("PlaylistSong", back_populates="playlist")
+    playlist_songs = relationship("PlaylistSong", back_populates="playlist", order_by="PlaylistSong.position")
 
 
 class PlaylistSong(Base):
@@ -24,8 +24,12 @@ class PlaylistSong(Base):
     id = Column(Integer, primary_key=True, index=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
     song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    # Fractional order key (see app.fractional_index); byte-wise collation so keys sort the same everywhere
+    position = Column(String().with_variant(String(collation="C"), "postgresql"), nullable=False)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (Index("ix_playlist_songs_playlist_position", "playlist_id", "position"),)
+    
     # Relationships
     playlist = relationship("Playlist", back_populates="playlist_songs")
     song = relationship("Song", back_populates="playlist_songs") 
\ No newline at end of file
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, String, Text, DDL, UniqueConstraint, event
+from app.database import Base
+
+
+class SearchDocument(Base):
+    """
+    Denormalized text of one searchable entity (song, artist or playlist).
+    Kept in sync by app.search.indexer; the full-text index over it is dialect specific.
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)  # Ranked above body matches
+    body = Column(Text, nullable=False, default="")
+
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", name="unique_search_document_entity"),
+    )
+
+
+# SQLite: FTS5 table over search_documents, maintained by triggers
+_SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5(
+        title, body, content='search_documents', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+# PostgreSQL: weighted tsvector column (title A, body B) with a GIN index.
+# 'simple' keeps names and titles unstemmed, which suits a multilingual catalog.
+_POSTGRES_FTS_DDL = [
+    """ALTER TABLE search_documents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_search_documents_search_vector ON search_documents USING GIN (search_vector)",
+]
+
+for statement in _SQLITE_FTS_DDL:
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in _POSTGRES_FTS_DDL:
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+event.listen(
+    SearchDocument.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS search_documents_fts").execute_if(dialect="sqlite")
+)
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, DDL, Index, UniqueConstraint, event
+from app.database import Base
+
+
+class StatRollup(Base):
+    """
+    Plays and likes of one entity (song, artist, genre, or the whole platform with id 0)
+    in one hour or day. `bucket` counts hours or days since the Unix epoch (UTC), so bucket
+    arithmetic and range filters are plain integer comparisons on every dialect.
+    Filled by app.rollups from play_events and liked_songs.
+    """
+    __tablename__ = "stat_rollups"
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(16), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    granularity = Column(String(8), nullable=False)  # "hour" or "day"
+    bucket = Column(Integer, nullable=False)
+    plays = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+
+    # The unique index serves time-range reads of one entity; the other one the aggregator's
+    # delete-and-refill of recent buckets
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", "granularity", "bucket", name="unique_stat_rollup_bucket"),
+        Index("ix_stat_rollups_granularity_bucket", "granularity", "bucket"),
+    )
+
+
+class RollupWatermark(Base):
+    """Newest hour bucket the aggregator has processed (null before its first run)"""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(32), primary_key=True)
+    hour = Column(Integer, nullable=True)
+
+
+# Seeded with the table so the aggregator can always lock and update an existing row
+event.listen(
+    RollupWatermark.__table__, "after_create",
+    DDL("INSERT INTO rollup_watermarks (name, hour) VALUES ('stats', NULL)")
+)
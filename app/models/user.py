@@ -22,6 +22,7 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     agreed_to_terms = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Tombstone while a deletion job runs
     
     # Relationships
     songs = relationship("Song", back_populates="artist")
@@ -0,0 +1,55 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+from fastapi import HTTPException, Response, status
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor holding the sort key of the last row of a page"""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _matches(value: Any, types: Sequence[type]) -> bool:
+    # JSON has no timestamps: a datetime field is an ISO string
+    if isinstance(value, str) and datetime in types:
+        try:
+            datetime.fromisoformat(value)
+            return True
+        except ValueError:
+            return False
+    return isinstance(value, tuple(types)) and not (isinstance(value, bool) and bool not in types)
+
+
+def decode_cursor(cursor: str, size: int, types: Optional[Sequence] = None) -> List[Any]:
+    """
+    Values of a cursor from encode_cursor(). With `types`, each value must be of the type
+    (or one of the tuple of types) at its position, so tampered cursors never reach a query.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        values = None
+    valid = isinstance(values, list) and len(values) == size
+    if valid and types is not None:
+        valid = all(_matches(value, t if isinstance(t, tuple) else (t,)) for value, t in zip(values, types))
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, cursor_for: Callable[[Any], str]) -> Optional[str]:
+    """Expose the cursor of the next page in a response header when this page is full"""
+    if len(rows) < limit:
+        return None
+    cursor = cursor_for(rows[-1])
+    response.headers[NEXT_CURSOR_HEADER] = cursor
+    return cursor
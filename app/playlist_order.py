@@ -0,0 +1,64 @@
+import logging
+from typing import List, Optional
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.fractional_index import key_between, keys_between
+from app.models.playlist import PlaylistSong
+
+logger = logging.getLogger(__name__)
+
+
+def last_position(db: Session, playlist_id: int) -> Optional[str]:
+    """Highest position key in a playlist (an index lookup on playlist_id, position)"""
+    return db.query(func.max(PlaylistSong.position)).filter(
+        PlaylistSong.playlist_id == playlist_id
+    ).scalar()
+
+
+def append_positions(db: Session, playlist_id: int, count: int) -> List[str]:
+    """Position keys for `count` songs appended to the end of a playlist"""
+    return keys_between(last_position(db, playlist_id), None, count)
+
+
+def position_after(db: Session, playlist_song: PlaylistSong, after: Optional[PlaylistSong]) -> str:
+    """Position key placing `playlist_song` right after `after` (None moves it to the top)"""
+    query = db.query(func.min(PlaylistSong.position)).filter(
+        PlaylistSong.playlist_id == playlist_song.playlist_id,
+        PlaylistSong.id != playlist_song.id
+    )
+    if after is not None:
+        query = query.filter(PlaylistSong.position > after.position)
+    next_position = query.scalar()
+    return key_between(after.position if after is not None else None, next_position)
+
+
+def needs_rebalance(*positions: str) -> bool:
+    return any(len(position) > settings.playlist_position_max_length for position in positions)
+
+
+def rebalance_playlist(bind, playlist_id: int):
+    """
+    Reassign short, evenly spaced position keys to every song in a playlist.
+    Runs as a background task once keys grow past playlist_position_max_length.
+    """
+    db = Session(bind=bind)
+    try:
+        entry_ids = [
+            entry_id for (entry_id,) in db.query(PlaylistSong.id).filter(
+                PlaylistSong.playlist_id == playlist_id
+            ).order_by(PlaylistSong.position, PlaylistSong.id)
+        ]
+        positions = keys_between(None, None, len(entry_ids))
+        if entry_ids:
+            db.execute(
+                update(PlaylistSong),
+                [{"id": entry_id, "position": position} for entry_id, position in zip(entry_ids, positions)]
+            )
+        db.commit()
+        logger.info(f"Rebalanced positions of playlist {playlist_id} ({len(entry_ids)} songs)")
+    except Exception as e:
+        logger.error(f"Failed to rebalance playlist {playlist_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from app.metrics import registry
+
+checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+checkout_timeouts = registry.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after database_pool_timeout"
+)
+
+_checkout_state = threading.local()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits and how often it times out"""
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; only time the outermost call
+        if getattr(_checkout_state, "active", False):
+            return super()._do_get()
+
+        _checkout_state.active = True
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            checkout_timeouts.inc()
+            raise
+        finally:
+            _checkout_state.active = False
+            checkout_wait.observe(time.perf_counter() - start)
+
+
+def register_pool_metrics(engine: Engine):
+    """Expose the engine's pool occupancy as gauges read at scrape time"""
+    # engine.pool is looked up on every read because dispose() swaps in a new pool
+    registry.gauge("db_pool_size", "Connections kept open by the pool", lambda: engine.pool.size())
+    registry.gauge("db_pool_checked_out", "Connections currently in use", lambda: engine.pool.checkedout())
+    registry.gauge("db_pool_checked_in", "Idle connections in the pool", lambda: engine.pool.checkedin())
+    registry.gauge(
+        "db_pool_overflow_in_use", "Connections open beyond pool_size",
+        lambda: max(engine.pool.overflow(), 0)
+    )
+    registry.gauge("db_pool_max_overflow", "Configured overflow limit", lambda: engine.pool._max_overflow)
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """Pool occupancy and checkout telemetry for /health/detailed"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+
+    wait = checkout_wait.snapshot()
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow_in_use": max(pool.overflow(), 0),
+        "saturated": pool.checkedout() >= capacity,
+        "checkout_timeouts": int(checkout_timeouts.value()),
+        "checkout_wait_seconds": {
+            "count": wait["count"],
+            "avg": wait["sum"] / wait["count"] if wait["count"] else 0.0,
+            "buckets": wait["buckets"]
+        }
+    }
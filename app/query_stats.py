@@ -0,0 +1,130 @@
+import re
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.slow_query_log import is_slow, log_slow_query
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneQueryError(AssertionError):
+    """Raised when one statement shape repeats too often within a single request"""
+
+
+class QueryStats:
+    """Statement count, DB time and statement shapes recorded for one unit of work"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.total_time += duration
+        self.shapes[normalize_statement(statement)] += 1
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed more than `threshold` times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header"""
+        return f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAM = re.compile(r"%\([^)]+\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement: str) -> str:
+    """Reduce a SQL statement to its shape: literals, bind markers and IN lists collapsed"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _BIND_PARAM.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Stats for the unit of work currently being tracked, if any"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Record every statement executed in the current context (request, task or test)"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def check_n_plus_one(stats: QueryStats, threshold: Optional[int] = None, label: str = "request"):
+    """
+    Flag statement shapes repeated more than `threshold` times.
+    Raises NPlusOneQueryError when settings.n_plus_one_raise is set (test mode),
+    otherwise logs a warning.
+    """
+    threshold = settings.n_plus_one_threshold if threshold is None else threshold
+    if threshold <= 0:
+        return
+
+    repeated = stats.repeated_statements(threshold)
+    if not repeated:
+        return
+
+    shape, count = repeated[0]
+    message = f"Possible N+1 in {label}: statement executed {count} times (threshold {threshold}): {shape[:200]}"
+    if settings.n_plus_one_raise:
+        raise NPlusOneQueryError(message)
+    logger.warning(message)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if is_slow(duration):
+        log_slow_query(conn, normalize_statement(statement), statement, parameters, duration, executemany)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    start_times = conn.info.get("query_start_time") if conn is not None else None
+    if start_times:
+        start_times.pop()
+
+
+def install_query_hooks():
+    """Register statement timing hooks on every Engine (application and test engines alike)"""
+    if not settings.sql_instrumentation_enabled:
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
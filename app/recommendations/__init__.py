@@ -0,0 +1,12 @@
+"""
+Recommendations computed offline from listening signal.
+
+Similar songs come from an item-item cosine model over like and playlist co-occurrence,
+rebuilt periodically into a NumPy file that every worker serves from memory.
+Personal recommendations come from implicit-feedback ALS over likes, playlist adds and
+plays; the factor matrices are memory-mapped and scored by brute force per request.
+Song radio walks the similar-songs graph a page at a time, its state carried in the cursor.
+"""
+from app.recommendations.similar import SimilarityModel, build_model, similar_songs_service
+from app.recommendations.als import FactorModel, train, recommendation_service
+from app.recommendations.radio import RadioState, next_tracks
@@ -0,0 +1,297 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, literal, select
+from app.config import settings
+from app.models.song import Song, SongStatus
+from app.models.liked_song import LikedSong
+from app.models.playlist import Playlist, PlaylistSong
+from app.models.play_event import PlayEvent
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "als.json"
+# Preference strength of each signal; plays are counted as log(1 + plays)
+LIKE_WEIGHT = 4.0
+PLAYLIST_WEIGHT = 2.0
+PLAY_WEIGHT = 1.0
+# Conjugate gradient steps per ALS half-iteration; warm-started, so a few are enough
+CG_STEPS = 3
+# Padded interactions gathered at once while solving (memory is about this times factors * 4 bytes)
+ENTRIES_PER_BLOCK = 1_000_000
+READ_BATCH_SIZE = 50_000
+
+
+def _read(conn, query, weight: float, chunks: List[np.ndarray]):
+    result = conn.execution_options(yield_per=READ_BATCH_SIZE).execute(query)
+    for rows in result.partitions():
+        chunk = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        chunk[:, 2] *= weight
+        chunks.append(chunk)
+
+
+def load_interactions(conn) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(user id, song id, preference) triples over approved songs, one per user and song"""
+    approved = Song.status == SongStatus.APPROVED
+    chunks: List[np.ndarray] = []
+    _read(conn, select(LikedSong.user_id, LikedSong.song_id, literal(1)).join(Song, Song.id == LikedSong.song_id).where(
+        approved
+    ), LIKE_WEIGHT, chunks)
+    _read(conn, select(Playlist.owner_id, PlaylistSong.song_id, literal(1)).join(
+        Playlist, Playlist.id == PlaylistSong.playlist_id
+    ).join(Song, Song.id == PlaylistSong.song_id).where(approved).distinct(), PLAYLIST_WEIGHT, chunks)
+    plays = select(PlayEvent.user_id, PlayEvent.song_id, func.count()).join(Song, Song.id == PlayEvent.song_id).where(
+        PlayEvent.user_id.isnot(None), approved
+    ).group_by(PlayEvent.user_id, PlayEvent.song_id)
+    result = conn.execution_options(yield_per=READ_BATCH_SIZE).execute(plays)
+    for rows in result.partitions():
+        chunk = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        chunk[:, 2] = PLAY_WEIGHT * np.log1p(chunk[:, 2])
+        chunks.append(chunk)
+    if not chunks:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    triples = np.concatenate(chunks)
+    return triples[:, 0].astype(np.int64), triples[:, 1].astype(np.int64), triples[:, 2].astype(np.float32)
+
+
+class _Csr:
+    """Rows of a sparse matrix: the entries of row r are indices/values[indptr[r]:indptr[r + 1]]"""
+
+    def __init__(self, rows: np.ndarray, columns: np.ndarray, values: np.ndarray, n_rows: int):
+        order = np.lexsort((columns, rows))
+        self.indices = columns[order]
+        self.values = values[order]
+        self.indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=n_rows))]
+
+
+def _padded_blocks(indptr: np.ndarray, budget: int):
+    """
+    Rows grouped by length rounded up to a power of two, in chunks of about `budget` padded
+    entries. Yields (rows, positions): positions[r, j] is the j-th entry of rows[r], or -1
+    past its end. Fixed-width blocks turn every per-row sum into one batched matmul.
+    """
+    lengths = np.diff(indptr)
+    widths = 1 << np.ceil(np.log2(np.maximum(lengths, 1))).astype(np.int64)
+    for width in np.unique(widths):
+        rows = np.flatnonzero(widths == width)
+        per_chunk = max(1, budget // int(width))
+        for chunk in range(0, len(rows), per_chunk):
+            selected = rows[chunk:chunk + per_chunk]
+            offsets = np.arange(width)[None, :]
+            positions = indptr[selected][:, None] + offsets
+            yield selected, np.where(offsets < lengths[selected][:, None], positions, -1)
+
+
+def _solve(csr: _Csr, X: np.ndarray, Y: np.ndarray, regularization: float, alpha: float):
+    """
+    One half-step of implicit ALS (Hu, Koren & Volinsky): each row x_u of X minimizes
+    sum_i c_ui (p_ui - x_u . y_i)^2 + regularization * |x_u|^2, with p_ui = 1 for observed
+    entries and c_ui = 1 + alpha * r_ui. Solved in place by a few conjugate gradient steps
+    run for a whole block of rows at once, starting from the current X.
+    """
+    factors = X.shape[1]
+    YtY = Y.T @ Y + regularization * np.eye(factors, dtype=Y.dtype)
+    # Padding points at a zero factor row with confidence 1, so it adds nothing to any sum
+    padded_Y = np.vstack([Y, np.zeros((1, factors), Y.dtype)])
+    indices = np.r_[csr.indices, len(Y)]
+    confidences = np.r_[1 + alpha * csr.values, np.float32(1)]
+    for rows, positions in _padded_blocks(csr.indptr, ENTRIES_PER_BLOCK):
+        Yb = padded_Y[indices[positions]]  # (rows, width, factors)
+        confidence = confidences[positions]  # (rows, width)
+        x = X[rows]
+
+        def product(P):
+            # (YtY + Y_u^T (C_u - I) Y_u) p for every row, without forming the f x f matrices
+            weights = (confidence - 1) * np.matmul(Yb, P[:, :, None])[:, :, 0]
+            return P @ YtY + np.matmul(weights[:, None, :], Yb)[:, 0, :]
+
+        residual = np.matmul(confidence[:, None, :], Yb)[:, 0, :] - product(x)
+        direction = residual.copy()
+        norm = np.einsum("ij,ij->i", residual, residual)
+        for _ in range(CG_STEPS):
+            Ap = product(direction)
+            curvature = np.einsum("ij,ij->i", direction, Ap)
+            step = np.divide(norm, curvature, out=np.zeros_like(norm), where=curvature > 0)
+            x += step[:, None] * direction
+            residual -= step[:, None] * Ap
+            new_norm = np.einsum("ij,ij->i", residual, residual)
+            direction = residual + np.divide(new_norm, norm, out=np.zeros_like(norm), where=norm > 0)[:, None] * direction
+            norm = new_norm
+        X[rows] = x
+
+
+class FactorModel:
+    """User and song factor matrices; a user's scores are their row times every song's row"""
+
+    def __init__(self, user_ids: np.ndarray, user_factors: np.ndarray, song_ids: np.ndarray, song_factors: np.ndarray):
+        self.user_ids = user_ids
+        self.user_factors = user_factors
+        self.song_ids = song_ids
+        self.song_factors = song_factors
+
+    def has_user(self, user_id: int) -> bool:
+        i = int(np.searchsorted(self.user_ids, user_id))
+        return i < len(self.user_ids) and self.user_ids[i] == user_id
+
+    def recommend(self, user_id: int, limit: int, exclude: List[int] = ()) -> List[Tuple[int, float]]:
+        """(song id, score) of the best `limit` songs outside `exclude`, best first"""
+        if not self.has_user(user_id):
+            return []
+        user = self.user_factors[int(np.searchsorted(self.user_ids, user_id))]
+        # Brute force over every song: one matrix-vector product over the mapped factors
+        scores = self.song_factors @ user
+        exclude = np.asarray(exclude, np.int64)
+        positions = np.searchsorted(self.song_ids, exclude)
+        positions = positions[positions < len(self.song_ids)]
+        scores[positions[np.isin(self.song_ids[positions], exclude)]] = -np.inf
+        limit = min(limit, len(scores))
+        if limit == 0:
+            return []
+        top = np.argpartition(scores, len(scores) - limit)[-limit:]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        return list(zip(self.song_ids[top].tolist(), scores[top].tolist()))
+
+    def save(self, directory: Path) -> Path:
+        """Write a new set of .npy files, then point the manifest at them; returns the manifest"""
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = f"als-{time.time_ns()}"
+        arrays = {
+            "user_ids": self.user_ids, "user_factors": self.user_factors,
+            "song_ids": self.song_ids, "song_factors": self.song_factors,
+        }
+        for name, array in arrays.items():
+            np.save(directory / f"{stamp}.{name}.npy", array)
+        manifest = directory / MANIFEST
+        previous = _current_stamp(directory)
+        partial = directory / f".{MANIFEST}.{os.getpid()}.tmp"
+        partial.write_text(json.dumps({"stamp": stamp, "factors": self.user_factors.shape[1]}))
+        os.replace(partial, manifest)
+        # Workers that start together may train at once, so only the build this one replaced
+        # is removed, never another worker's; open maps keep working after unlink. Builds
+        # that lost such a race are never referenced and go once a rebuild interval old.
+        expired = time.time_ns() - int(settings.als_rebuild_interval * 1e9)
+        keep = {stamp, _current_stamp(directory)}
+        for path in directory.glob("als-*.npy"):
+            build = path.name.split(".")[0]
+            if build not in keep and (build == previous or int(build[4:]) < expired):
+                path.unlink(missing_ok=True)
+        return manifest
+
+    @classmethod
+    def load(cls, directory: Path) -> "FactorModel":
+        """Memory-map the current build: workers on one host share its pages"""
+        stamp = _current_stamp(directory)
+        if stamp is None:
+            raise FileNotFoundError(directory / MANIFEST)
+        arrays = [np.load(directory / f"{stamp}.{name}.npy", mmap_mode="r") for name in (
+            "user_ids", "user_factors", "song_ids", "song_factors"
+        )]
+        return cls(*arrays)
+
+
+def _current_stamp(directory: Path) -> Optional[str]:
+    try:
+        return json.loads((directory / MANIFEST).read_text())["stamp"]
+    except FileNotFoundError:
+        return None
+
+
+def train(
+    users: np.ndarray,
+    songs: np.ndarray,
+    preferences: np.ndarray,
+    factors: int = 32,
+    iterations: int = 10,
+    regularization: float = 0.05,
+    alpha: float = 10.0,
+    seed: int = 0,
+) -> FactorModel:
+    """Implicit-feedback ALS over (user, song, preference) triples; duplicates are summed"""
+    user_ids, user_index = np.unique(np.asarray(users, np.int64), return_inverse=True)
+    song_ids, song_index = np.unique(np.asarray(songs, np.int64), return_inverse=True)
+    preferences = np.asarray(preferences, np.float32)
+    # Sum repeated (user, song) entries, e.g. a song both liked and played
+    keys, inverse = np.unique(user_index * max(len(song_ids), 1) + song_index, return_inverse=True)
+    values = np.bincount(inverse, weights=preferences, minlength=len(keys)).astype(np.float32)
+    user_index, song_index = keys // max(len(song_ids), 1), keys % max(len(song_ids), 1)
+
+    by_user = _Csr(user_index, song_index, values, len(user_ids))
+    by_song = _Csr(song_index, user_index, values, len(song_ids))
+    rng = np.random.default_rng(seed)
+    X = (rng.standard_normal((len(user_ids), factors)) * 0.01).astype(np.float32)
+    Y = (rng.standard_normal((len(song_ids), factors)) * 0.01).astype(np.float32)
+    for _ in range(iterations):
+        _solve(by_user, X, Y, regularization, alpha)
+        _solve(by_song, Y, X, regularization, alpha)
+    return FactorModel(user_ids, X, song_ids, Y)
+
+
+class RecommendationService:
+    """Serves the latest factor model, memory-mapped, and remaps it when a new build lands"""
+
+    def __init__(self):
+        self.model: Optional[FactorModel] = None
+        self._loaded: Optional[Tuple[Path, float]] = None  # (manifest, mtime) the model was mapped from
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.recommendations_dir)
+
+    def rebuild(self, bind) -> FactorModel:
+        started = time.perf_counter()
+        with bind.connect() as conn:
+            users, songs, preferences = load_interactions(conn)
+        model = train(
+            users, songs, preferences,
+            factors=settings.als_factors,
+            iterations=settings.als_iterations,
+            regularization=settings.als_regularization,
+            alpha=settings.als_alpha,
+        )
+        model.save(self.directory)
+        logger.info(
+            f"Trained recommendations: {len(users)} interactions, {len(model.user_ids)} users, "
+            f"{len(model.song_ids)} songs in {time.perf_counter() - started:.1f}s"
+        )
+        return model
+
+    def rebuild_if_stale(self, bind):
+        # Same arrangement as the similar songs model: the first worker to see an old build retrains
+        try:
+            age = time.time() - (self.directory / MANIFEST).stat().st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is None or age >= settings.als_rebuild_interval:
+            self.rebuild(bind)
+
+    def get_model(self) -> Optional[FactorModel]:
+        manifest = self.directory / MANIFEST
+        try:
+            loaded = (manifest, manifest.stat().st_mtime)
+        except FileNotFoundError:
+            return None
+        if loaded != self._loaded:
+            with self._lock:
+                if loaded != self._loaded:
+                    try:
+                        self.model = FactorModel.load(self.directory)
+                        self._loaded = loaded
+                    except FileNotFoundError:
+                        # Replaced by a newer build between reading the manifest and mapping
+                        # the arrays; keep serving the current model and retry next time
+                        logger.warning("Recommendation build vanished while loading; keeping the previous one")
+        return self.model
+
+    def recommend(self, user_id: int, limit: int, exclude: List[int] = ()) -> List[Tuple[int, float]]:
+        model = self.get_model()
+        return model.recommend(user_id, limit, exclude) if model is not None else []
+
+
+recommendation_service = RecommendationService()
@@ -0,0 +1,165 @@
+import base64
+import random
+from typing import Callable, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.recommendations.similar import SimilarityModel
+
+# Seen-songs filter: 2048 bits and 7 hashes keep false positives near 1% for 200 songs.
+# Past that the filter starts over, so a song may come back after about 200 tracks.
+SEEN_BITS = 2048
+SEEN_HASHES = 7
+SEEN_CAPACITY = 200
+# Recent tracks whose neighbours are candidates for the next one, newest first
+TRAIL_LENGTH = 5
+# Hops of the random walk that looks further afield once the trail's neighbours are used up
+WALK_STEPS = 30
+# The next track is drawn, weighted by similarity, among this many best eligible candidates
+CHOICES = 5
+# Ids in a cursor must fit the model's int32 arrays
+MAX_ID = 2**31 - 1
+
+
+class SeenFilter:
+    """Bloom filter of the songs already queued, small enough to travel in a cursor"""
+
+    def __init__(self, bits: Optional[bytes] = None, count: int = 0):
+        self.bits = bytearray(bits) if bits is not None else bytearray(SEEN_BITS // 8)
+        self.count = count
+
+    def _positions(self, song_id: int) -> List[int]:
+        # Double hashing over two multiplicative hashes of the id, taking their well-mixed high bits
+        h1 = (song_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = (song_id * 0xC2B2AE3D27D4EB4F) & 0xFFFFFFFFFFFFFFFF
+        return [((h1 + i * h2) >> 32) % SEEN_BITS for i in range(SEEN_HASHES)]
+
+    def __contains__(self, song_id: int) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(song_id))
+
+    def add(self, song_id: int):
+        if self.count >= SEEN_CAPACITY:
+            self.bits = bytearray(SEEN_BITS // 8)
+            self.count = 0
+        for p in self._positions(song_id):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class RadioState:
+    """Everything needed to continue a radio queue: it is the cursor, nothing is kept server-side"""
+
+    def __init__(self, seed_id: int, position: int, trail: List[int], artists: List[int], seen: SeenFilter):
+        self.seed_id = seed_id
+        self.position = position  # tracks queued so far
+        self.trail = trail
+        self.artists = artists  # artists of the most recent tracks, newest first
+        self.seen = seen
+
+    @classmethod
+    def start(cls, seed_id: int, artist_id: Optional[int], artist_spacing: int) -> "RadioState":
+        """State before the first track: the seed counts as played"""
+        state = cls(seed_id, 0, [], [], SeenFilter())
+        state.push(seed_id, artist_id, artist_spacing)
+        state.position = 0
+        return state
+
+    def push(self, song_id: int, artist_id: Optional[int], artist_spacing: int):
+        self.trail = [song_id, *self.trail][:TRAIL_LENGTH]
+        if artist_id is not None:
+            self.artists = [artist_id, *self.artists][:max(artist_spacing - 1, 0)]
+        self.seen.add(song_id)
+        self.position += 1
+
+    def values(self) -> List:
+        bits = base64.urlsafe_b64encode(bytes(self.seen.bits)).decode("ascii")
+        return [self.seed_id, self.position, self.trail, self.artists, bits, self.seen.count]
+
+    @classmethod
+    def from_values(cls, values: List) -> "RadioState":
+        """Inverse of values(); raises ValueError on anything a client could have altered"""
+        seed_id, position, trail, artists, bits, count = values
+        if not isinstance(trail, list) or not isinstance(artists, list):
+            raise ValueError("malformed cursor")
+        if not all(isinstance(v, int) for v in [seed_id, position, count, *trail, *artists]):
+            raise ValueError("non-integer cursor field")
+        if not all(0 < v <= MAX_ID for v in [seed_id, *trail, *artists]):
+            raise ValueError("cursor id out of range")
+        if not trail or len(trail) > TRAIL_LENGTH or len(artists) > 100 or not isinstance(bits, str):
+            raise ValueError("malformed cursor")
+        raw = base64.urlsafe_b64decode(bits.encode("ascii"))
+        if len(raw) != SEEN_BITS // 8:
+            raise ValueError("malformed seen filter")
+        return cls(seed_id, position, trail, artists, SeenFilter(raw, count))
+
+
+def next_tracks(
+    model: Optional[SimilarityModel],
+    state: RadioState,
+    limit: int,
+    artist_spacing: int,
+    fallback: Callable[[], List[int]],
+) -> List[int]:
+    """
+    Extend the queue by up to `limit` songs, walking the similarity graph from the most
+    recent tracks. Each track looks at the neighbour lists of at most TRAIL_LENGTH songs,
+    so a page costs the same however long the radio has been playing.
+
+    A candidate is eligible when it is not in the seen filter and its artist is not among
+    the previous artist_spacing - 1 tracks. When the trail has no eligible neighbour,
+    `fallback` supplies song ids (the trending chart), and as a last resort the artist
+    spacing is dropped. The draw is seeded by the cursor position, so replaying a cursor
+    returns the same page.
+    """
+    rng = random.Random(f"{state.seed_id}:{state.position}")
+    tracks = []
+    fallback_candidates = None
+    while len(tracks) < limit:
+        spaced, unspaced = _candidates(state, _neighbourhood(model, state.trail, rng), model)
+        if not spaced:
+            if fallback_candidates is None:
+                fallback_candidates = [(song_id, 1.0) for song_id in fallback()]
+            spaced, _ = _candidates(state, [fallback_candidates], model)
+        choices = (spaced or unspaced)[:CHOICES]
+        if not choices:
+            break
+
+        song_id, _, artist = rng.choices(choices, weights=[max(score, 1e-6) for _, score, _ in choices])[0]
+        state.push(song_id, artist, artist_spacing)
+        tracks.append(song_id)
+    return tracks
+
+
+def _neighbourhood(model: Optional[SimilarityModel], trail: List[int], rng: random.Random) -> Iterable[List[Tuple[int, float]]]:
+    """
+    Neighbour lists of the trail, newest first, then along a short random walk from the
+    latest track, which leads out of a neighbourhood the radio has used up
+    """
+    if model is None:
+        return
+    for anchor in trail:
+        yield model.similar(anchor, settings.similar_songs_top_k)
+    node = trail[0] if trail else None
+    for _ in range(WALK_STEPS):
+        neighbours = model.similar(node, settings.similar_songs_top_k)
+        if not neighbours:
+            return
+        node = rng.choice(neighbours)[0]
+        yield model.similar(node, settings.similar_songs_top_k)
+
+
+def _candidates(state: RadioState, pools: Iterable[List[Tuple[int, float]]], model: Optional[SimilarityModel]):
+    """
+    (song id, score, artist id) of the unseen songs of the first pool that has any respecting
+    the artist spacing, and the unseen songs of the first pool that has any at all
+    """
+    unspaced = []
+    for pool in pools:
+        scored = [(song_id, score) for song_id, score in pool if song_id not in state.seen]
+        if not scored:
+            continue
+        artists = model.artists_of([song_id for song_id, _ in scored]) if model is not None else [None] * len(scored)
+        scored = [(song_id, score, artist) for (song_id, score), artist in zip(scored, artists)]
+        spaced = [c for c in scored if c[2] is None or c[2] not in state.artists]
+        if spaced:
+            return spaced, unspaced or scored
+        unspaced = unspaced or scored
+    return [], unspaced
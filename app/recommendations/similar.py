@@ -0,0 +1,279 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from app.config import settings
+from app.models.song import Song, SongStatus
+from app.models.liked_song import LikedSong
+from app.models.playlist import PlaylistSong
+
+logger = logging.getLogger(__name__)
+
+FILENAME = "similar_songs.npz"
+# Upper bound on the (song, song) pairs materialized at once while counting co-occurrences
+PAIRS_PER_PARTITION = 5_000_000
+READ_BATCH_SIZE = 50_000
+
+
+def load_baskets(conn) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (basket, song) pairs of approved songs: every user's likes form one basket and every
+    playlist another. Basket ids are only compared with each other, never stored.
+    """
+    likes = select(LikedSong.user_id, LikedSong.song_id).join(Song, Song.id == LikedSong.song_id).where(
+        Song.status == SongStatus.APPROVED
+    )
+    playlists = select(PlaylistSong.playlist_id, PlaylistSong.song_id).join(Song, Song.id == PlaylistSong.song_id).where(
+        Song.status == SongStatus.APPROVED
+    )
+    chunks = []
+    for source, query in enumerate([likes, playlists]):
+        result = conn.execution_options(yield_per=READ_BATCH_SIZE).execute(query)
+        for rows in result.partitions():
+            chunk = np.array(rows, dtype=np.int64).reshape(-1, 2)
+            # Likes and playlists get disjoint basket ids: the source goes in the high bits
+            chunk[:, 0] |= source << 40
+            chunks.append(chunk)
+    if not chunks:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    pairs = np.concatenate(chunks)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def load_artists(conn, song_ids: np.ndarray) -> np.ndarray:
+    """Artist id of each of the (sorted) song_ids; -1 for songs no longer in the catalog"""
+    artists = np.full(len(song_ids), -1, np.int32)
+    result = conn.execution_options(yield_per=READ_BATCH_SIZE).execute(select(Song.id, Song.artist_id))
+    for rows in result.partitions():
+        chunk = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        index = np.minimum(np.searchsorted(song_ids, chunk[:, 0]), max(len(song_ids) - 1, 0))
+        found = song_ids[index] == chunk[:, 0] if len(song_ids) else np.zeros(len(chunk), bool)
+        artists[index[found]] = chunk[found, 1]
+    return artists
+
+
+class SimilarityModel:
+    """
+    Top-K neighbours of every song in CSR layout: the neighbours of song_ids[i] are
+    neighbours[offsets[i]:offsets[i + 1]], best first, with their cosine scores.
+    Four flat arrays, about 8 bytes per neighbour, and a lookup is one binary search.
+    artist_ids, when present, holds the artist of every song in song_ids.
+    """
+
+    def __init__(
+        self,
+        song_ids: np.ndarray,
+        offsets: np.ndarray,
+        neighbours: np.ndarray,
+        scores: np.ndarray,
+        artist_ids: Optional[np.ndarray] = None,
+    ):
+        self.song_ids = song_ids
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.scores = scores
+        self.artist_ids = artist_ids
+
+    def __len__(self) -> int:
+        return len(self.song_ids)
+
+    def similar(self, song_id: int, limit: int) -> List[Tuple[int, float]]:
+        """(song id, score) of the most similar songs, best first"""
+        if not self._representable(song_id):
+            return []
+        # Searching with a matching dtype; a Python int would cast the whole array on every call
+        i = int(np.searchsorted(self.song_ids, self.song_ids.dtype.type(song_id)))
+        if i == len(self.song_ids) or self.song_ids[i] != song_id:
+            return []
+        start, end = self.offsets[i], min(self.offsets[i + 1], self.offsets[i] + limit)
+        return list(zip(self.neighbours[start:end].tolist(), self.scores[start:end].tolist()))
+
+    def artists_of(self, song_ids: List[int]) -> List[Optional[int]]:
+        """Artist of each song, None when unknown to the model"""
+        if self.artist_ids is None or not len(self.song_ids):
+            return [None] * len(song_ids)
+        representable = np.array([self._representable(song_id) for song_id in song_ids], dtype=bool)
+        song_ids = np.asarray([song_id if ok else 0 for song_id, ok in zip(song_ids, representable)], self.song_ids.dtype)
+        index = np.minimum(np.searchsorted(self.song_ids, song_ids), len(self.song_ids) - 1)
+        found = (self.song_ids[index] == song_ids) & representable
+        return [int(artist) if ok else None for artist, ok in zip(self.artist_ids[index].tolist(), found.tolist())]
+
+    def _representable(self, song_id) -> bool:
+        """Whether the id fits the dtype of song_ids; others cannot be in the model"""
+        info = np.iinfo(self.song_ids.dtype)
+        return isinstance(song_id, (int, np.integer)) and info.min <= song_id <= info.max
+
+    def save(self, path: Path):
+        """Write next to the target and rename, so readers never see a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(partial, "wb") as f:
+            arrays = dict(song_ids=self.song_ids, offsets=self.offsets, neighbours=self.neighbours, scores=self.scores)
+            if self.artist_ids is not None:
+                arrays["artist_ids"] = self.artist_ids
+            np.savez(f, **arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SimilarityModel":
+        with np.load(path) as data:
+            artist_ids = data["artist_ids"] if "artist_ids" in data.files else None
+            return cls(data["song_ids"], data["offsets"], data["neighbours"], data["scores"], artist_ids)
+
+
+def _rank_in_groups(keys: np.ndarray) -> np.ndarray:
+    """Position of every element within its run of equal keys (keys must be grouped)"""
+    if not len(keys):
+        return np.empty(0, np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+
+
+def build_model(
+    baskets: np.ndarray,
+    songs: np.ndarray,
+    top_k: int = 50,
+    min_count: int = 2,
+    max_basket: int = 500,
+    pairs_per_partition: int = PAIRS_PER_PARTITION,
+    seed: int = 0,
+) -> SimilarityModel:
+    """
+    Item-item cosine similarity, co(a, b) / sqrt(n(a) * n(b)), where co counts the baskets
+    holding both songs and n the baskets holding one. Pairs seen in fewer than min_count
+    baskets are dropped as noise, and baskets longer than max_basket are sampled down so
+    a few huge playlists cannot dominate (or blow up) the pair count.
+
+    Songs are split into ranges holding at most pairs_per_partition co-occurring pairs, and
+    each range is counted, scored and cut to its top_k neighbours before the next one, so
+    memory follows the partition size rather than the number of interactions.
+    """
+    song_ids, song_index = np.unique(np.asarray(songs, np.int64), return_inverse=True)
+    _, basket_index = np.unique(np.asarray(baskets, np.int64), return_inverse=True)
+    n_songs = len(song_ids)
+    # A song counts once per basket; the sorted keys also group baskets together
+    keys = np.unique(basket_index.astype(np.int64) * n_songs + song_index)
+    basket_index, items = keys // n_songs, keys % n_songs
+
+    order = np.lexsort((np.random.default_rng(seed).random(len(items)), basket_index))
+    keep = np.sort(order[_rank_in_groups(basket_index[order]) < max_basket])
+    basket_index, items = basket_index[keep], items[keep]
+
+    counts = np.bincount(items, minlength=n_songs)
+    basket_start = np.arange(len(items)) - _rank_in_groups(basket_index)
+    basket_size = np.bincount(basket_index)[basket_index]
+
+    # Elements grouped by song, so a range of songs is a contiguous slice of by_song
+    by_song = np.argsort(items, kind="stable")
+    song_offsets = np.r_[0, np.cumsum(counts)]
+    boundaries = _partition(np.bincount(items, weights=basket_size, minlength=n_songs), pairs_per_partition)
+
+    out_songs, out_neighbours, out_scores = [], [], []
+    for lo, hi in zip(boundaries[:-1], boundaries[1:]):
+        # Pair each element of the range with every member of its basket
+        elements = by_song[song_offsets[lo]:song_offsets[hi]]
+        sizes = basket_size[elements]
+        left = np.repeat(items[elements], sizes)
+        within = _rank_in_groups(np.repeat(np.arange(len(elements)), sizes))
+        right = items[np.repeat(basket_start[elements], sizes) + within]
+        distinct = left != right
+        pair_keys, co = np.unique(left[distinct] * n_songs + right[distinct], return_counts=True)
+        frequent = co >= min_count
+        pair_keys, co = pair_keys[frequent], co[frequent]
+        a, b = pair_keys // n_songs, pair_keys % n_songs
+        score = (co / np.sqrt(counts[a] * counts[b])).astype(np.float32)
+
+        # Best first within each song, ties to the more popular neighbour, then cut to top_k
+        order = np.lexsort((-counts[b], -score, a))
+        a, b, score = a[order], b[order], score[order]
+        top = _rank_in_groups(a) < top_k
+        out_songs.append(a[top])
+        out_neighbours.append(b[top])
+        out_scores.append(score[top])
+
+    a = np.concatenate(out_songs) if out_songs else np.empty(0, np.int64)
+    with_neighbours, per_song = np.unique(a, return_counts=True)
+    return SimilarityModel(
+        song_ids=song_ids[with_neighbours].astype(np.int32),
+        offsets=np.r_[0, np.cumsum(per_song)].astype(np.int64),
+        neighbours=song_ids[np.concatenate(out_neighbours)].astype(np.int32) if out_songs else np.empty(0, np.int32),
+        scores=np.concatenate(out_scores) if out_songs else np.empty(0, np.float32),
+    )
+
+
+def _partition(pairs_per_song: np.ndarray, budget: int) -> List[int]:
+    """Boundaries of consecutive song ranges of about `budget` pairs (one song may exceed it alone)"""
+    cumulative = np.cumsum(pairs_per_song)
+    boundaries = [0]
+    while boundaries[-1] < len(pairs_per_song):
+        start = boundaries[-1]
+        done = cumulative[start - 1] if start else 0
+        end = int(np.searchsorted(cumulative, done + budget, side="right"))
+        boundaries.append(max(end, start + 1))
+    return boundaries
+
+
+class SimilarSongsService:
+    """Serves the neighbour model from memory and reloads it when a rebuild replaces the file"""
+
+    def __init__(self):
+        self.model: Optional[SimilarityModel] = None
+        self._loaded: Optional[Tuple[Path, float]] = None  # (path, mtime) the model was read from
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return Path(settings.recommendations_dir) / FILENAME
+
+    def rebuild(self, bind) -> SimilarityModel:
+        started = time.perf_counter()
+        with bind.connect() as conn:
+            baskets, songs = load_baskets(conn)
+            model = build_model(
+                baskets, songs,
+                top_k=settings.similar_songs_top_k,
+                min_count=settings.similar_songs_min_count,
+                max_basket=settings.similar_songs_max_basket,
+            )
+            # Song radio spaces out artists without a database lookup per track
+            model.artist_ids = load_artists(conn, model.song_ids)
+        model.save(self.path)
+        logger.info(
+            f"Built similar songs model: {len(baskets)} interactions, {len(model)} songs, "
+            f"{len(model.neighbours)} neighbours in {time.perf_counter() - started:.1f}s"
+        )
+        return model
+
+    def rebuild_if_stale(self, bind):
+        # Every worker schedules this; whoever finds the file older than the interval rebuilds it
+        # and the others pick the new file up in get_model
+        try:
+            age = time.time() - self.path.stat().st_mtime
+        except FileNotFoundError:
+            age = None
+        if age is None or age >= settings.similar_songs_rebuild_interval:
+            self.rebuild(bind)
+
+    def get_model(self) -> Optional[SimilarityModel]:
+        path = self.path
+        try:
+            loaded = (path, path.stat().st_mtime)
+        except FileNotFoundError:
+            return None
+        if loaded != self._loaded:
+            with self._lock:
+                if loaded != self._loaded:
+                    self.model = SimilarityModel.load(path)
+                    self._loaded = loaded
+        return self.model
+
+    def similar(self, song_id: int, limit: int) -> List[Tuple[int, float]]:
+        model = self.get_model()
+        return model.similar(song_id, limit) if model is not None else []
+
+
+similar_songs_service = SimilarSongsService()
@@ -0,0 +1,273 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import Request, Response
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.config import settings
+from app.metrics import registry
+from app.cache_store import create_store
+from app.models.cache_invalidation import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+# Each sync re-reads invalidations this recent, so one whose transaction started (and was
+# timestamped) before the previous sync but committed after it is still applied
+OVERLAP_SECONDS = 60
+# Invalidation rows older than this are deleted; by then every worker has applied them
+RETENTION = timedelta(hours=1)
+PRUNE_INTERVAL = 60
+# Invalidation times are remembered this long; a response whose request took longer is not stored
+INVALIDATION_WINDOW = 60
+
+cache_requests = registry.counter(
+    "response_cache_requests_total",
+    "Cacheable GET responses by outcome (hit or miss)",
+    labelnames=("result",)
+)
+cache_evictions = registry.counter(
+    "response_cache_evictions_total",
+    "Responses dropped from the in-process cache to stay within response_cache_max_bytes"
+)
+
+
+def _encode(media_type: str, tags: Tuple[str, ...], built_at: float, body: bytes) -> bytes:
+    return json.dumps([media_type, tags, built_at]).encode("utf-8") + b"\n" + body
+
+
+def _decode(data: bytes) -> Tuple[str, List[str], float, bytes]:
+    header, body = data.split(b"\n", 1)
+    media_type, tags, built_at = json.loads(header)
+    return media_type, tags, built_at, body
+
+
+def _tag_key(tag: str) -> str:
+    return f"response-tag:{tag}"
+
+
+class ResponseCache:
+    """
+    Encoded GET responses keyed by path and query, each with the tags of the rows it was
+    built from, in the store chosen by response_cache_backend (app.cache_store).
+
+    In memory, an index from tag to keys drops exactly the responses that showed a change;
+    other workers' changes arrive through cache_invalidations (sync). With Redis, every
+    worker shares the entries, invalidating a tag records its time under a tag key, and a
+    hit built before one of its tags was invalidated is dropped instead of served.
+
+    A response is only stored if none of its own tags was invalidated while it was built,
+    so unrelated writes never keep other responses out of the cache.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._tags_by_key: Dict[str, Tuple[str, ...]] = {}
+        self._invalidated: Dict[str, float] = {}  # tag -> time it was last invalidated here
+        # Reentrant: storing an entry can evict others, whose removal takes the lock again
+        self._lock = threading.RLock()
+        self._since: Optional[datetime] = None
+        self._seen: Dict[int, datetime] = {}
+        self._pruned_at = 0.0
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = create_store(
+                settings.response_cache_backend, settings.response_cache_max_bytes, "Response cache",
+                cache_evictions, self._forget
+            )
+        return self._store
+
+    @property
+    def shared(self) -> bool:
+        return self.store.name == "redis"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        data = self.store.get(key)
+        if data is None:
+            return None
+        media_type, tags, built_at, body = _decode(data)
+        if self.shared and tags:
+            invalidated = self.store.get_many([_tag_key(tag) for tag in tags])
+            if any(at is not None and float(at) >= built_at for at in invalidated):
+                self.store.delete(key)
+                return None
+        return body, media_type
+
+    def set(self, key: str, body: bytes, media_type: str, tags: Iterable[str], ttl: int, started_at: float):
+        """Store a response unless one of its tags was invalidated since its request started"""
+        tags = tuple(tags)
+        if time.time() - started_at > INVALIDATION_WINDOW:
+            return
+        with self._lock:
+            if any(self._invalidated.get(tag, 0) >= started_at for tag in tags):
+                return
+            self.store.set(key, _encode(media_type, tags, started_at, body), ttl)
+            if not self.shared and key in self.store:
+                self._unindex(key)
+                self._tags_by_key[key] = tags
+                for tag in tags:
+                    self._keys_by_tag.setdefault(tag, set()).add(key)
+
+    def _forget(self, key: str):
+        """Called by the in-memory store for entries it evicted or found expired"""
+        with self._lock:
+            if key not in self.store:
+                self._unindex(key)
+
+    def _unindex(self, key: str):
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, *tags: str):
+        now = time.time()
+        with self._lock:
+            for tag in tags:
+                self._invalidated[tag] = now
+            if len(self._invalidated) > 10_000:
+                self._prune_invalidated(now)
+            if self.shared:
+                keys = []
+            else:
+                keys = {key for tag in tags for key in self._keys_by_tag.get(tag, ())}
+                for key in keys:
+                    self._unindex(key)
+        if self.shared:
+            for tag in tags:
+                self.store.set(_tag_key(tag), repr(now).encode("ascii"), INVALIDATION_WINDOW + settings.response_cache_ttl)
+        else:
+            self.store.delete(*keys)
+
+    def _prune_invalidated(self, now: float):
+        self._invalidated = {tag: at for tag, at in self._invalidated.items() if at >= now - INVALIDATION_WINDOW}
+
+    def sync(self, bind):
+        """Apply invalidations committed by other workers, and prune old ones once a minute"""
+        with self._lock:
+            self._prune_invalidated(time.time())
+        if self.shared:
+            return  # Redis tag keys already reach every worker
+        if self._since is None:
+            self._since = datetime.now(timezone.utc)
+        since = self._since - timedelta(seconds=OVERLAP_SECONDS)
+        with bind.connect() as conn:
+            rows = conn.execute(
+                select(CacheInvalidation.id, CacheInvalidation.tag, CacheInvalidation.created_at)
+                .where(CacheInvalidation.created_at >= since)
+            ).all()
+        tags = []
+        for invalidation_id, tag, created_at in rows:
+            if invalidation_id in self._seen:
+                continue
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            self._seen[invalidation_id] = created_at
+            self._since = max(self._since, created_at)
+            tags.append(tag)
+        if tags:
+            self.invalidate(*tags)
+        self._seen = {invalidation_id: at for invalidation_id, at in self._seen.items() if at >= since}
+
+        if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+            self._pruned_at = time.monotonic()
+            with bind.begin() as conn:
+                conn.execute(delete(CacheInvalidation).where(
+                    CacheInvalidation.created_at < datetime.now(timezone.utc) - RETENTION
+                ))
+
+    def clear(self):
+        with self._lock:
+            self.store.clear()
+            self._keys_by_tag.clear()
+            self._tags_by_key.clear()
+            self._invalidated.clear()
+
+    def stats(self) -> Dict[str, object]:
+        hits, misses = cache_requests.value(result="hit"), cache_requests.value(result="miss")
+        return {
+            "backend": self.store.name,
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "tags": len(self._keys_by_tag),
+            **self.store.stats(),
+        }
+
+
+response_cache = ResponseCache()
+registry.gauge(
+    "response_cache_bytes", "Size of the in-process response cache",
+    func=lambda: response_cache.store.stats().get("bytes", 0)
+)
+
+
+def cache_response(request: Request, *tags: str):
+    """Mark the route's successful response as cacheable, to be dropped when any tag is invalidated"""
+    request.state.cache_tags = tags
+
+
+def invalidate_cache(db: Session, *tags: str):
+    """
+    Invalidate tags once the caller's transaction commits. With the in-memory backend, the
+    cache_invalidations rows written here carry them to the other workers' next sync.
+    """
+    if not tags:
+        return
+    if not response_cache.shared:
+        db.execute(insert(CacheInvalidation), [{"tag": tag} for tag in tags])
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop("cache_tags", None)
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Serves GET responses of routes that called cache_response() from memory. The key is the
+    path and the sorted query string; only 200 responses are stored, for response_cache_ttl
+    seconds at most.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method != "GET" or not settings.response_cache_enabled:
+            return await call_next(request)
+
+        query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+        key = f"{request.url.path}?{query}"
+        cached = response_cache.get(key)
+        if cached is not None:
+            cache_requests.inc(result="hit")
+            body, media_type = cached
+            return Response(content=body, media_type=media_type, headers={"X-Cache": "HIT"})
+
+        started_at = time.time()
+        response = await call_next(request)
+        tags = getattr(request.state, "cache_tags", None)
+        if tags is None or response.status_code != 200:
+            return response
+
+        cache_requests.inc(result="miss")
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        media_type = response.headers.get("content-type", "application/json")
+        response_cache.set(key, body, media_type, tags, settings.response_cache_ttl, started_at)
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        headers["X-Cache"] = "MISS"
+        return Response(content=body, status_code=response.status_code, headers=headers)
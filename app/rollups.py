@@ -0,0 +1,162 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import BigInteger, Integer, cast, delete, extract, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.song import Song
+from app.models.liked_song import LikedSong
+from app.models.play_event import PlayEvent
+from app.models.stat_rollup import StatRollup, RollupWatermark
+from app.listeners import refresh_listener_sketches
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+ENTITY_TYPES = ("song", "artist", "genre", "platform")
+# Most buckets one timeseries request may span (a month of hours)
+MAX_POINTS = 744
+# Hours aggregated per transaction when catching up on a backlog, e.g. on the first run
+HOURS_PER_TRANSACTION = 24 * 7
+
+
+class TimeRange:
+    """Inclusive range of buckets of one granularity"""
+
+    def __init__(self, granularity: str, start: datetime, end: datetime):
+        self.granularity = granularity
+        self.seconds = GRANULARITIES[granularity]
+        self.first = int(_as_utc(start).timestamp()) // self.seconds
+        self.last = int(_as_utc(end).timestamp()) // self.seconds
+
+    def __len__(self) -> int:
+        return max(self.last - self.first + 1, 0)
+
+    def bucket_start(self, bucket: int) -> datetime:
+        return datetime.fromtimestamp(bucket * self.seconds, timezone.utc)
+
+
+def _as_utc(moment: datetime) -> datetime:
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def _epoch_seconds(column, dialect: str):
+    if dialect == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(extract("epoch", column), BigInteger)
+
+
+def _rollup_hours(db: Session, dialect: str, first: int, last: int):
+    """Recompute every hour row in [first, last] from play_events and liked_songs"""
+    # Timestamps are compared with a second of slack (SQLite compares them as text) so the
+    # indexes narrow the scan; the bucket test is what decides membership
+    lower = datetime.fromtimestamp(first * 3600 - 1, timezone.utc)
+    upper = datetime.fromtimestamp((last + 1) * 3600 + 1, timezone.utc)
+    sources = []
+    for column, song_id, plays, likes in [
+        (PlayEvent.played_at, PlayEvent.song_id, 1, 0),
+        (LikedSong.liked_at, LikedSong.song_id, 0, 1),
+    ]:
+        bucket = _epoch_seconds(column, dialect) // 3600
+        sources.append(
+            select(bucket.label("bucket"), song_id.label("song_id"), literal(plays).label("plays"), literal(likes).label("likes"))
+            .where(column >= lower, column < upper, bucket.between(first, last))
+        )
+    events = union_all(*sources).cte("events")
+
+    db.execute(delete(StatRollup).where(StatRollup.granularity == "hour", StatRollup.bucket.between(first, last)))
+    entities = {"song": events.c.song_id, "artist": Song.artist_id, "genre": Song.genre_id, "platform": None}
+    for entity_type, entity in entities.items():
+        query = select(
+            literal(entity_type), entity if entity is not None else literal(0), literal("hour"),
+            events.c.bucket, func.sum(events.c.plays), func.sum(events.c.likes)
+        ).select_from(events.join(Song, Song.id == events.c.song_id))
+        if entity is not None:
+            query = query.where(entity.isnot(None)).group_by(events.c.bucket, entity)
+        else:
+            query = query.group_by(events.c.bucket)
+        db.execute(insert(StatRollup).from_select(
+            ["entity_type", "entity_id", "granularity", "bucket", "plays", "likes"], query
+        ))
+
+
+def _rollup_days(db: Session, first: int, last: int):
+    """Recompute the day rows in [first, last] by summing their hour rows"""
+    db.execute(delete(StatRollup).where(StatRollup.granularity == "day", StatRollup.bucket.between(first, last)))
+    day = StatRollup.bucket // 24
+    query = select(
+        StatRollup.entity_type, StatRollup.entity_id, literal("day"), day,
+        func.sum(StatRollup.plays), func.sum(StatRollup.likes)
+    ).where(
+        StatRollup.granularity == "hour", StatRollup.bucket.between(first * 24, last * 24 + 23)
+    ).group_by(StatRollup.entity_type, StatRollup.entity_id, day)
+    db.execute(insert(StatRollup).from_select(
+        ["entity_type", "entity_id", "granularity", "bucket", "plays", "likes"], query
+    ))
+
+
+def _first_event_hour(db: Session) -> Optional[int]:
+    firsts = [
+        db.execute(select(func.min(PlayEvent.played_at))).scalar(),
+        db.execute(select(func.min(LikedSong.liked_at))).scalar(),
+    ]
+    firsts = [_as_utc(moment) for moment in firsts if moment is not None]
+    return int(min(firsts).timestamp()) // 3600 if firsts else None
+
+
+def refresh_rollups(bind=None):
+    """
+    Bring the hour and day rollups up to date. Every run re-aggregates the hours from
+    `stats_rollup_reopen_hours` before the watermark up to the current hour, so plays and
+    likes that commit late or land in the still-open hour are picked up next time. Only
+    those buckets are rewritten; the day rows covering them are re-summed from hour rows.
+    The listeners of those hours are added to the day listener sketches in the same transaction.
+    """
+    db = Session(bind=bind) if bind is not None else SessionLocal()
+    try:
+        dialect = db.get_bind().dialect.name
+        current = int(time.time()) // 3600
+        while True:
+            # The row lock keeps workers from refilling the same buckets at once
+            watermark = db.execute(
+                select(RollupWatermark).where(RollupWatermark.name == "stats").with_for_update()
+            ).scalar_one()
+            if watermark.hour is None:
+                first = _first_event_hour(db)
+                if first is None:
+                    db.rollback()
+                    return
+            else:
+                first = max(watermark.hour - settings.stats_rollup_reopen_hours, 0)
+            last = min(first + HOURS_PER_TRANSACTION - 1, current)
+
+            started = time.perf_counter()
+            _rollup_hours(db, dialect, first, last)
+            _rollup_days(db, first // 24, last // 24)
+            refresh_listener_sketches(db, first, last)
+            watermark.hour = last
+            db.commit()
+            logger.debug(f"Rolled up hours {first}-{last} in {time.perf_counter() - started:.2f}s")
+            if last >= current:
+                return
+    finally:
+        db.close()
+
+
+def timeseries(db: Session, entity_type: str, entity_id: int, time_range: TimeRange) -> List[Dict]:
+    """Plays and likes per bucket of the range, zero-filled, oldest first"""
+    rows = db.execute(
+        select(StatRollup.bucket, StatRollup.plays, StatRollup.likes).where(
+            StatRollup.entity_type == entity_type,
+            StatRollup.entity_id == entity_id,
+            StatRollup.granularity == time_range.granularity,
+            StatRollup.bucket.between(time_range.first, time_range.last)
+        )
+    ).all()
+    counts = {bucket: (plays, likes) for bucket, plays, likes in rows}
+    return [
+        {"start": time_range.bucket_start(bucket), "plays": counts.get(bucket, (0, 0))[0], "likes": counts.get(bucket, (0, 0))[1]}
+        for bucket in range(time_range.first, time_range.last + 1)
+    ]
@@ -1,16 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
 from app.database import get_db
 from app.models.song import Song, SongStatus
 from app.models.user import User, UserRole
 from app.models.genre import Genre
 from app.models.comment import Comment
+from app.models.deletion_job import DeletionJob, DeletionJobStatus
+from app.models.earnings import PayoutRate
 from app.schemas.song import SongResponse
 from app.schemas.genre import GenreCreate, GenreUpdate, GenreResponse
 from app.schemas.user import UserResponse
+from app.schemas.batch import SongIdBatch, BatchResult
+from app.schemas.deletion_job import DeletionJobResponse
+from app.schemas.stats import StatsTimeseries, ListenerStats
+from app.schemas.earnings import PayoutRateCreate, PayoutRateResponse
 from app.auth import require_admin
+from app.search import suggest_service, bump_catalog_version
+from app.rollups import TimeRange, timeseries
+from app.stats_params import time_range, day_range
+from app.listeners import listener_stats
+from app.response_cache import invalidate_cache
+from app.earnings import closed_until
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -41,6 +54,7 @@ def toggle_user_status(
         )
     
     user.is_active = not user.is_active
+    invalidate_cache(db, f"user:{user_id}", "artists")
     db.commit()
     
     return {"message": f"User {'activated' if user.is_active else 'deactivated'} successfully"}
@@ -74,6 +88,7 @@ def change_user_role(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid role"
         )
+    invalidate_cache(db, f"user:{user_id}", "artists")
     db.commit()
     
     return {"message": f"User role changed to {new_role} successfully"}
@@ -118,6 +133,7 @@ def approve_song(
         )
     
     song.status = SongStatus.APPROVED
+    invalidate_cache(db, f"song:{song_id}", "songs")
     db.commit()
     
     return {"message": "Song approved successfully"}
@@ -137,11 +153,50 @@ def reject_song(
         )
     
     song.status = SongStatus.REJECTED
+    invalidate_cache(db, f"song:{song_id}", "songs")
     db.commit()
     
     return {"message": "Song rejected successfully"}
 
 
+def _set_songs_status(db: Session, batch: SongIdBatch, new_status: SongStatus, outcome: str) -> BatchResult:
+    song_ids = batch.unique_ids()
+    found = {song_id for (song_id,) in db.query(Song.id).filter(Song.id.in_(song_ids))}
+    
+    if found:
+        db.execute(
+            update(Song).where(Song.id.in_(found)).values(status=new_status),
+            execution_options={"synchronize_session": False}
+        )
+        # Bulk UPDATE bypasses the ORM hooks that invalidate cached search results...
+        bump_catalog_version(db)
+        invalidate_cache(db, "songs", *(f"song:{song_id}" for song_id in sorted(found)))
+    db.commit()
+    # ...and keep typeahead in sync
+    suggest_service.mark_stale("song", found)
+    
+    outcomes = {song_id: outcome if song_id in found else "not_found" for song_id in song_ids}
+    return BatchResult.from_outcomes(song_ids, outcomes, success=[outcome])
+
+
+@router.post("/songs/batch-approve", response_model=BatchResult)
+def approve_songs(
+    batch: SongIdBatch,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    return _set_songs_status(db, batch, SongStatus.APPROVED, "approved")
+
+
+@router.post("/songs/batch-reject", response_model=BatchResult)
+def reject_songs(
+    batch: SongIdBatch,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    return _set_songs_status(db, batch, SongStatus.REJECTED, "rejected")
+
+
 @router.delete("/songs/{song_id}")
 def force_delete_song(
     song_id: int,
@@ -160,6 +215,7 @@ def force_delete_song(
     # s3_service.delete_file(file_key)
     
     db.delete(song)
+    invalidate_cache(db, f"song:{song_id}", "songs")
     db.commit()
     
     return {"message": "Song deleted successfully"}
@@ -201,6 +257,7 @@ def create_genre(
     
     new_genre = Genre(name=genre_data.name)
     db.add(new_genre)
+    invalidate_cache(db, "genres")
     db.commit()
     db.refresh(new_genre)
     
@@ -233,6 +290,7 @@ def update_genre(
         )
     
     genre.name = genre_data.name
+    invalidate_cache(db, f"genre:{genre_id}", "genres")
     db.commit()
     db.refresh(genre)
     
@@ -261,11 +319,42 @@ def delete_genre(
         )
     
     db.delete(genre)
+    invalidate_cache(db, f"genre:{genre_id}", "genres")
     db.commit()
     
     return {"message": "Genre deleted successfully"}
 
 
+# Account deletion jobs
+@router.get("/deletion-jobs", response_model=List[DeletionJobResponse])
+def list_deletion_jobs(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin),
+    status_filter: Optional[DeletionJobStatus] = Query(None, alias="status"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500)
+):
+    query = db.query(DeletionJob)
+    if status_filter:
+        query = query.filter(DeletionJob.status == status_filter)
+    return query.order_by(DeletionJob.id.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/deletion-jobs/{job_id}", response_model=DeletionJobResponse)
+def get_deletion_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    job = db.query(DeletionJob).filter(DeletionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    return job
+
+
 # Platform statistics
 @router.get("/dashboard/stats")
 def get_platform_stats(
@@ -295,4 +384,74 @@ def get_platform_stats(
         "total_plays": total_plays,
         "recent_users": [{"id": u.id, "username": u.username, "created_at": u.created_at} for u in recent_users],
         "recent_songs": [{"id": s.id, "title": s.title, "artist_id": s.artist_id, "created_at": s.created_at} for s in recent_songs]
-    } 
\ No newline at end of file
+    }
+
+
+@router.get("/dashboard/timeseries", response_model=StatsTimeseries)
+def get_platform_timeseries(
+    entity_type: str = Query("platform", pattern="^(platform|genre|artist|song)$"),
+    entity_id: int = Query(0, description="Genre, artist or song id; ignored for platform"),
+    time_range: TimeRange = Depends(time_range),
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    """Plays and likes per hour or day of the platform or one genre, artist or song"""
+    if entity_type == "platform":
+        entity_id = 0
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "granularity": time_range.granularity,
+        "points": timeseries(db, entity_type, entity_id, time_range)
+    }
+
+
+@router.get("/dashboard/listeners", response_model=ListenerStats)
+def get_platform_listeners(
+    entity_type: str = Query("platform", pattern="^(platform|artist|song)$"),
+    entity_id: int = Query(0, description="Artist or song id; ignored for platform"),
+    day_range: TimeRange = Depends(day_range),
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    """Approximate unique signed-in listeners per day and over the range (about 1% error)"""
+    if entity_type == "platform":
+        entity_id = 0
+    return listener_stats(db, entity_type, entity_id, day_range)
+
+
+# Payout rates
+@router.get("/payout-rates", response_model=List[PayoutRateResponse])
+def list_payout_rates(
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    return db.query(PayoutRate).order_by(PayoutRate.effective_from).all()
+
+
+@router.post("/payout-rates", response_model=PayoutRateResponse, status_code=status.HTTP_201_CREATED)
+def create_payout_rate(
+    rate_data: PayoutRateCreate,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_admin)
+):
+    """Add a rate per play from effective_from on; months already closed cannot be repriced"""
+    closed = closed_until(db)
+    if closed is not None and rate_data.effective_from < closed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Earnings are closed until {closed.isoformat()}"
+        )
+
+    rate = PayoutRate(effective_from=rate_data.effective_from, rate_per_play=rate_data.rate_per_play)
+    db.add(rate)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A rate already takes effect on that date"
+        )
+    db.refresh(rate)
+    return rate
@@ -1,16 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import date
 from app.database import get_db
 from app.models.song import Song, SongStatus
 from app.models.album import Album
 from app.models.lyrics import Lyrics
+from app.models.earnings import EarningsStatement, EarningsStatementLine
 from app.models.user import User
 from app.schemas.song import SongResponse, SongCreate, SongWithDetails
 from app.schemas.album import AlbumResponse, AlbumCreate, AlbumUpdate
 from app.schemas.lyrics import LyricsCreate, LyricsResponse
+from app.schemas.stats import StatsTimeseries, ListenerStats
+from app.schemas.earnings import EarningsResponse, EarningsStatementResponse
 from app.auth import require_artist
 from app.local_file_service import local_file_service
+from app.search import index_lyrics
+from app.rollups import TimeRange, timeseries
+from app.stats_params import time_range, day_range
+from app.listeners import listener_stats
+from app.response_cache import invalidate_cache
+from app.earnings import artist_earnings
+from app.config import settings
 import os
 
 router = APIRouter(prefix="/artist", tags=["Artist"])
@@ -82,6 +93,7 @@ def delete_song(
     
     # Delete song from database
     db.delete(song)
+    invalidate_cache(db, f"song:{song_id}", "songs")
     db.commit()
     
     return {"message": "Song deleted successfully"}
@@ -101,6 +113,7 @@ def create_album(
     )
     
     db.add(new_album)
+    invalidate_cache(db, "albums")
     db.commit()
     db.refresh(new_album)
     
@@ -133,6 +146,7 @@ def update_album(
     if album_data.release_date is not None:
         album.release_date = album_data.release_date
     
+    invalidate_cache(db, f"album:{album_id}", "albums")
     db.commit()
     db.refresh(album)
     return album
@@ -164,6 +178,7 @@ def delete_album(
         )
     
     db.delete(album)
+    invalidate_cache(db, f"album:{album_id}", "albums")
     db.commit()
     
     return {"message": "Album deleted successfully"}
@@ -221,6 +236,9 @@ def add_or_update_lyrics(
     # Check if lyrics already exist
     existing_lyrics = db.query(Lyrics).filter(Lyrics.song_id == song_id).first()
     
+    # Positional index for /search/lyrics, written in the same transaction as the text
+    index_lyrics(db, song_id, lyrics_data.text)
+    
     if existing_lyrics:
         # Update existing lyrics
         existing_lyrics.text = lyrics_data.text
@@ -264,23 +282,100 @@ def get_artist_stats(
     }
 
 
-@router.get("/dashboard/earnings")
-def get_earnings(
+@router.get("/dashboard/timeseries", response_model=StatsTimeseries)
+def get_artist_timeseries(
+    song_id: Optional[int] = Query(None, description="One of your songs; all of them when omitted"),
+    time_range: TimeRange = Depends(time_range),
     current_user: User = Depends(require_artist),
     db: Session = Depends(get_db)
 ):
-    # Get artist's songs
-    songs = db.query(Song).filter(Song.artist_id == current_user.id).all()
-    total_plays = sum(song.play_count for song in songs)
+    """Plays and likes per hour or day, read from the rollups (up to a minute behind)"""
+    if song_id is not None and not db.query(Song.id).filter(Song.id == song_id, Song.artist_id == current_user.id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found or you don't have permission to view it"
+        )
     
-    # Placeholder calculation: $0.003 per play
-    earnings_per_play = 0.003
-    estimated_earnings = total_plays * earnings_per_play
+    entity_type, entity_id = ("song", song_id) if song_id is not None else ("artist", current_user.id)
+    return {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "granularity": time_range.granularity,
+        "points": timeseries(db, entity_type, entity_id, time_range)
+    }
+
+
+@router.get("/dashboard/listeners", response_model=ListenerStats)
+def get_artist_listeners(
+    song_id: Optional[int] = Query(None, description="One of your songs; all of them when omitted"),
+    day_range: TimeRange = Depends(day_range),
+    current_user: User = Depends(require_artist),
+    db: Session = Depends(get_db)
+):
+    """Approximate unique signed-in listeners per day and over the range (about 1% error)"""
+    if song_id is not None and not db.query(Song.id).filter(Song.id == song_id, Song.artist_id == current_user.id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found or you don't have permission to view it"
+        )
     
+    entity_type, entity_id = ("song", song_id) if song_id is not None else ("artist", current_user.id)
+    return listener_stats(db, entity_type, entity_id, day_range)
+
+
+@router.get("/dashboard/earnings", response_model=EarningsResponse)
+def get_earnings(
+    current_user: User = Depends(require_artist),
+    db: Session = Depends(get_db)
+):
+    """
+    Settled earnings from the artist's monthly statements, plus an estimate for the months
+    not closed yet at the current rate per play
+    """
+    earnings = artist_earnings(db, current_user.id, date.today())
     return {
-        "total_plays": total_plays,
-        "earnings_per_play": earnings_per_play,
-        "estimated_earnings": round(estimated_earnings, 2),
-        "currency": "USD",
-        "note": "These are estimated earnings. Actual earnings may vary."
-    } 
\ No newline at end of file
+        "total_plays": earnings["settled_plays"] + earnings["pending_plays"],
+        "earnings_per_play": earnings["rate_per_play"],
+        "estimated_earnings": earnings["settled_earnings"] + earnings["pending_earnings"],
+        "settled_plays": earnings["settled_plays"],
+        "settled_earnings": earnings["settled_earnings"],
+        "pending_plays": earnings["pending_plays"],
+        "pending_earnings": earnings["pending_earnings"],
+        "currency": settings.earnings_currency,
+        "statements": earnings["statements"],
+        "note": "Pending earnings are estimated at today's rate and become final when the month is closed."
+    }
+
+
+@router.get("/dashboard/earnings/statements/{statement_id}", response_model=EarningsStatementResponse)
+def get_earnings_statement(
+    statement_id: int,
+    current_user: User = Depends(require_artist),
+    db: Session = Depends(get_db)
+):
+    statement = db.query(EarningsStatement).filter(
+        EarningsStatement.id == statement_id,
+        EarningsStatement.artist_id == current_user.id
+    ).first()
+    if not statement:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Statement not found"
+        )
+
+    lines = db.query(
+        EarningsStatementLine.song_id, Song.title, EarningsStatementLine.plays, EarningsStatementLine.amount
+    ).outerjoin(Song, Song.id == EarningsStatementLine.song_id).filter(
+        EarningsStatementLine.statement_id == statement.id
+    ).order_by(EarningsStatementLine.amount.desc(), EarningsStatementLine.song_id).all()
+    return {
+        "id": statement.id,
+        "period_start": statement.period_start,
+        "plays": statement.plays,
+        "amount": statement.amount,
+        "created_at": statement.created_at,
+        "lines": [
+            {"song_id": song_id, "title": title, "plays": plays, "amount": amount}
+            for song_id, title, plays, amount in lines
+        ]
+    }
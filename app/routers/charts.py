@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db
+from app.models.song import Song, SongStatus
+from app.models.genre import Genre
+from app.schemas.chart import TrendingSong
+from app.song_details import song_details_query, to_song_details
+from app.charts import trending_charts
+
+router = APIRouter(prefix="/charts", tags=["Charts"])
+
+
+@router.get("/trending", response_model=List[TrendingSong])
+def get_trending(
+    db: Session = Depends(get_db),
+    genre_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=50)
+):
+    """Most played songs right now, with recent plays counting more than old ones"""
+    if genre_id is not None and not db.get(Genre, genre_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Genre not found"
+        )
+    
+    trending_charts.ensure_ready(db.get_bind())
+    # A few spare entries cover songs unapproved or moved to another genre since they were played
+    ranked = trending_charts.trending(limit + 10, genre_id)
+    query = song_details_query(db).filter(
+        Song.id.in_([song_id for song_id, _ in ranked]),
+        Song.status == SongStatus.APPROVED
+    )
+    if genre_id is not None:
+        query = query.filter(Song.genre_id == genre_id)
+    found = {row[0].id: row for row in query.all()}
+    
+    return [
+        TrendingSong(song=to_song_details(found[song_id]), score=score)
+        for song_id, score in ranked if song_id in found
+    ][:limit]
@@ -1,19 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import insert, delete, func, and_
 from typing import List, Optional
+from app.config import settings
 from app.database import get_db
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.models.song import Song, SongStatus
 from app.models.album import Album
 from app.models.genre import Genre
 from app.models.playlist import Playlist, PlaylistSong
 from app.schemas.user import UserResponse
-from app.schemas.song import SongResponse, SongWithDetails
+from app.schemas.song import SongWithDetails
 from app.schemas.album import AlbumResponse
 from app.schemas.genre import GenreResponse
-from app.schemas.playlist import PlaylistResponse, PlaylistWithSongs, PlaylistCreate, PlaylistUpdate, AddSongToPlaylist
+from app.schemas.playlist import PlaylistResponse, PlaylistWithSongs, PlaylistCreate, PlaylistUpdate, AddSongToPlaylist, MovePlaylistSong
+from app.schemas.album import AlbumWithSongs
+from app.schemas.search import SuggestResponse, LyricsSearchResponse
+from app.schemas.batch import (
+    SongIdBatch, BatchResult, AlbumBatchResponse, ArtistBatchResponse, PlaylistBatchResponse
+)
 from app.auth import get_current_user
+from app.response_cache import cache_response, invalidate_cache
+from app.song_details import song_details_query, to_song_details
+from app.batch_params import batch_ids
+from app.playlist_order import append_positions, position_after, needs_rebalance, rebalance_playlist
+from app.search import (
+    search_songs, search_artists, search_playlists, search_song_facets, search_lyrics,
+    suggest_service, fuzzy_service, search_cache, catalog_version
+)
 
 router = APIRouter(tags=["General"])
 
@@ -21,22 +37,37 @@ router = APIRouter(tags=["General"])
 # Artists
 @router.get("/artists", response_model=List[UserResponse])
 def list_artists(
+    request: Request,
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100)
 ):
+    cache_response(request, "artists")
     artists = db.query(User).filter(User.role == "artist").offset(skip).limit(limit).all()
     return artists
 
 
+@router.get("/artists/batch", response_model=ArtistBatchResponse)
+def get_artists_batch(ids: List[int] = Depends(batch_ids), db: Session = Depends(get_db)):
+    artists = db.query(User).filter(User.id.in_(ids), User.role == UserRole.ARTIST).all()
+    found = {artist.id: artist for artist in artists}
+    
+    return ArtistBatchResponse(
+        items=[UserResponse.model_validate(found[artist_id]) for artist_id in ids if artist_id in found],
+        missing=[artist_id for artist_id in ids if artist_id not in found]
+    )
+
+
 # Albums
 @router.get("/albums", response_model=List[AlbumResponse])
 def list_albums(
+    request: Request,
     db: Session = Depends(get_db),
     artist_id: Optional[int] = Query(None, description="Filter albums by artist ID"),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100)
 ):
+    cache_response(request, "albums")
     query = db.query(Album)
     
     if artist_id:
@@ -46,9 +77,32 @@ def list_albums(
     return albums
 
 
+@router.get("/albums/batch", response_model=AlbumBatchResponse)
+def get_albums_batch(ids: List[int] = Depends(batch_ids), db: Session = Depends(get_db)):
+    # Artist name and song count come from the same grouped query
+    rows = db.query(Album, User.username, func.count(Song.id)).outerjoin(
+        User, Album.artist_id == User.id
+    ).outerjoin(Song, and_(Song.album_id == Album.id, Song.status == SongStatus.APPROVED)).filter(
+        Album.id.in_(ids)
+    ).group_by(Album.id, User.username).all()
+    found = {album.id: (album, artist_name, song_count) for album, artist_name, song_count in rows}
+    
+    items = []
+    for album_id in ids:
+        if album_id in found:
+            album, artist_name, song_count = found[album_id]
+            details = AlbumWithSongs.model_validate(album)
+            details.artist_name = artist_name
+            details.song_count = song_count
+            items.append(details)
+    
+    return AlbumBatchResponse(items=items, missing=[album_id for album_id in ids if album_id not in found])
+
+
 # Genres
 @router.get("/genres", response_model=List[GenreResponse])
-def list_genres(db: Session = Depends(get_db)):
+def list_genres(request: Request, db: Session = Depends(get_db)):
+    cache_response(request, "genres")
     genres = db.query(Genre).all()
     return genres
 
@@ -84,14 +138,37 @@ def create_playlist(
     return new_playlist
 
 
+@router.get("/playlists/batch", response_model=PlaylistBatchResponse)
+def get_playlists_batch(ids: List[int] = Depends(batch_ids), db: Session = Depends(get_db)):
+    # Owner name and song count come from the same grouped query
+    rows = db.query(Playlist, User.username, func.count(PlaylistSong.id)).outerjoin(
+        User, Playlist.owner_id == User.id
+    ).outerjoin(PlaylistSong, PlaylistSong.playlist_id == Playlist.id).filter(
+        Playlist.id.in_(ids)
+    ).group_by(Playlist.id, User.username).all()
+    found = {playlist.id: (playlist, owner_name, song_count) for playlist, owner_name, song_count in rows}
+    
+    items = []
+    for playlist_id in ids:
+        if playlist_id in found:
+            playlist, owner_name, song_count = found[playlist_id]
+            details = PlaylistWithSongs.model_validate(playlist)
+            details.owner_name = owner_name
+            details.song_count = song_count
+            items.append(details)
+    
+    return PlaylistBatchResponse(items=items, missing=[playlist_id for playlist_id in ids if playlist_id not in found])
+
+
 @router.get("/playlists/{playlist_id}", response_model=PlaylistWithSongs)
-def get_playlist(playlist_id: int, db: Session = Depends(get_db)):
+def get_playlist(playlist_id: int, request: Request, db: Session = Depends(get_db)):
     playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Playlist not found"
         )
+    cache_response(request, f"playlist:{playlist.id}", f"user:{playlist.owner_id}")
     
     # Get songs count
     songs_count = db.query(PlaylistSong).filter(PlaylistSong.playlist_id == playlist_id).count()
@@ -106,17 +183,50 @@ def get_playlist(playlist_id: int, db: Session = Depends(get_db)):
     return PlaylistWithSongs.model_validate(playlist_dict)
 
 
-@router.get("/playlists/{playlist_id}/songs", response_model=List[SongResponse])
-def get_playlist_songs(playlist_id: int, db: Session = Depends(get_db)):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
-    if not playlist:
+def playlist_tracks_query(db: Session, playlist_id: int):
+    """Approved songs of a playlist with their details, in playlist order (one joined query)"""
+    return song_details_query(db).join(
+        PlaylistSong, PlaylistSong.song_id == Song.id
+    ).filter(
+        PlaylistSong.playlist_id == playlist_id,
+        Song.status == SongStatus.APPROVED
+    ).order_by(PlaylistSong.position, PlaylistSong.id)
+
+
+@router.get("/playlists/{playlist_id}/songs", response_model=List[SongWithDetails])
+def get_playlist_songs(
+    playlist_id: int,
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    stream: bool = Query(False, description="Stream every track from `skip` on as NDJSON")
+):
+    playlist_exists = db.query(Playlist.id).filter(Playlist.id == playlist_id).first()
+    if not playlist_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Playlist not found"
         )
     
-    playlist_songs = db.query(PlaylistSong).filter(PlaylistSong.playlist_id == playlist_id).all()
-    return [ps.song for ps in playlist_songs]
+    if stream:
+        return StreamingResponse(
+            _stream_playlist_tracks(db.get_bind(), playlist_id, skip),
+            media_type="application/x-ndjson"
+        )
+    
+    rows = playlist_tracks_query(db, playlist_id).offset(skip).limit(limit).all()
+    return [to_song_details(row) for row in rows]
+
+
+def _stream_playlist_tracks(bind, playlist_id: int, skip: int):
+    # Own session: the request session is closed before the body is streamed
+    db = Session(bind=bind)
+    try:
+        rows = playlist_tracks_query(db, playlist_id).offset(skip).yield_per(500)
+        for row in rows:
+            yield to_song_details(row).model_dump_json() + "\n"
+    finally:
+        db.close()
 
 
 @router.put("/playlists/{playlist_id}", response_model=PlaylistResponse)
@@ -139,6 +249,7 @@ def update_playlist(
     
     playlist.name = playlist_data.name
     playlist.description = playlist_data.description
+    invalidate_cache(db, f"playlist:{playlist_id}")
     db.commit()
     db.refresh(playlist)
     
@@ -167,6 +278,7 @@ def delete_playlist(
     
     # Then delete the playlist itself
     db.delete(playlist)
+    invalidate_cache(db, f"playlist:{playlist_id}")
     db.commit()
     
     # Log the deletion for debugging
@@ -179,6 +291,7 @@ def delete_playlist(
 def add_song_to_playlist(
     playlist_id: int,
     song_data: AddSongToPlaylist,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -214,15 +327,21 @@ def add_song_to_playlist(
     if existing_entry:
         return {"message": "Song already in playlist"}
     
-    # Add song to playlist
+    # Add song to the end of the playlist
+    position = append_positions(db, playlist_id, 1)[0]
     playlist_song = PlaylistSong(
         playlist_id=playlist_id,
-        song_id=song_data.song_id
+        song_id=song_data.song_id,
+        position=position
     )
     
     db.add(playlist_song)
+    invalidate_cache(db, f"playlist:{playlist_id}")
     db.commit()
     
+    if needs_rebalance(position):
+        background_tasks.add_task(rebalance_playlist, db.get_bind(), playlist_id)
+    
     return {"message": "Song added to playlist successfully"}
 
 
@@ -256,52 +375,238 @@ def remove_song_from_playlist(
         )
     
     db.delete(playlist_song)
+    invalidate_cache(db, f"playlist:{playlist_id}")
     db.commit()
     
     return {"message": "Song removed from playlist successfully"}
 
 
+@router.post("/playlists/{playlist_id}/songs/batch", response_model=BatchResult)
+def add_songs_to_playlist(
+    playlist_id: int,
+    batch: SongIdBatch,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    playlist = db.query(Playlist).filter(
+        Playlist.id == playlist_id,
+        Playlist.owner_id == current_user.id
+    ).first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found or you don't have permission to edit it"
+        )
+    
+    song_ids = batch.unique_ids()
+    
+    # Classify every requested song in one query: approved songs, and whether already present
+    rows = db.query(Song.id, PlaylistSong.id).outerjoin(
+        PlaylistSong,
+        (PlaylistSong.song_id == Song.id) & (PlaylistSong.playlist_id == playlist_id)
+    ).filter(
+        Song.id.in_(song_ids),
+        Song.status == SongStatus.APPROVED
+    ).all()
+    
+    outcomes = {song_id: "not_found" for song_id in song_ids}
+    to_add = []
+    for song_id, entry_id in rows:
+        if entry_id is not None:
+            outcomes[song_id] = "already_in_playlist"
+        elif outcomes[song_id] == "not_found":
+            outcomes[song_id] = "added"
+            to_add.append(song_id)
+    
+    if to_add:
+        # One multi-row INSERT, appending in request order
+        positions = append_positions(db, playlist_id, len(to_add))
+        db.execute(
+            insert(PlaylistSong).values([
+                {"playlist_id": playlist_id, "song_id": song_id, "position": position}
+                for song_id, position in zip(to_add, positions)
+            ])
+        )
+        if needs_rebalance(*positions):
+            background_tasks.add_task(rebalance_playlist, db.get_bind(), playlist_id)
+    invalidate_cache(db, f"playlist:{playlist_id}")
+    db.commit()
+    
+    return BatchResult.from_outcomes(song_ids, outcomes, success=["added"])
+
+
+@router.put("/playlists/{playlist_id}/songs/{song_id}/position")
+def move_playlist_song(
+    playlist_id: int,
+    song_id: int,
+    move_data: MovePlaylistSong,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    playlist = db.query(Playlist).filter(
+        Playlist.id == playlist_id,
+        Playlist.owner_id == current_user.id
+    ).first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found or you don't have permission to edit it"
+        )
+    
+    playlist_song = db.query(PlaylistSong).filter(
+        PlaylistSong.playlist_id == playlist_id,
+        PlaylistSong.song_id == song_id
+    ).first()
+    
+    if not playlist_song:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found in playlist"
+        )
+    
+    after = None
+    if move_data.after_song_id is not None:
+        after = db.query(PlaylistSong).filter(
+            PlaylistSong.playlist_id == playlist_id,
+            PlaylistSong.song_id == move_data.after_song_id
+        ).first()
+        if not after or after.id == playlist_song.id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid target position"
+            )
+    
+    # Only the moved row changes; its neighbours keep their keys
+    playlist_song.position = position_after(db, playlist_song, after)
+    db.commit()
+    
+    if needs_rebalance(playlist_song.position):
+        background_tasks.add_task(rebalance_playlist, db.get_bind(), playlist_id)
+    
+    return {"message": "Song moved successfully", "position": playlist_song.position}
+
+
+@router.post("/playlists/{playlist_id}/songs/batch-remove", response_model=BatchResult)
+def remove_songs_from_playlist(
+    playlist_id: int,
+    batch: SongIdBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    playlist = db.query(Playlist).filter(
+        Playlist.id == playlist_id,
+        Playlist.owner_id == current_user.id
+    ).first()
+    
+    if not playlist:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Playlist not found or you don't have permission to edit it"
+        )
+    
+    song_ids = batch.unique_ids()
+    present = {
+        song_id for (song_id,) in db.query(PlaylistSong.song_id).filter(
+            PlaylistSong.playlist_id == playlist_id,
+            PlaylistSong.song_id.in_(song_ids)
+        )
+    }
+    
+    if present:
+        db.execute(
+            delete(PlaylistSong).where(
+                PlaylistSong.playlist_id == playlist_id,
+                PlaylistSong.song_id.in_(present)
+            )
+        )
+    invalidate_cache(db, f"playlist:{playlist_id}")
+    db.commit()
+    
+    outcomes = {song_id: "removed" if song_id in present else "not_in_playlist" for song_id in song_ids}
+    return BatchResult.from_outcomes(song_ids, outcomes, success=["removed"])
+
+
 # Search
+@router.get("/search/suggest", response_model=SuggestResponse)
+def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[str] = Query(None, regex="^(song|artist|album)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Typeahead: prefix and infix matches on song, artist and album names, popular first"""
+    suggest_service.ensure_ready(db.get_bind())
+    return {"query": q, "suggestions": suggest_service.suggest(q, limit, type)}
+
+
+@router.get("/search/lyrics", response_model=LyricsSearchResponse)
+def search_lyrics_text(
+    q: str = Query(..., min_length=1, max_length=200),
+    phrase: bool = Query(True, description="Words must appear consecutively, in order"),
+    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Songs whose lyrics contain the phrase, most occurrences first, with a highlighted snippet"""
+    total, results = search_lyrics(db, q, skip, limit, phrase)
+    return {"query": q, "total": total, "results": results}
+
+
 @router.get("/search")
 def search(
     q: str = Query(..., min_length=1),
     type: str = Query("all", regex="^(song|artist|playlist|all)$"),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    facets: bool = Query(False, description="Add genre, artist and album counts over all matching songs")
 ):
+    """Ranked full-text search; song matches include artist, album and lyrics text"""
+    # Any write that can change results bumps the catalog version, so old keys are never hit again
+    version = catalog_version(db) if settings.search_cache_enabled else None
+    if version is not None:
+        key = search_cache.key(version, q, type, skip, limit, facets)
+        cached = search_cache.get(key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    
+    results = _search(db, q, type, skip, limit)
+    
+    # Nothing matched: retry once with misspelled words replaced by their closest catalog words
+    searched = q
+    if skip == 0 and not any(results.values()):
+        fuzzy_service.ensure_ready(db.get_bind())
+        corrected = fuzzy_service.correct_query(q)
+        corrected_results = _search(db, corrected, type, skip, limit) if corrected else None
+        if corrected_results and any(corrected_results.values()):
+            results = corrected_results
+            results["corrected_query"] = searched = corrected
+    
+    if facets and type in ["song", "all"]:
+        results["facets"] = search_song_facets(db, searched)
+    
+    response = JSONResponse(jsonable_encoder(results))
+    if version is not None:
+        search_cache.set(key, response.body)
+    return response
+
+
+def _search(db: Session, q: str, type: str, skip: int, limit: int) -> dict:
     results = {}
     
     if type in ["song", "all"]:
-        # Search songs
-        songs = db.query(Song).filter(
-            Song.status == SongStatus.APPROVED,
-            or_(
-                Song.title.ilike(f"%{q}%"),
-                # You might want to join with User table to search by artist name
-            )
-        ).offset(skip).limit(limit).all()
-        results["songs"] = songs
+        results["songs"] = search_songs(db, q, skip, limit)
     
     if type in ["artist", "all"]:
-        # Search artists
-        artists = db.query(User).filter(
-            User.role == "artist",
-            or_(
-                User.username.ilike(f"%{q}%"),
-                User.email.ilike(f"%{q}%")
-            )
-        ).offset(skip).limit(limit).all()
-        results["artists"] = artists
+        artists = search_artists(db, q, skip, limit)
+        results["artists"] = [UserResponse.model_validate(artist) for artist in artists]
     
     if type in ["playlist", "all"]:
-        # Search playlists
-        playlists = db.query(Playlist).filter(
-            or_(
-                Playlist.name.ilike(f"%{q}%"),
-                Playlist.description.ilike(f"%{q}%")
-            )
-        ).offset(skip).limit(limit).all()
-        results["playlists"] = playlists
+        playlists = search_playlists(db, q, skip, limit)
+        results["playlists"] = [PlaylistResponse.model_validate(playlist) for playlist in playlists]
     
-    return results 
\ No newline at end of file
+    return results
@@ -1,18 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form, Request
+from fastapi.responses import RedirectResponse, Response
 from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, literal
 from typing import List, Optional
+from app.config import settings
 from app.database import get_db
 from app.models.song import Song, SongStatus
 from app.models.liked_song import LikedSong
 from app.models.comment import Comment
 from app.models.lyrics import Lyrics
 from app.models.user import User
+from app.models.play_event import PlayEvent
 from app.schemas.song import SongResponse, SongWithDetails
 from app.schemas.comment import CommentResponse, CommentCreate
 from app.schemas.lyrics import LyricsResponse
-from app.auth import get_current_user, require_artist
+from app.schemas.batch import SongIdBatch, BatchResult, SongBatchResponse
+from app.schemas.search import SongFacetsResponse
+from app.schemas.recommendation import SimilarSong
+from app.auth import get_current_user, get_optional_user, require_artist
 from app.local_file_service import local_file_service
+from app.song_details import song_details_query, to_song_details
+from app.batch_params import batch_ids
+from app.search import song_facets, search_cache, catalog_version, BROWSE
+from app.recommendations import similar_songs_service, RadioState, next_tracks
+from app.pagination import encode_cursor, decode_cursor, set_next_cursor
+from app.charts import trending_charts
+from app.response_cache import cache_response
 import os
 from pathlib import Path
 
@@ -21,12 +34,14 @@ router = APIRouter(prefix="/songs", tags=["Songs"])
 
 @router.get("/", response_model=List[SongWithDetails])
 def list_songs(
+    request: Request,
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     genre_id: Optional[int] = Query(None),
     artist_id: Optional[int] = Query(None)
 ):
+    cache_response(request, "songs", "genres", "albums", "artists")
     query = db.query(Song).filter(Song.status == SongStatus.APPROVED)
     
     if genre_id:
@@ -51,14 +66,59 @@ def list_songs(
     return result
 
 
+@router.get("/facets", response_model=SongFacetsResponse)
+def get_song_facets(
+    db: Session = Depends(get_db),
+    genre_id: Optional[int] = Query(None),
+    artist_id: Optional[int] = Query(None),
+    limit: int = Query(10, ge=1, le=100, description="Values returned per facet")
+):
+    """Counts behind the browse filters of GET /songs: matching songs per genre, artist and album"""
+    version = catalog_version(db, BROWSE) if settings.search_cache_enabled else None
+    if version is not None:
+        key = search_cache.facets_key(version, genre_id, artist_id, limit)
+        cached = search_cache.get(key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    
+    criteria = []
+    if genre_id:
+        criteria.append(Song.genre_id == genre_id)
+    if artist_id:
+        criteria.append(Song.artist_id == artist_id)
+    
+    facets = SongFacetsResponse.model_validate(song_facets(db, *criteria, limit=limit))
+    if version is not None:
+        search_cache.set(key, facets.model_dump_json().encode())
+    return facets
+
+
+@router.get("/batch", response_model=SongBatchResponse)
+def get_songs_batch(ids: List[int] = Depends(batch_ids), db: Session = Depends(get_db)):
+    rows = song_details_query(db).filter(
+        Song.id.in_(ids),
+        Song.status == SongStatus.APPROVED
+    ).all()
+    found = {row[0].id: row for row in rows}
+    
+    return SongBatchResponse(
+        items=[to_song_details(found[song_id]) for song_id in ids if song_id in found],
+        missing=[song_id for song_id in ids if song_id not in found]
+    )
+
+
 @router.get("/{song_id}", response_model=SongWithDetails)
-def get_song(song_id: int, db: Session = Depends(get_db)):
+def get_song(song_id: int, request: Request, db: Session = Depends(get_db)):
     song = db.query(Song).filter(Song.id == song_id, Song.status == SongStatus.APPROVED).first()
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Song not found"
         )
+    cache_response(
+        request, f"song:{song.id}", f"user:{song.artist_id}", f"genre:{song.genre_id}",
+        *([f"album:{song.album_id}"] if song.album_id else [])
+    )
     
     # Create detailed response
     song_dict = {
@@ -72,8 +132,84 @@ def get_song(song_id: int, db: Session = Depends(get_db)):
     return SongWithDetails.model_validate(song_dict)
 
 
+@router.get("/{song_id}/similar", response_model=List[SimilarSong])
+def get_similar_songs(song_id: int, db: Session = Depends(get_db), limit: int = Query(10, ge=1, le=50)):
+    """Songs most often liked or playlisted together with this one (empty until the model is built)"""
+    if not db.query(Song.id).filter(Song.id == song_id, Song.status == SongStatus.APPROVED).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    neighbours = similar_songs_service.similar(song_id, limit)
+    rows = song_details_query(db).filter(
+        Song.id.in_([neighbour_id for neighbour_id, _ in neighbours]),
+        Song.status == SongStatus.APPROVED
+    ).all()
+    found = {row[0].id: row for row in rows}
+    
+    # Songs unapproved since the last build are skipped
+    return [
+        SimilarSong(song=to_song_details(found[neighbour_id]), score=score)
+        for neighbour_id, score in neighbours if neighbour_id in found
+    ]
+
+
+@router.get("/{song_id}/radio", response_model=List[SongWithDetails])
+def get_song_radio(
+    song_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
+):
+    """
+    An endless queue of songs related to this one, a page at a time. The cursor carries the
+    queue's state (recent tracks and artists, songs already queued), so pages never repeat
+    a song and each costs the same however far into the radio it is.
+    """
+    seed = db.query(Song.artist_id).filter(Song.id == song_id, Song.status == SongStatus.APPROVED).first()
+    if not seed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    if cursor:
+        try:
+            state = RadioState.from_values(decode_cursor(cursor, 6))
+        except (ValueError, TypeError):
+            state = None
+        if state is None or state.seed_id != song_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    else:
+        state = RadioState.start(song_id, seed.artist_id, settings.radio_artist_spacing)
+    
+    def trending():
+        trending_charts.ensure_ready(db.get_bind())
+        return [trending_id for trending_id, _ in trending_charts.trending(settings.trending_top_k)]
+    
+    track_ids = next_tracks(
+        similar_songs_service.get_model(), state, limit, settings.radio_artist_spacing, trending
+    )
+    rows = song_details_query(db).filter(Song.id.in_(track_ids), Song.status == SongStatus.APPROVED).all()
+    found = {row[0].id: row for row in rows}
+    
+    # The queue goes on as long as it can fill pages; songs unapproved since the model was
+    # built are dropped from the page without ending it
+    set_next_cursor(response, track_ids, limit, lambda _: encode_cursor(*state.values()))
+    return [to_song_details(found[track_id]) for track_id in track_ids if track_id in found]
+
+
 @router.get("/{song_id}/stream")
-def stream_song(song_id: int, db: Session = Depends(get_db)):
+def stream_song(
+    song_id: int,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
     song = db.query(Song).filter(Song.id == song_id, Song.status == SongStatus.APPROVED).first()
     if not song:
         raise HTTPException(
@@ -88,8 +224,9 @@ def stream_song(song_id: int, db: Session = Depends(get_db)):
             detail="Song file not found"
         )
     
-    # Increment play count
+    # Increment play count; the event feeds recommendations and trending charts
     song.play_count += 1
+    db.add(PlayEvent(user_id=current_user.id if current_user else None, song_id=song.id))
     db.commit()
     
     # Extract filename from file path and redirect to file streaming endpoint
@@ -152,6 +289,71 @@ def unlike_song(
     return {"message": "Song unliked successfully"}
 
 
+@router.post("/likes/batch", response_model=BatchResult)
+def like_songs(
+    batch: SongIdBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    song_ids = batch.unique_ids()
+    
+    # Classify every requested song in one query: approved songs, and whether already liked
+    rows = db.query(Song.id, LikedSong.id).outerjoin(
+        LikedSong,
+        (LikedSong.song_id == Song.id) & (LikedSong.user_id == current_user.id)
+    ).filter(
+        Song.id.in_(song_ids),
+        Song.status == SongStatus.APPROVED
+    ).all()
+    
+    outcomes = {song_id: "not_found" for song_id in song_ids}
+    to_like = []
+    for song_id, like_id in rows:
+        if like_id is not None:
+            outcomes[song_id] = "already_liked"
+        else:
+            outcomes[song_id] = "liked"
+            to_like.append(song_id)
+    
+    if to_like:
+        db.execute(
+            insert(LikedSong).from_select(
+                ["user_id", "song_id"],
+                select(literal(current_user.id), Song.id).where(Song.id.in_(to_like))
+            )
+        )
+    db.commit()
+    
+    return BatchResult.from_outcomes(song_ids, outcomes, success=["liked"])
+
+
+@router.post("/likes/batch-remove", response_model=BatchResult)
+def unlike_songs(
+    batch: SongIdBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    song_ids = batch.unique_ids()
+    liked = {
+        song_id for (song_id,) in db.query(LikedSong.song_id).filter(
+            LikedSong.user_id == current_user.id,
+            LikedSong.song_id.in_(song_ids)
+        )
+    }
+    
+    if liked:
+        db.execute(
+            delete(LikedSong).where(
+                LikedSong.user_id == current_user.id,
+                LikedSong.song_id.in_(liked)
+            )
+        )
+    db.commit()
+    
+    outcomes = {song_id: "unliked" if song_id in liked else "not_liked" for song_id in song_ids}
+    return BatchResult.from_outcomes(song_ids, outcomes, success=["unliked"])
+
+
 @router.get("/{song_id}/lyrics", response_model=LyricsResponse)
 def get_lyrics(song_id: int, db: Session = Depends(get_db)):
     song = db.query(Song).filter(Song.id == song_id, Song.status == SongStatus.APPROVED).first()
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, func, or_, and_
+from typing import List, Optional
+from datetime import datetime
 from app.database import get_db
 from app.models.user import User
 from app.models.liked_song import LikedSong
-from app.models.song import Song
+from app.models.song import Song, SongStatus
+from app.models.playlist import Playlist
 from app.schemas.user import UserResponse, UserUpdate, UserProfileResponse, RoleUpdate, NotificationSettings
-from app.schemas.song import SongResponse
+from app.schemas.song import SongWithDetails
 from app.schemas.playlist import PlaylistResponse
+from app.schemas.recommendation import RecommendedSong
 from app.auth import get_current_user, require_admin
+from app.song_details import song_details_query, to_song_details
+from app.pagination import encode_cursor, decode_cursor, set_next_cursor
+from app.account_deletion import schedule_account_deletion, run_deletion_job
+from app.recommendations import recommendation_service
+from app.response_cache import invalidate_cache
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -37,6 +46,7 @@ def update_profile(
             )
         current_user.email = user_update.email
     
+    invalidate_cache(db, f"user:{current_user.id}", "artists")
     db.commit()
     db.refresh(current_user)
     return current_user
@@ -44,25 +54,91 @@ def update_profile(
 
 @router.get("/me/playlists", response_model=List[PlaylistResponse])
 def get_my_playlists(
+    response: Response,
     current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
 ):
-    return current_user.playlists[skip:skip + limit]
+    # Newest first; keyset pagination on the primary key when a cursor is given
+    query = db.query(Playlist).filter(
+        Playlist.owner_id == current_user.id
+    ).order_by(Playlist.id.desc())
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1, [int])
+        query = query.filter(Playlist.id < last_id)
+    else:
+        query = query.offset(skip)
+    
+    playlists = query.limit(limit).all()
+    set_next_cursor(response, playlists, limit, lambda playlist: encode_cursor(playlist.id))
+    return playlists
 
 
-@router.get("/me/liked-songs", response_model=List[SongResponse])
+@router.get("/me/liked-songs", response_model=List[SongWithDetails])
 def get_liked_songs(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page")
 ):
-    liked_songs = db.query(LikedSong).filter(
+    # Most recently liked first, walking the (user_id, liked_at, id) index
+    query = song_details_query(db).add_columns(LikedSong.id, LikedSong.liked_at).join(
+        LikedSong, LikedSong.song_id == Song.id
+    ).filter(
         LikedSong.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ).order_by(LikedSong.liked_at.desc(), LikedSong.id.desc())
+    
+    if cursor:
+        last_liked_at, last_id = decode_cursor(cursor, 2, [(datetime, int), int])
+        # Compare against the stored timestamp so the DB's own datetime format is used;
+        # fall back to the cursor value if that like has since been removed
+        last_like = aliased(LikedSong)
+        stored_liked_at = select(last_like.liked_at).where(last_like.id == last_id).scalar_subquery()
+        boundary = func.coalesce(stored_liked_at, last_liked_at)
+        query = query.filter(or_(
+            LikedSong.liked_at < boundary,
+            and_(LikedSong.liked_at == boundary, LikedSong.id < last_id)
+        ))
+    else:
+        query = query.offset(skip)
+    
+    rows = query.limit(limit).all()
+    set_next_cursor(response, rows, limit, lambda row: encode_cursor(row[-1], row[-2]))
+    return [to_song_details(row[:5]) for row in rows]
+
+
+@router.get("/me/recommendations", response_model=List[RecommendedSong])
+def get_recommendations(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Songs predicted from the user's likes, playlists and plays, never ones already liked"""
+    liked = [song_id for (song_id,) in db.query(LikedSong.song_id).filter(LikedSong.user_id == current_user.id)]
+    # Ask for extra candidates: some may have been unapproved since the model was trained
+    candidates = recommendation_service.recommend(current_user.id, 2 * limit, liked)
+    rows = song_details_query(db).filter(
+        Song.id.in_([song_id for song_id, _ in candidates]),
+        Song.status == SongStatus.APPROVED
+    ).all()
+    found = {row[0].id: row for row in rows}
+    results = [
+        RecommendedSong(song=to_song_details(found[song_id]), score=score)
+        for song_id, score in candidates if song_id in found
+    ][:limit]
+    if results:
+        return results
     
-    return [liked_song.song for liked_song in liked_songs]
+    # New listeners (not in the last training run) get the most played songs they have not liked
+    rows = song_details_query(db).filter(
+        Song.status == SongStatus.APPROVED,
+        Song.id.notin_(select(LikedSong.song_id).where(LikedSong.user_id == current_user.id))
+    ).order_by(Song.play_count.desc(), Song.id).limit(limit).all()
+    return [RecommendedSong(song=to_song_details(row)) for row in rows]
 
 
 @router.put("/notification-settings")
@@ -82,21 +158,21 @@ def update_notification_settings(
     }
 
 
-@router.delete("/me")
+@router.delete("/me", status_code=status.HTTP_202_ACCEPTED)
 def delete_account(
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Delete the current user's account.
-    This will permanently delete all user data.
+    The account is disabled immediately; songs, playlists, comments and uploaded
+    files are removed by a background deletion job whose progress admins can follow.
     """
-    # TODO: Add proper data cleanup (songs, playlists, comments, etc.)
-    # For now, just delete the user record
-    db.delete(current_user)
-    db.commit()
+    job = schedule_account_deletion(db, current_user)
+    background_tasks.add_task(run_deletion_job, job.id, db.get_bind())
     
-    return {"message": "Account deleted successfully"}
+    return {"message": "Account scheduled for deletion", "job_id": job.id}
 
 
 # Admin endpoints
@@ -115,6 +191,7 @@ def update_user_role(
         )
     
     user.role = role_update.role
+    invalidate_cache(db, f"user:{user_id}", "artists")
     db.commit()
     db.refresh(user)
     return user 
\ No newline at end of file
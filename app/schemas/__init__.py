@@ -5,4 +5,7 @@ from .genre import *
 from .playlist import *
 from .comment import *
 from .lyrics import *
-from .auth import * 
\ No newline at end of file
+from .auth import *
+from .batch import *
+from .deletion_job import *
+from .search import *
@@ -0,0 +1,56 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Iterable, List
+from app.schemas.song import SongWithDetails
+from app.schemas.album import AlbumWithSongs
+from app.schemas.user import UserResponse
+from app.schemas.playlist import PlaylistWithSongs
+
+
+MAX_BATCH_SIZE = 500
+
+
+class SongIdBatch(BaseModel):
+    song_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    
+    def unique_ids(self) -> List[int]:
+        """Requested IDs with duplicates dropped, in request order"""
+        return list(dict.fromkeys(self.song_ids))
+
+
+class BatchItemResult(BaseModel):
+    song_id: int
+    status: str
+
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+    
+    @classmethod
+    def from_outcomes(cls, song_ids: List[int], outcomes: Dict[int, str], success: Iterable[str]) -> "BatchResult":
+        success = set(success)
+        results = [BatchItemResult(song_id=song_id, status=outcomes[song_id]) for song_id in song_ids]
+        succeeded = sum(1 for item in results if item.status in success)
+        return cls(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+
+# Multi-get responses: found entities in request order, plus the IDs that were not found
+class SongBatchResponse(BaseModel):
+    items: List[SongWithDetails]
+    missing: List[int]
+
+
+class AlbumBatchResponse(BaseModel):
+    items: List[AlbumWithSongs]
+    missing: List[int]
+
+
+class ArtistBatchResponse(BaseModel):
+    items: List[UserResponse]
+    missing: List[int]
+
+
+class PlaylistBatchResponse(BaseModel):
+    items: List[PlaylistWithSongs]
+    missing: List[int]
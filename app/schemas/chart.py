@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from app.schemas.song import SongWithDetails
+
+
+class TrendingSong(BaseModel):
+    song: SongWithDetails
+    score: float  # Plays with exponential decay: one play counts half after each half-life
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+from app.models.deletion_job import DeletionJobStatus
+
+
+class DeletionJobResponse(BaseModel):
+    id: int
+    user_id: int
+    status: DeletionJobStatus
+    current_step: Optional[str] = None
+    rows_deleted: int
+    files_deleted: int
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
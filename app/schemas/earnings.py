@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field, PlainSerializer
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Annotated, List, Optional
+
+# Amounts are exact decimals in the database and in the engine, JSON numbers on the wire
+Amount = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
+
+class PayoutRateCreate(BaseModel):
+    effective_from: date
+    rate_per_play: Decimal = Field(..., gt=0, max_digits=12, decimal_places=6)
+
+
+class PayoutRateResponse(BaseModel):
+    id: int
+    effective_from: date
+    rate_per_play: Amount
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EarningsStatementSummary(BaseModel):
+    id: int
+    period_start: date
+    plays: int
+    amount: Amount
+
+    class Config:
+        from_attributes = True
+
+
+class EarningsStatementLineResponse(BaseModel):
+    song_id: int
+    title: Optional[str] = None  # None once the song has been deleted
+    plays: int
+    amount: Amount
+
+
+class EarningsStatementResponse(EarningsStatementSummary):
+    created_at: Optional[datetime] = None
+    lines: List[EarningsStatementLineResponse]
+
+
+class EarningsResponse(BaseModel):
+    total_plays: int
+    earnings_per_play: Amount  # Rate in effect today
+    estimated_earnings: Amount  # settled_earnings + pending_earnings
+    settled_plays: int
+    settled_earnings: Amount
+    pending_plays: int
+    pending_earnings: Amount
+    currency: str
+    statements: List[EarningsStatementSummary]  # Most recent first
+    note: str
@@ -34,4 +34,8 @@ class PlaylistWithSongs(PlaylistResponse):
 
 
 class AddSongToPlaylist(BaseModel):
-    song_id: int 
\ No newline at end of file
+    song_id: int 
+
+
+class MovePlaylistSong(BaseModel):
+    after_song_id: Optional[int] = None  # None moves the song to the top of the playlist
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Optional
+from app.schemas.song import SongWithDetails
+
+
+class SimilarSong(BaseModel):
+    song: SongWithDetails
+    score: float  # Cosine similarity of the two songs' listeners, 0 to 1
+
+
+class RecommendedSong(BaseModel):
+    song: SongWithDetails
+    score: Optional[float] = None  # Predicted preference; None for popular-songs fallback picks
@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.schemas.song import SongWithDetails
+
+
+class Suggestion(BaseModel):
+    type: str  # song, artist or album
+    id: int
+    text: str
+    artist_name: Optional[str] = None
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
+
+
+class LyricsMatch(BaseModel):
+    song: SongWithDetails
+    snippet: str  # HTML-escaped, matched words wrapped in <mark>
+    matches: int  # Occurrences of the phrase in the lyrics
+
+
+class LyricsSearchResponse(BaseModel):
+    query: str
+    total: int
+    results: List[LyricsMatch]
+
+
+class FacetValue(BaseModel):
+    id: int
+    name: Optional[str] = None
+    count: int
+
+
+class SongFacetsResponse(BaseModel):
+    total: int  # Approved songs matching the filters
+    facets: Dict[str, List[FacetValue]]  # genre, artist and album, most songs first
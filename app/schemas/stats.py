@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+
+class StatsPoint(BaseModel):
+    start: datetime  # UTC start of the hour or day
+    plays: int
+    likes: int
+
+
+class StatsTimeseries(BaseModel):
+    entity_type: str  # song, artist, genre or platform
+    entity_id: int
+    granularity: str  # hour or day
+    points: List[StatsPoint]
+
+
+class ListenerPoint(BaseModel):
+    start: datetime  # UTC start of the day
+    listeners: int
+
+
+class ListenerStats(BaseModel):
+    entity_type: str  # song, artist or platform
+    entity_id: int
+    unique_listeners: int  # Distinct over the whole range, not the sum of the days
+    points: List[ListenerPoint]
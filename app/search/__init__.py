@@ -0,0 +1,20 @@
+"""
+Full-text search over songs, artists and playlists.
+
+Searchable text lives in search_documents, rewritten by an after_flush hook whenever
+the ORM changes a song, lyrics, artist, album or playlist. Each dialect indexes it
+natively (SQLite FTS5, PostgreSQL tsvector/GIN) behind a SearchBackend.
+Typeahead suggestions come from an in-process trigram index (suggest_service), and
+misspelled queries are corrected against the catalog vocabulary (fuzzy_service).
+Lyrics phrases are matched through a positional inverted index (lyrics_postings).
+/search responses are cached per catalog version (search_cache), as are the genre,
+artist and album counts of song results and browse filters (song_facets).
+"""
+from app.search.backends import SearchBackend, get_search_backend, tokenize
+from app.search.indexer import reindex, rebuild_index
+from app.search.query import search_songs, search_artists, search_playlists, search_song_facets
+from app.search.facets import song_facets
+from app.search.suggest import suggest_service
+from app.search.fuzzy import fuzzy_service
+from app.search.lyrics import index_lyrics, rebuild_lyrics_index, search_lyrics
+from app.search.cache import search_cache, catalog_version, bump_catalog_version, BROWSE
@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import Float, Integer, and_, case, or_, select, text
+from sqlalchemy.sql.selectable import Select, TextualSelect
+from app.models.search_document import SearchDocument
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> List[str]:
+    """Lowercased word tokens; punctuation never reaches the FTS query syntax"""
+    return _TOKEN_RE.findall(query.lower())
+
+
+class SearchBackend:
+    """
+    Matches a query against search_documents of one entity type.
+    `match` returns a selectable of (entity_id, rank) where a lower rank is a better hit,
+    or None when the query has no searchable terms.
+    """
+    name = "like"
+
+    def match(self, entity_type: str, query: str) -> Optional[Select]:
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Portable fallback: every term must occur in the title or body, title hits rank first
+        conditions = [
+            or_(SearchDocument.title.ilike(f"%{term}%"), SearchDocument.body.ilike(f"%{term}%"))
+            for term in terms
+        ]
+        return select(
+            SearchDocument.entity_id,
+            case((SearchDocument.title.ilike(f"%{terms[0]}%"), 0), else_=1).label("rank")
+        ).where(SearchDocument.entity_type == entity_type, and_(*conditions))
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 with bm25 ranking; title matches weigh 10x body matches"""
+    name = "sqlite-fts5"
+
+    def match(self, entity_type: str, query: str) -> Optional[TextualSelect]:
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Quoted terms, implicitly ANDed; only the last one (still being typed) is a prefix: "beat" "i"*
+        expression = " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        # CROSS JOIN pins the join order: left to itself SQLite may walk every document of
+        # the entity type and re-run the MATCH for each one
+        return text(
+            "SELECT d.entity_id AS entity_id, bm25(search_documents_fts, 10.0, 1.0) AS rank "
+            "FROM search_documents_fts CROSS JOIN search_documents d ON d.id = search_documents_fts.rowid "
+            "WHERE search_documents_fts MATCH :expression AND d.entity_type = :entity_type"
+        ).bindparams(expression=expression, entity_type=entity_type).columns(entity_id=Integer, rank=Float)
+
+
+class PostgresFTSBackend(SearchBackend):
+    """tsvector/GIN with ts_rank_cd; title terms carry weight A"""
+    name = "postgres-tsvector"
+
+    def match(self, entity_type: str, query: str) -> Optional[TextualSelect]:
+        terms = tokenize(query)
+        if not terms:
+            return None
+        expression = " & ".join([f"'{term}'" for term in terms[:-1]] + [f"'{terms[-1]}':*"])
+        return text(
+            "SELECT entity_id, -ts_rank_cd(search_vector, to_tsquery('simple', :expression)) AS rank "
+            "FROM search_documents "
+            "WHERE entity_type = :entity_type AND search_vector @@ to_tsquery('simple', :expression)"
+        ).bindparams(expression=expression, entity_type=entity_type).columns(entity_id=Integer, rank=Float)
+
+
+_BACKENDS: Dict[str, SearchBackend] = {
+    "sqlite": SQLiteFTSBackend(),
+    "postgresql": PostgresFTSBackend(),
+}
+_FALLBACK = SearchBackend()
+
+
+def get_search_backend(bind) -> SearchBackend:
+    """Backend for the database behind a Session, Connection or Engine"""
+    return _BACKENDS.get(bind.dialect.name, _FALLBACK)
@@ -0,0 +1,222 @@
+"""
+Search latency benchmarks on synthetic data.
+
+    python -m app.cli bench-search --songs 1000000 --database sqlite:///bench_search.db
+
+Generates the catalog into an empty database (reused as-is on later runs), builds the
+search index and compares the FTS backend with the old leading-wildcard ILIKE queries.
+
+    python -m app.cli bench-fuzzy --terms 200000
+
+Builds the typo-tolerant deletion index over a synthetic vocabulary and times
+corrections of misspelled words against a linear edit-distance scan.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from sqlalchemy import create_engine, func, insert, or_, select
+from sqlalchemy.engine import Engine
+from app.database import Base
+from app.models.user import User, UserRole
+from app.models.genre import Genre
+from app.models.song import Song, SongStatus
+from app.search.backends import get_search_backend
+from app.search.fuzzy import DeletionIndex, edit_distance, max_distance_for
+from app.search.indexer import rebuild_index
+
+WORDS = (
+    "love night heart fire dream light summer rain blue city river wild gold shadow "
+    "dance moon star ocean road home time broken sweet dark electric golden silver "
+    "paper glass stone echo thunder velvet neon midnight morning winter spring autumn "
+    "highway desert garden forest mountain island harbor window mirror story secret "
+    "promise memory silence storm wave fever rhythm soul ghost angel devil paradise "
+    "heaven kingdom empire revolution freedom journey horizon signal static radio"
+).split()
+
+QUERIES = ["love", "midnight city", "gold", "neon drea", "harbor", "electric storm", "velvet ghost radio"]
+
+INSERT_CHUNK = 10_000
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def generate_catalog(engine: Engine, songs: int, artists: int, seed: int = 42):
+    """Bulk-insert a synthetic catalog (Core inserts, so the ORM index hook stays out of the way)"""
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Genre), [{"name": f"Genre {i}"} for i in range(20)])
+        conn.execute(insert(User), [
+            {
+                "username": f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}",
+                "email": f"artist{i}@bench.invalid",
+                "hashed_password": "!",
+                "role": UserRole.ARTIST,
+                "is_active": True,
+                "agreed_to_terms": True,
+            }
+            for i in range(artists)
+        ])
+        genre_ids = list(conn.execute(select(Genre.id)).scalars())
+        artist_ids = list(conn.execute(select(User.id)).scalars())
+
+        for start in range(0, songs, INSERT_CHUNK):
+            conn.execute(insert(Song), [
+                {
+                    "title": _title(rng),
+                    "artist_id": rng.choice(artist_ids),
+                    "genre_id": rng.choice(genre_ids),
+                    "duration_seconds": rng.randint(90, 420),
+                    "file_url": f"uploads/songs/bench_{start + i}.mp3",
+                    "status": SongStatus.APPROVED,
+                    "play_count": 0,
+                }
+                for i in range(min(INSERT_CHUNK, songs - start))
+            ])
+        rebuild_index(conn, batch_size=INSERT_CHUNK)
+
+
+def _timed(run: Callable[[], List], repeats: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def run_benchmark(engine: Engine, queries: List[str] = QUERIES, limit: int = 10, repeats: int = 20):
+    """Time the first page of song results for each query with FTS and with ILIKE"""
+    backend = get_search_backend(engine)
+    results = []
+    with engine.connect() as conn:
+        for query in queries:
+            hits = backend.match("song", query).subquery()
+            fts = select(Song.id).join(hits, hits.c.entity_id == Song.id).where(
+                Song.status == SongStatus.APPROVED
+            ).order_by(hits.c.rank, Song.id).limit(limit)
+            like = select(Song.id).join(User, Song.artist_id == User.id).where(
+                Song.status == SongStatus.APPROVED,
+                or_(Song.title.ilike(f"%{query}%"), User.username.ilike(f"%{query}%"))
+            ).limit(limit)
+
+            results.append({
+                "query": query,
+                "fts": _timed(lambda: conn.execute(fts).all(), repeats),
+                "ilike": _timed(lambda: conn.execute(like).all(), max(1, repeats // 4)),
+            })
+    return backend.name, results
+
+
+def main(database_url: str, songs: int, artists: int, repeats: int):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count(Song.id))).scalar()
+    if not existing:
+        print(f"Generating {songs:,} songs by {artists:,} artists...")
+        start = time.perf_counter()
+        generate_catalog(engine, songs, artists)
+        print(f"Catalog and index built in {time.perf_counter() - start:.1f}s")
+        existing = songs
+
+    backend, results = run_benchmark(engine, repeats=repeats)
+    print(f"\nBackend: {backend} ({existing:,} songs, first page of 10)")
+    print(f"{'query':<22}{'fts p50':>10}{'fts p95':>10}{'ilike p50':>12}{'ilike p95':>12}  (ms)")
+    for row in results:
+        print(
+            f"{row['query']:<22}{row['fts']['p50']:>10.2f}{row['fts']['p95']:>10.2f}"
+            f"{row['ilike']['p50']:>12.2f}{row['ilike']['p95']:>12.2f}"
+        )
+    engine.dispose()
+
+
+SYLLABLES = (
+    "ka ri mo ne ta lu shi ven dor al an el en in on um ar er or ur bel cor dan fel gar "
+    "hel jor kel lin mar nor pel quin ros sel tor vel wyn xan yel zor bra cri dro fla gri"
+).split()
+
+
+def generate_vocabulary(terms: int, seed: int = 42) -> Dict[str, int]:
+    """Distinct pseudo-words of 2-5 syllables with Zipf-like frequencies"""
+    rng = random.Random(seed)
+    vocabulary = {}
+    while len(vocabulary) < terms:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        vocabulary.setdefault(word, max(1, int(100_000 / (len(vocabulary) + 1))))
+    return vocabulary
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Apply up to max_distance_for(word) random deletions, insertions, substitutions or swaps"""
+    for _ in range(rng.randint(1, max_distance_for(word))):
+        i = rng.randrange(len(word))
+        edit = rng.choice("disx" if len(word) > 3 else "isx")
+        letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        if edit == "d":
+            word = word[:i] + word[i + 1:]
+        elif edit == "i":
+            word = word[:i] + letter + word[i:]
+        elif edit == "s":
+            word = word[:i] + letter + word[i + 1:]
+        elif i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def fuzzy_main(terms: int, queries: int, database_url: str = None):
+    rng = random.Random(7)
+    if database_url:
+        from app.search.fuzzy import catalog_vocabulary
+        engine = create_engine(database_url)
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            vocabulary = catalog_vocabulary(conn)
+        engine.dispose()
+        source = f"read from the catalog in {time.perf_counter() - start:.1f}s"
+    else:
+        vocabulary = generate_vocabulary(terms)
+        source = "synthetic"
+
+    start = time.perf_counter()
+    index = DeletionIndex(vocabulary, max_terms=terms)
+    build_seconds = time.perf_counter() - start
+    # Tracing slows the build down severalfold, so memory is measured on a second build
+    del index
+    tracemalloc.start()
+    index = DeletionIndex(vocabulary, max_terms=terms)
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    targets = [rng.choice(index.terms) for _ in range(queries)]
+    typos = [misspell(word, rng) for word in targets]
+    timings, found = [], 0
+    for target, typo in zip(targets, typos):
+        start = time.perf_counter()
+        matches = index.lookup(typo)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += any(term == target for term, _, _ in matches)
+    timings.sort()
+
+    # Baseline: compare the query with every term (a BK-tree prunes some of this work)
+    scans = []
+    for typo in typos[:20]:
+        start = time.perf_counter()
+        limit = max_distance_for(typo)
+        [term for term in index.terms if edit_distance(typo, term, limit) <= limit]
+        scans.append((time.perf_counter() - start) * 1000)
+
+    stats = index.stats()
+    print(f"Vocabulary: {stats['terms']:,} terms ({source}), {stats['deletes']:,} deletes")
+    print(f"Build: {build_seconds:.1f}s, {index_bytes / 2**20:.0f} MB")
+    print(f"Lookup of {queries:,} misspellings: p50 {statistics.median(timings):.3f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms, intended word found {found / queries:.1%}")
+    print(f"Linear scan: p50 {statistics.median(scans):.1f} ms")
@@ -0,0 +1,152 @@
+import logging
+from typing import Dict, Optional
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.metrics import registry
+from app.cache_store import create_store
+from app.models.user import User, UserRole
+from app.models.song import Song
+from app.models.album import Album
+from app.models.genre import Genre
+from app.models.lyrics import Lyrics
+from app.models.playlist import Playlist
+from app.models.catalog_version import CatalogVersion
+from app.search.backends import tokenize
+
+logger = logging.getLogger(__name__)
+
+CATALOG = "search"
+# Browse facets only depend on songs, albums, genres and artists; playlist edits, which are
+# far more frequent, must not throw away their much costlier cached counts
+BROWSE = "browse"
+
+cache_requests = registry.counter(
+    "search_cache_requests_total",
+    "Search result cache lookups by outcome (hit or miss)",
+    labelnames=("result",)
+)
+cache_evictions = registry.counter(
+    "search_cache_evictions_total",
+    "Search results dropped from the in-process cache to stay within search_cache_max_bytes"
+)
+
+
+def catalog_version(db, name: str = CATALOG) -> Optional[int]:
+    """Current version of a catalog counter (None if its row is missing)"""
+    return db.execute(select(CatalogVersion.version).where(CatalogVersion.name == name)).scalar()
+
+
+def bump_catalog_version(db, *names: str):
+    """Invalidate cached search results and browse facets (or only `names`) once the caller's transaction commits"""
+    db.execute(update(CatalogVersion).where(CatalogVersion.name.in_(names or (CATALOG, BROWSE))).values(
+        version=CatalogVersion.version + 1
+    ))
+
+
+def _create_store():
+    return create_store(settings.search_cache_backend, settings.search_cache_max_bytes, "Search cache", cache_evictions)
+
+
+class SearchCache:
+    """Encoded /search responses keyed by catalog version, normalized query, type and page"""
+
+    def __init__(self):
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = _create_store()
+        return self._store
+
+    @staticmethod
+    def key(version: int, q: str, type: str, skip: int, limit: int, facets: bool = False) -> str:
+        # Queries with the same tokens run the same search, whatever their case and punctuation
+        return f"search:{version}:{type}:{skip}:{limit}:{int(facets)}:{' '.join(tokenize(q))}"
+
+    @staticmethod
+    def facets_key(version: int, genre_id: Optional[int], artist_id: Optional[int], limit: int) -> str:
+        return f"facets:{version}:{genre_id}:{artist_id}:{limit}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.store.get(key)
+        cache_requests.inc(result="hit" if value is not None else "miss")
+        return value
+
+    def set(self, key: str, value: bytes):
+        self.store.set(key, value, settings.search_cache_ttl)
+
+    def stats(self) -> Dict[str, object]:
+        hits, misses = cache_requests.value(result="hit"), cache_requests.value(result="miss")
+        return {
+            "backend": self.store.name,
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            **self.store.stats(),
+        }
+
+
+search_cache = SearchCache()
+registry.gauge(
+    "search_cache_bytes", "Size of the in-process search result cache",
+    func=lambda: search_cache.store.stats().get("bytes", 0)
+)
+
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _affects_search(obj) -> bool:
+    """Whether an update can alter /search results (inserts and deletes are _searchable_row)"""
+    if isinstance(obj, Song):
+        return _changed(obj, "title", "status", "artist_id", "album_id", "genre_id")
+    if isinstance(obj, User):
+        return _changed(obj, "username", "role", "deleted_at", "is_active")
+    if isinstance(obj, Playlist):
+        return _changed(obj, "name", "description")
+    if isinstance(obj, Album):
+        return _changed(obj, "title", "cover_art_url")
+    if isinstance(obj, Lyrics):
+        return _changed(obj, "text")
+    return False
+
+
+def _searchable_row(obj) -> bool:
+    if isinstance(obj, User):
+        return obj.role == UserRole.ARTIST
+    return isinstance(obj, (Song, Playlist, Album, Lyrics))
+
+
+def _affects_browse(obj) -> bool:
+    """Whether an update can alter /songs/facets counts or labels"""
+    if isinstance(obj, Song):
+        return _changed(obj, "status", "artist_id", "album_id", "genre_id")
+    if isinstance(obj, User):
+        return _changed(obj, "username", "role", "deleted_at", "is_active")
+    if isinstance(obj, Album):
+        return _changed(obj, "title")
+    if isinstance(obj, Genre):
+        return _changed(obj, "name")
+    return False
+
+
+def _browsable_row(obj) -> bool:
+    if isinstance(obj, User):
+        return obj.role == UserRole.ARTIST
+    return isinstance(obj, (Song, Album, Genre))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_catalog_change(session: Session, flush_context):
+    changed = session.new | session.deleted
+    names = []
+    if any(_searchable_row(obj) for obj in changed) or any(_affects_search(obj) for obj in session.dirty):
+        names.append(CATALOG)
+    if any(_browsable_row(obj) for obj in changed) or any(_affects_browse(obj) for obj in session.dirty):
+        names.append(BROWSE)
+    if names:
+        bump_catalog_version(session.connection(), *names)
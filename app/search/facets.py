@@ -0,0 +1,60 @@
+from typing import Dict, List
+from sqlalchemy import Integer, String, and_, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from app.models.song import Song, SongStatus
+from app.models.user import User
+from app.models.genre import Genre
+from app.models.album import Album
+
+MAX_FACET_VALUES = 10
+
+# Facet name -> (song column counted, table and column its display name comes from)
+FACETS = {
+    "genre": (Song.genre_id, Genre, Genre.name),
+    "artist": (Song.artist_id, User, User.username),
+    "album": (Song.album_id, Album, Album.title),
+}
+
+
+def song_facets(db: Session, *criteria, limit: int = MAX_FACET_VALUES) -> Dict:
+    """
+    Number of approved songs matching `criteria` and the `limit` most common genres,
+    artists and albums among them, all from one statement: the matching songs are a CTE,
+    each facet groups it, and a window function keeps the top values of every group.
+    """
+    matched = select(Song.genre_id, Song.artist_id, Song.album_id).where(
+        Song.status == SongStatus.APPROVED, *criteria
+    ).cte("matched")
+
+    grouped = union_all(
+        select(literal("total", String).label("facet"), literal(0, Integer).label("value"), func.count().label("count"))
+        .select_from(matched),
+        *[
+            select(literal(name, String), matched.c[column.key], func.count())
+            .where(matched.c[column.key].isnot(None)).group_by(matched.c[column.key])
+            for name, (column, _, _) in FACETS.items()
+        ]
+    ).subquery()
+    ranked = select(
+        grouped.c.facet, grouped.c.value, grouped.c.count,
+        func.row_number().over(
+            partition_by=grouped.c.facet, order_by=(grouped.c.count.desc(), grouped.c.value)
+        ).label("rank")
+    ).subquery()
+
+    # Names are joined only for the values that survive the cut
+    query = select(ranked.c.facet, ranked.c.value, ranked.c.count, *[name for _, _, name in FACETS.values()])
+    query = query.select_from(ranked)
+    for facet, (_, table, _) in FACETS.items():
+        query = query.outerjoin(table, and_(ranked.c.facet == facet, table.id == ranked.c.value))
+    query = query.where(ranked.c.rank <= limit).order_by(ranked.c.facet, ranked.c.rank)
+
+    total = 0
+    facets: Dict[str, List[Dict]] = {facet: [] for facet in FACETS}
+    order = list(FACETS)
+    for facet, value, count, *names in db.execute(query):
+        if facet == "total":
+            total = count
+        else:
+            facets[facet].append({"id": value, "name": names[order.index(facet)], "count": count})
+    return {"total": total, "facets": facets}
@@ -0,0 +1,306 @@
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.user import User, UserRole
+from app.models.song import Song, SongStatus
+from app.models.playlist import Playlist
+from app.models.search_document import SearchDocument
+from app.search.suggest import normalize
+
+logger = logging.getLogger(__name__)
+
+MAX_EDIT_DISTANCE = 2
+# Deletes are generated from the first PREFIX_LENGTH characters only and candidates are
+# verified against the whole word, so long words cost no more than short ones
+PREFIX_LENGTH = 7
+# Shorter words have too many neighbours within one edit to correct meaningfully
+MIN_TERM_LENGTH = 3
+
+# A delete is stored as one 64-bit integer: 39 bits of its hash above a 24-bit term id.
+# Hash collisions only add candidates, which the edit-distance check then rejects.
+_TERM_ID_BITS = 24
+_HASH_MASK = (1 << 39) - 1
+MAX_TERMS = 1 << _TERM_ID_BITS
+
+
+def words(text: str) -> List[str]:
+    """Correctable words of a title or query (same normalization as the suggest index)"""
+    return [
+        word for word in normalize(text).split()
+        if len(word) >= MIN_TERM_LENGTH and not word.isdigit()
+    ]
+
+
+def max_distance_for(word: str) -> int:
+    return 1 if len(word) <= 4 else MAX_EDIT_DISTANCE
+
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """The word's prefix with every combination of up to `distance` characters removed"""
+    key = word[:PREFIX_LENGTH]
+    result = {key}
+    frontier = {key}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a transposition counts as one edit), capped at limit + 1"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A typo and its intended word usually share most of their ends; only the middle needs the DP
+    shortest = min(len(a), len(b))
+    start = 0
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+    # Each edit changes the set of letters used by at most two
+    if len(set(a) ^ set(b)) > 2 * limit:
+        return limit + 1
+    return _banded_distance(a, b, limit)
+
+
+def _banded_distance(a: str, b: str, limit: int) -> int:
+    # Only the diagonal band of width 2 * limit + 1 can stay within the limit, and the
+    # scan stops as soon as a whole row exceeds it
+    len_a, len_b = len(a), len(b)
+    over = limit + 1
+    before = None
+    previous = [j if j <= limit else over for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        current = [over] * (len_b + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        char = a[i - 1]
+        for j in range(max(1, i - limit), min(len_b, i + limit) + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] < value:
+                value = previous[j] + 1
+            if current[j - 1] < value:
+                value = current[j - 1] + 1
+            if before is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] and before[j - 2] < value:
+                value = before[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[len_b], over)
+
+
+def _delete_key(delete: str) -> int:
+    return (hash(delete) & _HASH_MASK) << _TERM_ID_BITS
+
+
+class DeletionIndex:
+    """
+    SymSpell-style dictionary: every term is reachable from the deletes it shares with
+    any word within MAX_EDIT_DISTANCE, so a lookup generates the query's deletes and
+    checks only the terms stored under them instead of scanning the vocabulary.
+
+    The bulk-loaded deletes are one sorted array of packed (hash, term id) integers,
+    about 8 bytes each; terms added later go to a small dict until the next rebuild.
+    The vocabulary is capped at `max_terms`, keeping the most frequent words.
+    """
+
+    def __init__(self, frequencies: Dict[str, int] = None, max_terms: int = 200_000):
+        self.max_terms = min(max_terms, MAX_TERMS)
+        self.terms: List[str] = []
+        self.counts = array("I")
+        self._term_ids: Dict[str, int] = {}
+        self._extra: Dict[int, List[int]] = {}
+
+        packed = array("q")
+        ranked = sorted((frequencies or {}).items(), key=lambda item: (-item[1], item[0]))
+        for term, count in ranked[:self.max_terms]:
+            term_id = self._append_term(term, count)
+            packed.extend(_delete_key(delete) | term_id for delete in deletes(term, MAX_EDIT_DISTANCE))
+        self._packed = array("q", sorted(packed))
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._term_ids
+
+    def _append_term(self, term: str, count: int) -> int:
+        term_id = len(self.terms)
+        self.terms.append(term)
+        self.counts.append(count)
+        self._term_ids[term] = term_id
+        return term_id
+
+    def add(self, term: str, count: int = 1) -> bool:
+        """Count another occurrence of a term; False when a new term no longer fits"""
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            self.counts[term_id] = min(self.counts[term_id] + count, 0xFFFFFFFF)
+            return True
+        if len(self.terms) >= self.max_terms:
+            return False
+        term_id = self._append_term(term, count)
+        for delete in deletes(term, MAX_EDIT_DISTANCE):
+            self._extra.setdefault(_delete_key(delete), []).append(term_id)
+        return True
+
+    def _candidates(self, word: str, distance: int) -> Set[int]:
+        packed, extra = self._packed, self._extra
+        found = set()
+        for delete in deletes(word, distance):
+            key = _delete_key(delete)
+            position = bisect_left(packed, key)
+            end = key | (MAX_TERMS - 1)
+            while position < len(packed) and packed[position] <= end:
+                found.add(packed[position] & (MAX_TERMS - 1))
+                position += 1
+            found.update(extra.get(key, ()))
+        return found
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """(term, distance, count) within max_distance, closest and then most frequent first"""
+        if max_distance is None:
+            max_distance = max_distance_for(word)
+        matches = []
+        for term_id in self._candidates(word, max_distance):
+            term = self.terms[term_id]
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance, self.counts[term_id]))
+        matches.sort(key=lambda match: (match[1], -match[2], match[0]))
+        return matches
+
+    def correct(self, word: str) -> Optional[str]:
+        matches = self.lookup(word)
+        return matches[0][0] if matches else None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "terms": len(self.terms),
+            "deletes": len(self._packed) + sum(len(ids) for ids in self._extra.values()),
+        }
+
+
+def catalog_vocabulary(conn, batch_size: int = 5_000) -> Counter:
+    """
+    Word frequencies over the titles of all search documents (songs, artists, playlists),
+    leaving out songs that are not approved: corrections are shown to anyone
+    """
+    frequencies = Counter()
+    query = select(SearchDocument.title).outerjoin(
+        Song, (SearchDocument.entity_type == "song") & (Song.id == SearchDocument.entity_id)
+    ).where((SearchDocument.entity_type != "song") | (Song.status == SongStatus.APPROVED))
+    rows = conn.execution_options(yield_per=batch_size).execute(query)
+    for (title,) in rows:
+        frequencies.update(words(title))
+    return frequencies
+
+
+class FuzzyService:
+    """Owns the live deletion index; new catalog words are queued and folded in on use"""
+
+    def __init__(self):
+        self.index: Optional[DeletionIndex] = None
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def add_words(self, new_words: Iterable[str]):
+        with self._lock:
+            self._pending.update(new_words)
+
+    def rebuild(self, bind):
+        # One build at a time: a search arriving during the scheduled build waits for it
+        with self._build_lock:
+            self._build(bind)
+
+    def _build(self, bind):
+        # Queued words are already committed, so the fresh vocabulary includes them;
+        # words committed while it is read stay queued for the new index
+        with self._lock:
+            self._pending = Counter()
+        with bind.connect() as conn:
+            index = DeletionIndex(catalog_vocabulary(conn), settings.fuzzy_max_terms)
+        with self._lock:
+            self.index = index
+        logger.info(f"Built fuzzy search index: {index.stats()}")
+
+    def ensure_ready(self, bind):
+        if self.index is None:
+            with self._build_lock:
+                if self.index is None:
+                    self._build(bind)
+        if self._pending:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                for word, count in pending.items():
+                    self.index.add(word, count)
+
+    def correct_query(self, query: str) -> Optional[str]:
+        """The query with unknown words replaced by their closest catalog words, or None"""
+        index = self.index
+        if index is None:
+            return None
+        corrected, changed = [], False
+        for word in normalize(query).split():
+            if len(word) >= MIN_TERM_LENGTH and not word.isdigit() and word not in index:
+                replacement = index.correct(word)
+                if replacement:
+                    word, changed = replacement, True
+            corrected.append(word)
+        return " ".join(corrected) if changed else None
+
+
+fuzzy_service = FuzzyService()
+
+
+def _title_history(obj, attribute: str) -> List[str]:
+    return [value for value in inspect(obj).attrs[attribute].history.added if value]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_fuzzy_words(session: Session, flush_context):
+    # Only additions are tracked; words that leave the catalog linger until the next rebuild
+    collected = session.info.setdefault("fuzzy_words", [])
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Song):
+            if obj.status != SongStatus.APPROVED:
+                continue
+            # Approval publishes the whole title
+            titles = [obj.title] if inspect(obj).attrs.status.history.added else _title_history(obj, "title")
+        elif isinstance(obj, User) and obj.role == UserRole.ARTIST:
+            titles = _title_history(obj, "username")
+        elif isinstance(obj, Playlist):
+            titles = _title_history(obj, "name")
+        else:
+            continue
+        for title in titles:
+            collected.extend(words(title))
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_fuzzy_words(session: Session):
+    collected = session.info.pop("fuzzy_words", None)
+    if collected:
+        fuzzy_service.add_words(collected)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_fuzzy_words(session: Session):
+    session.info.pop("fuzzy_words", None)
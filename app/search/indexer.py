@@ -0,0 +1,172 @@
+import logging
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+from app.models.user import User, UserRole
+from app.models.song import Song
+from app.models.album import Album
+from app.models.lyrics import Lyrics
+from app.models.playlist import Playlist
+from app.models.search_document import SearchDocument
+
+logger = logging.getLogger(__name__)
+
+# Keep IN lists and multi-row inserts well under driver parameter limits
+CHUNK_SIZE = 500
+
+
+def _chunks(ids: List[int], size: int = CHUNK_SIZE) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _join_text(*parts) -> str:
+    return " ".join(part for part in parts if part)
+
+
+def song_documents(conn, song_ids: List[int]) -> List[Dict]:
+    """Title plus artist name, album title and lyrics, so 'artist song' queries match"""
+    rows = conn.execute(
+        select(Song.id, Song.title, User.username, Album.title, Lyrics.text)
+        .outerjoin(User, Song.artist_id == User.id)
+        .outerjoin(Album, Song.album_id == Album.id)
+        .outerjoin(Lyrics, Lyrics.song_id == Song.id)
+        .where(Song.id.in_(song_ids))
+    )
+    return [
+        {"entity_type": "song", "entity_id": song_id, "title": title, "body": _join_text(artist, album, lyrics)}
+        for song_id, title, artist, album, lyrics in rows
+    ]
+
+
+def artist_documents(conn, user_ids: List[int]) -> List[Dict]:
+    # Only artists are searchable, and only by name (never by email)
+    rows = conn.execute(
+        select(User.id, User.username).where(
+            User.id.in_(user_ids), User.role == UserRole.ARTIST, User.deleted_at.is_(None)
+        )
+    )
+    return [
+        {"entity_type": "artist", "entity_id": user_id, "title": username, "body": ""}
+        for user_id, username in rows
+    ]
+
+
+def playlist_documents(conn, playlist_ids: List[int]) -> List[Dict]:
+    rows = conn.execute(
+        select(Playlist.id, Playlist.name, Playlist.description).where(Playlist.id.in_(playlist_ids))
+    )
+    return [
+        {"entity_type": "playlist", "entity_id": playlist_id, "title": name, "body": description or ""}
+        for playlist_id, name, description in rows
+    ]
+
+
+DOCUMENT_BUILDERS = {
+    "song": song_documents,
+    "artist": artist_documents,
+    "playlist": playlist_documents,
+}
+
+ENTITY_IDS = {
+    "song": Song.id,
+    "artist": User.id,
+    "playlist": Playlist.id,
+}
+
+
+def reindex(conn, entity_type: str, entity_ids: Iterable[int]):
+    """Replace the search documents of the given entities (deleted entities just lose theirs)"""
+    ids = sorted(set(entity_ids))
+    for chunk in _chunks(ids):
+        conn.execute(delete(SearchDocument).where(
+            SearchDocument.entity_type == entity_type, SearchDocument.entity_id.in_(chunk)
+        ))
+        documents = DOCUMENT_BUILDERS[entity_type](conn, chunk)
+        if documents:
+            conn.execute(insert(SearchDocument), documents)
+
+
+def rebuild_index(conn, batch_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    """Rebuild every search document from scratch; returns documents written per type"""
+    conn.execute(delete(SearchDocument))
+    counts = {}
+    for entity_type, id_column in ENTITY_IDS.items():
+        written = 0
+        last_id = 0
+        while True:
+            ids = list(conn.execute(
+                select(id_column).where(id_column > last_id).order_by(id_column).limit(batch_size)
+            ).scalars())
+            if not ids:
+                break
+            documents = DOCUMENT_BUILDERS[entity_type](conn, ids)
+            if documents:
+                conn.execute(insert(SearchDocument), documents)
+            written += len(documents)
+            last_id = ids[-1]
+        counts[entity_type] = written
+    logger.info(f"Rebuilt search index: {counts}")
+    return counts
+
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _collect_changes(session: Session) -> Dict[str, Set[int]]:
+    """Entities whose search documents are affected by the objects in this flush"""
+    changes: Dict[str, Set[int]] = {"song": set(), "artist": set(), "playlist": set()}
+    artists_renamed: Set[int] = set()
+    albums_renamed: Set[int] = set()
+
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Song):
+            changes["song"].add(obj.id)
+        elif isinstance(obj, Lyrics):
+            changes["song"].add(obj.song_id)
+        elif isinstance(obj, User):
+            changes["artist"].add(obj.id)
+        elif isinstance(obj, Playlist):
+            changes["playlist"].add(obj.id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Song) and _changed(obj, "title", "artist_id", "album_id"):
+            changes["song"].add(obj.id)
+        elif isinstance(obj, Lyrics) and _changed(obj, "text"):
+            changes["song"].add(obj.song_id)
+        elif isinstance(obj, User) and _changed(obj, "username", "role", "deleted_at"):
+            changes["artist"].add(obj.id)
+            if _changed(obj, "username"):
+                artists_renamed.add(obj.id)
+        elif isinstance(obj, Album) and _changed(obj, "title"):
+            albums_renamed.add(obj.id)
+        elif isinstance(obj, Playlist) and _changed(obj, "name", "description"):
+            changes["playlist"].add(obj.id)
+
+    # Song documents embed artist and album names
+    if artists_renamed or albums_renamed:
+        connection = session.connection()
+        if artists_renamed:
+            changes["song"].update(connection.execute(
+                select(Song.id).where(Song.artist_id.in_(artists_renamed))
+            ).scalars())
+        if albums_renamed:
+            changes["song"].update(connection.execute(
+                select(Song.id).where(Song.album_id.in_(albums_renamed))
+            ).scalars())
+    return changes
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_documents(session: Session, flush_context):
+    """Keep search_documents in the same transaction as the ORM writes that change them"""
+    changes = _collect_changes(session)
+    if not any(changes.values()):
+        return
+    connection = session.connection()
+    for entity_type, entity_ids in changes.items():
+        entity_ids.discard(None)
+        if entity_ids:
+            reindex(connection, entity_type, entity_ids)
@@ -0,0 +1,205 @@
+import html
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.models.song import Song, SongStatus
+from app.models.lyrics import Lyrics
+from app.models.lyrics_posting import LyricsPosting
+from app.song_details import song_details_query, to_song_details
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 16
+SNIPPET_CONTEXT = 8  # words shown on each side of the match
+# Document frequencies are only needed to order terms rarest first, so counting stops here
+FREQUENCY_PROBE_LIMIT = 10_000
+# Songs checked per query at most; only phrases made entirely of very common words reach
+# it, and they then rank and count the matches among the first songs by id
+MAX_SONGS_SCANNED = 10_000
+CHUNK_SIZE = 500
+
+
+def _fold(word: str) -> str:
+    word = word.lower()
+    if not word.isascii():
+        word = "".join(ch for ch in unicodedata.normalize("NFKD", word) if not unicodedata.combining(ch))
+    return word[:MAX_TERM_LENGTH]
+
+
+def tokens(text: str) -> List[Tuple[str, int, int]]:
+    """(term, start, end) of every word, in order; a word's list index is its position"""
+    return [(_fold(match.group()), match.start(), match.end()) for match in _WORD_RE.finditer(text)]
+
+
+def encode_positions(positions: Iterable[int]) -> bytes:
+    """Ascending positions as varint-encoded gaps (one byte per gap below 128)"""
+    out = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def decode_positions(data: bytes) -> List[int]:
+    if data.isascii():
+        # Every gap fits one byte (the usual case for lyrics): a running sum, done in C
+        return list(accumulate(data))
+    positions = []
+    position = gap = shift = 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        position += gap
+        positions.append(position)
+        gap = shift = 0
+    return positions
+
+
+def _postings(text: str) -> List[Dict]:
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for position, (term, _, _) in enumerate(tokens(text)):
+        positions[term].append(position)
+    return [{"term": term, "positions": encode_positions(found)} for term, found in positions.items()]
+
+
+def index_lyrics(db, song_id: int, text: Optional[str]):
+    """Replace the postings of one song (in the caller's transaction; db is a Session or Connection)"""
+    db.execute(delete(LyricsPosting).where(LyricsPosting.song_id == song_id))
+    rows = _postings(text) if text else []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(LyricsPosting), [
+            {**row, "song_id": song_id} for row in rows[start:start + CHUNK_SIZE]
+        ])
+
+
+def rebuild_lyrics_index(conn, batch_size: int = CHUNK_SIZE) -> int:
+    """Rebuild every posting from the lyrics table; returns the number of songs indexed"""
+    conn.execute(delete(LyricsPosting))
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            select(Lyrics.id, Lyrics.song_id, Lyrics.text).where(Lyrics.id > last_id).order_by(Lyrics.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return indexed
+        rows = [{**row, "song_id": song_id} for _, song_id, text in batch for row in _postings(text)]
+        for start in range(0, len(rows), CHUNK_SIZE):
+            conn.execute(insert(LyricsPosting), rows[start:start + CHUNK_SIZE])
+        indexed += len(batch)
+        last_id = batch[-1][0]
+
+
+def _frequency(conn, term: str) -> int:
+    capped = select(LyricsPosting.song_id).where(LyricsPosting.term == term).limit(FREQUENCY_PROBE_LIMIT).subquery()
+    return conn.execute(select(func.count()).select_from(capped)).scalar()
+
+
+def _match_positions(terms: List[str], positions: Dict[str, List[int]], phrase: bool) -> List[int]:
+    """Start positions of the phrase, or of the first query term when word order does not matter"""
+    if not phrase:
+        return positions[terms[0]]
+    # A phrase starts at p when its i-th term occurs at p + i: shift each list back and intersect
+    starts = set(positions[terms[0]])
+    for offset, term in enumerate(terms[1:], 1):
+        if not starts:
+            break
+        starts.intersection_update(map((-offset).__add__, positions[term]))
+    return sorted(starts)
+
+
+def match_lyrics(db: Session, q: str, phrase: bool = True) -> List[Tuple[int, List[int]]]:
+    """
+    (song_id, match start positions) of every song whose lyrics contain the query,
+    most matches first. Terms are intersected rarest first, so common words are only
+    looked up for songs that already contain the rare ones.
+    """
+    terms = [term for term, _, _ in tokens(q)][:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    # Core rows: posting lists can be long and need no ORM processing
+    conn = db.connection()
+    frequencies = {term: _frequency(conn, term) for term in set(terms)}
+    if not all(frequencies.values()):
+        return []
+
+    # One self-join driven by the rarest term: the database intersects the posting
+    # lists and only songs containing every term come back, with all their positions
+    ordered = sorted(frequencies, key=frequencies.get)
+    postings = [LyricsPosting.__table__.alias(f"p{i}") for i in range(len(ordered))]
+    driver = postings[0]
+    query = select(driver.c.song_id, *[p.c.positions for p in postings]).where(driver.c.term == ordered[0])
+    for term, joined in zip(ordered[1:], postings[1:]):
+        query = query.join(joined, (joined.c.term == term) & (joined.c.song_id == driver.c.song_id))
+    query = query.order_by(driver.c.song_id).limit(MAX_SONGS_SCANNED)
+
+    matches = []
+    for song_id, *encoded in conn.execute(query):
+        positions = {term: decode_positions(data) for term, data in zip(ordered, encoded)}
+        starts = _match_positions(terms, positions, phrase)
+        if starts:
+            matches.append((song_id, starts))
+    matches.sort(key=lambda match: (-len(match[1]), match[0]))
+    return matches
+
+
+def snippet(text: str, start: int, highlighted: Set[int]) -> str:
+    """HTML-escaped lyrics around word position `start`, highlighted words wrapped in <mark>"""
+    words = tokens(text)
+    first = max(0, start - SNIPPET_CONTEXT)
+    last = min(len(words), start + len(highlighted) + SNIPPET_CONTEXT) - 1
+    if not words or first > last:
+        return ""
+
+    parts = ["…" if first > 0 else ""]
+    cursor = words[first][1]
+    for position in range(first, last + 1):
+        _, word_start, word_end = words[position]
+        parts.append(html.escape(text[cursor:word_start]))
+        word = html.escape(text[word_start:word_end])
+        parts.append(f"<mark>{word}</mark>" if position in highlighted else word)
+        cursor = word_end
+    parts.append("…" if last < len(words) - 1 else "")
+    # Line breaks separate lyric lines; a snippet reads better on one line
+    return " ".join("".join(parts).split())
+
+
+def search_lyrics(db: Session, q: str, skip: int, limit: int, phrase: bool = True) -> Tuple[int, List[Dict]]:
+    """(total, page) of approved songs matching the query, each with a highlighted snippet"""
+    matches = match_lyrics(db, q, phrase)
+    approved = set()
+    ids = [song_id for song_id, _ in matches]
+    for start in range(0, len(ids), CHUNK_SIZE):
+        approved.update(db.execute(select(Song.id).where(
+            Song.id.in_(ids[start:start + CHUNK_SIZE]), Song.status == SongStatus.APPROVED
+        )).scalars())
+    matches = [match for match in matches if match[0] in approved]
+    page = matches[skip:skip + limit]
+    if not page:
+        return len(matches), []
+
+    page_ids = [song_id for song_id, _ in page]
+    songs = {row[0].id: row for row in song_details_query(db).filter(Song.id.in_(page_ids)).all()}
+    texts = dict(db.execute(select(Lyrics.song_id, Lyrics.text).where(Lyrics.song_id.in_(page_ids))).all())
+    length = len(tokens(q)[:MAX_QUERY_TERMS]) if phrase else 1
+
+    results = []
+    for song_id, starts in page:
+        first = starts[0]
+        results.append({
+            "song": to_song_details(songs[song_id]),
+            "snippet": snippet(texts.get(song_id, ""), first, set(range(first, first + length))),
+            "matches": len(starts),
+        })
+    return len(matches), results
@@ -0,0 +1,53 @@
+from typing import Dict, List
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.user import User, UserRole
+from app.models.song import Song, SongStatus
+from app.models.playlist import Playlist
+from app.schemas.song import SongWithDetails
+from app.song_details import song_details_query, to_song_details
+from app.search.backends import get_search_backend
+from app.search.facets import FACETS, MAX_FACET_VALUES, song_facets
+
+
+def _hits(db: Session, entity_type: str, q: str):
+    selectable = get_search_backend(db.get_bind()).match(entity_type, q)
+    return selectable.subquery() if selectable is not None else None
+
+
+def search_songs(db: Session, q: str, skip: int, limit: int) -> List[SongWithDetails]:
+    """Approved songs ranked by title, artist, album and lyrics relevance"""
+    hits = _hits(db, "song", q)
+    if hits is None:
+        return []
+    rows = song_details_query(db).join(hits, hits.c.entity_id == Song.id).filter(
+        Song.status == SongStatus.APPROVED
+    ).order_by(hits.c.rank, Song.id).offset(skip).limit(limit).all()
+    return [to_song_details(row) for row in rows]
+
+
+def search_song_facets(db: Session, q: str, limit: int = MAX_FACET_VALUES) -> Dict:
+    """Genre, artist and album counts over every song the query matches, not just one page"""
+    hits = _hits(db, "song", q)
+    if hits is None:
+        return {"total": 0, "facets": {facet: [] for facet in FACETS}}
+    # IN rather than a join: the hit set is built once, before the facet CTE scans it
+    return song_facets(db, Song.id.in_(select(hits.c.entity_id)), limit=limit)
+
+
+def search_artists(db: Session, q: str, skip: int, limit: int) -> List[User]:
+    hits = _hits(db, "artist", q)
+    if hits is None:
+        return []
+    return db.query(User).join(hits, hits.c.entity_id == User.id).filter(
+        User.role == UserRole.ARTIST
+    ).order_by(hits.c.rank, User.id).offset(skip).limit(limit).all()
+
+
+def search_playlists(db: Session, q: str, skip: int, limit: int) -> List[Playlist]:
+    hits = _hits(db, "playlist", q)
+    if hits is None:
+        return []
+    return db.query(Playlist).join(hits, hits.c.entity_id == Playlist.id).order_by(
+        hits.c.rank, Playlist.id
+    ).offset(skip).limit(limit).all()
@@ -0,0 +1,407 @@
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+from app.models.user import User, UserRole
+from app.models.song import Song, SongStatus
+from app.models.album import Album
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("song", "artist", "album")
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Word prefixes shorter than a trigram are served from their own postings
+SHORT_PREFIX_LENGTHS = (1, 2)
+
+# Candidates verified per query at most; bounds latency when only rare combinations of
+# common words match, at the cost of missing their least popular matches
+MAX_CANDIDATES_SCANNED = 8_000
+
+
+_NON_ALNUM_ASCII = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse everything but letters and digits to single spaces"""
+    if text.isascii():
+        return _NON_ALNUM_ASCII.sub(" ", text.lower()).strip()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    cleaned = "".join(
+        ch if ch.isalnum() else " " for ch in decomposed if not unicodedata.combining(ch)
+    )
+    return " ".join(cleaned.split())
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _index_keys(normalized: str) -> Set[str]:
+    keys = trigrams(normalized)
+    for word in normalized.split():
+        keys.update(word[:length] for length in SHORT_PREFIX_LENGTHS if len(word) >= length)
+    return keys
+
+
+def _match_quality(text: str, query: str) -> int:
+    """0: whole text starts with the query, 1: a word does, 2: infix match"""
+    if text.startswith(query):
+        return 0
+    if " " + query in text:
+        return 1
+    return 2
+
+
+class _TextColumn:
+    """
+    Many short strings stored as one string plus offsets, avoiding a Python object
+    per entry for the bulk-loaded part. Later additions are kept in a plain list.
+    """
+
+    def __init__(self, texts: List[str]):
+        self._blob = "".join(texts)
+        self._offsets = array("I", [0])
+        for text in texts:
+            self._offsets.append(self._offsets[-1] + len(text))
+        self._frozen = len(texts)
+        self._extra: List[str] = []
+
+    def append(self, text: str):
+        self._extra.append(text)
+
+    def __getitem__(self, i: int) -> str:
+        if i < self._frozen:
+            return self._blob[self._offsets[i]:self._offsets[i + 1]]
+        return self._extra[i - self._frozen]
+
+    def contains(self, i: int, query: str) -> bool:
+        if i < self._frozen:
+            offsets = self._offsets
+            return self._blob.find(query, offsets[i], offsets[i + 1]) >= 0
+        return query in self._extra[i - self._frozen]
+
+
+class SuggestIndex:
+    """
+    In-process trigram index over song titles, artist names and album titles.
+
+    Entries live in slots numbered by descending popularity at build time, and every
+    posting list is an array of ascending slots. Walking the shortest posting list
+    therefore visits the most popular candidates first and can stop after a few matches.
+    Later additions get new (higher) slots; removals only clear the slot's alive flag.
+    A periodic rebuild restores popularity order and drops dead slots.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int, str, int]] = ()):
+        """Bulk-load (kind, entity_id, text, artist_id) tuples, most popular first"""
+        self.kinds = array("B")
+        self.entity_ids = array("I")
+        self.artist_ids = array("I")
+        self.alive = bytearray()
+        self.postings: Dict[str, array] = defaultdict(lambda: array("I"))
+        # Entity ids are dense autoincrement keys, so id -> slot is an array per kind (-1: absent)
+        self._slot_of = {code: array("i") for code in _KIND_CODES.values()}
+        self.artist_names: Dict[int, str] = {}
+        self.dead = 0
+
+        texts, normalized_texts = [], []
+        for kind, entity_id, text, artist_id in entries:
+            normalized = normalize(text)
+            if not normalized or self._slot(_KIND_CODES[kind], entity_id) != -1:
+                continue
+            self._append_slot(kind, entity_id, artist_id, normalized)
+            texts.append(text)
+            normalized_texts.append(normalized)
+        self.texts = _TextColumn(texts)
+        self.normalized = _TextColumn(normalized_texts)
+
+    def __len__(self) -> int:
+        return len(self.alive)
+
+    def _slot(self, code: int, entity_id: int) -> int:
+        slots = self._slot_of[code]
+        return slots[entity_id] if entity_id < len(slots) else -1
+
+    def _append_slot(self, kind: str, entity_id: int, artist_id: int, normalized: str) -> int:
+        code = _KIND_CODES[kind]
+        slot = len(self.alive)
+        self.kinds.append(code)
+        self.entity_ids.append(entity_id)
+        self.artist_ids.append(artist_id or 0)
+        self.alive.append(1)
+
+        slots = self._slot_of[code]
+        if entity_id >= len(slots):
+            slots.extend([-1] * (entity_id + 1 - len(slots)))
+        slots[entity_id] = slot
+
+        postings = self.postings
+        for key in _index_keys(normalized):
+            postings[key].append(slot)
+        return slot
+
+    def add(self, kind: str, entity_id: int, text: str, artist_id: int = 0):
+        self.remove(kind, entity_id)
+        normalized = normalize(text)
+        if not normalized:
+            return
+        self._append_slot(kind, entity_id, artist_id, normalized)
+        self.texts.append(text)
+        self.normalized.append(normalized)
+
+    def remove(self, kind: str, entity_id: int):
+        code = _KIND_CODES[kind]
+        slot = self._slot(code, entity_id)
+        if slot != -1:
+            self._slot_of[code][entity_id] = -1
+            self.alive[slot] = 0
+            self.dead += 1
+
+    def suggest(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        if len(normalized) < 3:
+            # Only single-word prefixes are indexed below trigram length
+            candidates = self.postings.get(normalized) if " " not in normalized else None
+        else:
+            lists = [self.postings.get(gram) for gram in trigrams(normalized)]
+            candidates = None if any(p is None for p in lists) else min(lists, key=len)
+        if not candidates:
+            return []
+
+        # Collect a few more than needed so exact prefixes can overtake more popular infixes
+        wanted = limit * 4
+        alive, kinds = self.alive, self.kinds
+        kind_code = _KIND_CODES[kind] if kind else None
+        contains = self.normalized.contains if len(normalized) >= 3 else None
+        matches = []
+        for slot in islice(candidates, MAX_CANDIDATES_SCANNED):
+            if not alive[slot] or (kind_code is not None and kinds[slot] != kind_code):
+                continue
+            if contains is not None and not contains(slot, normalized):
+                continue
+            matches.append(slot)
+            if len(matches) >= wanted:
+                break
+
+        matches.sort(key=lambda slot: (_match_quality(self.normalized[slot], normalized), slot))
+        return [self._suggestion(slot) for slot in matches[:limit]]
+
+    def _suggestion(self, slot: int) -> Dict:
+        artist_id = self.artist_ids[slot]
+        return {
+            "type": KINDS[self.kinds[slot]],
+            "id": self.entity_ids[slot],
+            "text": self.texts[slot],
+            "artist_name": self.artist_names.get(artist_id) if artist_id else None,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self) - self.dead,
+            "dead_slots": self.dead,
+            "keys": len(self.postings),
+            "postings": sum(len(p) for p in self.postings.values()),
+        }
+
+
+def _song_rows(conn, song_ids: Optional[Iterable[int]] = None):
+    query = select(Song.id, Song.title, Song.artist_id).where(Song.status == SongStatus.APPROVED)
+    if song_ids is not None:
+        return conn.execute(query.where(Song.id.in_(list(song_ids))))
+    return conn.execute(query.order_by(Song.play_count.desc(), Song.id))
+
+
+def _artist_rows(conn, artist_ids: Optional[Iterable[int]] = None):
+    plays = select(Song.artist_id, func.sum(Song.play_count).label("plays")).where(
+        Song.status == SongStatus.APPROVED
+    ).group_by(Song.artist_id).subquery()
+    query = select(User.id, User.username).outerjoin(plays, plays.c.artist_id == User.id).where(
+        User.role == UserRole.ARTIST, User.deleted_at.is_(None)
+    )
+    if artist_ids is not None:
+        return conn.execute(query.where(User.id.in_(list(artist_ids))))
+    return conn.execute(query.order_by(func.coalesce(plays.c.plays, 0).desc(), User.id))
+
+
+def _album_rows(conn, album_ids: Optional[Iterable[int]] = None):
+    plays = select(Song.album_id, func.sum(Song.play_count).label("plays")).where(
+        Song.status == SongStatus.APPROVED
+    ).group_by(Song.album_id).subquery()
+    query = select(Album.id, Album.title, Album.artist_id).outerjoin(plays, plays.c.album_id == Album.id)
+    if album_ids is not None:
+        return conn.execute(query.where(Album.id.in_(list(album_ids))))
+    return conn.execute(query.order_by(func.coalesce(plays.c.plays, 0).desc(), Album.id))
+
+
+def _ranked(kind: str, rows, artist_column: Optional[str]) -> List[Tuple[float, Tuple[str, int, str, int]]]:
+    rows = rows.all()
+    total = len(rows) or 1
+    return [
+        (position / total, (kind, row[0], row[1], row[2] if artist_column else 0))
+        for position, row in enumerate(rows)
+    ]
+
+
+def build_index(conn) -> SuggestIndex:
+    """
+    Build a fresh index. Each kind is loaded most popular first, then the kinds are
+    merged by relative rank (the top 1% of songs sits next to the top 1% of artists)
+    so no kind crowds out the others for short queries.
+    """
+    streams = [
+        _ranked("artist", _artist_rows(conn), None),
+        _ranked("song", _song_rows(conn), "artist_id"),
+        _ranked("album", _album_rows(conn), "artist_id"),
+    ]
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+    index = SuggestIndex(entry for _, entry in merged)
+    index.artist_names = dict(conn.execute(
+        select(User.id, User.username).where(or_(
+            User.id.in_(select(Song.artist_id)), User.id.in_(select(Album.artist_id))
+        ))
+    ).all())
+    return index
+
+
+class SuggestService:
+    """Owns the live index, swaps in rebuilds and applies queued entity changes"""
+
+    def __init__(self):
+        self.index: Optional[SuggestIndex] = None
+        self._pending: Set[Tuple[str, int]] = set()
+        # Changes applied while a rebuild runs; replayed onto the new index after the swap
+        self._replay: Optional[Set[Tuple[str, int]]] = None
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def mark_stale(self, kind: str, entity_ids: Iterable[int]):
+        with self._pending_lock:
+            self._pending.update((kind, entity_id) for entity_id in entity_ids)
+
+    def rebuild(self, bind):
+        # One build at a time: a request arriving during the scheduled build waits for it
+        with self._build_lock:
+            self._build(bind)
+
+    def _build(self, bind):
+        with self._pending_lock:
+            self._replay = set()
+        try:
+            with bind.connect() as conn:
+                index = build_index(conn)
+            with self._write_lock:
+                self.index = index
+        finally:
+            with self._pending_lock:
+                if self._replay is not None:
+                    self._pending |= self._replay
+                self._replay = None
+        logger.info(f"Built suggest index: {index.stats()}")
+
+    def apply_pending(self, bind):
+        """Reload queued songs, artists and albums from the database into the live index"""
+        with self._pending_lock:
+            if self.index is None:
+                return
+            pending, self._pending = self._pending, set()
+            if self._replay is not None:
+                self._replay |= pending
+        if not pending:
+            return
+
+        ids = {kind: [entity_id for k, entity_id in pending if k == kind] for kind in KINDS}
+        with bind.connect() as conn:
+            songs = {row.id: row for row in _song_rows(conn, ids["song"])} if ids["song"] else {}
+            artists = {row.id: row for row in _artist_rows(conn, ids["artist"])} if ids["artist"] else {}
+            albums = {row.id: row for row in _album_rows(conn, ids["album"])} if ids["album"] else {}
+            renamed = dict(conn.execute(
+                select(User.id, User.username).where(User.id.in_(ids["artist"]))
+            ).all()) if ids["artist"] else {}
+
+        with self._write_lock:
+            index = self.index
+            index.artist_names.update(renamed)
+            for song_id in ids["song"]:
+                row = songs.get(song_id)
+                if row:
+                    index.add("song", song_id, row.title, row.artist_id)
+                else:
+                    index.remove("song", song_id)
+            for artist_id in ids["artist"]:
+                row = artists.get(artist_id)
+                if row:
+                    index.add("artist", artist_id, row.username)
+                else:
+                    index.remove("artist", artist_id)
+            for album_id in ids["album"]:
+                row = albums.get(album_id)
+                if row:
+                    index.add("album", album_id, row.title, row.artist_id)
+                else:
+                    index.remove("album", album_id)
+
+    def ensure_ready(self, bind):
+        """Build on first use and fold in queued changes (the scheduler normally does both)"""
+        if self.index is None:
+            with self._build_lock:
+                if self.index is None:
+                    self._build(bind)
+        if self._pending:
+            self.apply_pending(bind)
+
+    def suggest(self, query: str, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        index = self.index
+        return index.suggest(query, limit, kind) if index is not None else []
+
+
+suggest_service = SuggestService()
+
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_suggest_changes(session: Session, flush_context):
+    stale = session.info.setdefault("suggest_stale", set())
+    for obj in session.new | session.deleted:
+        if isinstance(obj, Song):
+            stale.add(("song", obj.id))
+        elif isinstance(obj, User):
+            stale.add(("artist", obj.id))
+        elif isinstance(obj, Album):
+            stale.add(("album", obj.id))
+    for obj in session.dirty:
+        # play_count changes on every stream; popularity is refreshed by the periodic rebuild
+        if isinstance(obj, Song) and _changed(obj, "title", "status", "artist_id"):
+            stale.add(("song", obj.id))
+        elif isinstance(obj, User) and _changed(obj, "username", "role", "deleted_at"):
+            stale.add(("artist", obj.id))
+        elif isinstance(obj, Album) and _changed(obj, "title"):
+            stale.add(("album", obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _queue_suggest_changes(session: Session):
+    stale = session.info.pop("suggest_stale", None)
+    if stale:
+        for kind in KINDS:
+            suggest_service.mark_stale(kind, [entity_id for k, entity_id in stale if k == kind])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_suggest_changes(session: Session):
+    session.info.pop("suggest_stale", None)
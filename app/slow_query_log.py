@@ -0,0 +1,107 @@
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.logging_config import get_logger, request_id_context
+
+logger = get_logger("gspotify.slow_queries")
+
+# EXPLAIN runs on a single background thread so it never delays the request that was slow
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_explain_lock = threading.Lock()
+_last_explained: Dict[str, float] = {}
+_MAX_TRACKED_FINGERPRINTS = 1000
+
+# Set while the EXPLAIN thread is running so its own statements are not reported
+_explain_state = threading.local()
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+}
+
+
+def statement_fingerprint(shape: str) -> str:
+    """Short stable identifier for a normalized statement"""
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+
+
+def bind_shape(parameters: Any, executemany: bool = False) -> str:
+    """Describe bound parameters by type only, so values never reach the logs"""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)}x {bind_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return "()"
+
+
+def is_slow(duration: float) -> bool:
+    threshold_ms = settings.slow_query_threshold_ms
+    return threshold_ms > 0 and duration * 1000 >= threshold_ms and not getattr(_explain_state, "active", False)
+
+
+def should_explain(fingerprint: str) -> bool:
+    """Allow one EXPLAIN per fingerprint per slow_query_explain_interval seconds"""
+    now = time.monotonic()
+    with _explain_lock:
+        last = _last_explained.get(fingerprint)
+        if last is not None and now - last < settings.slow_query_explain_interval:
+            return False
+        if len(_last_explained) >= _MAX_TRACKED_FINGERPRINTS:
+            _last_explained.clear()
+        _last_explained[fingerprint] = now
+        return True
+
+
+def capture_query_plan(engine, statement: str, parameters: Any) -> Optional[List[str]]:
+    """Run EXPLAIN (or EXPLAIN QUERY PLAN) for a read statement on a separate connection"""
+    prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+
+    _explain_state.active = True
+    try:
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+        return [" | ".join(str(column) for column in row) for row in rows]
+    finally:
+        _explain_state.active = False
+
+
+def _explain_and_log(engine, statement: str, parameters: Any, fingerprint: str, request_id: Optional[str]):
+    try:
+        plan = capture_query_plan(engine, statement, parameters)
+    except Exception as e:
+        logger.warning(f"Could not EXPLAIN slow query {fingerprint}: {e}",
+                       extra={"request_id": request_id, "fingerprint": fingerprint})
+        return
+    if plan:
+        logger.warning(
+            f"Query plan for slow query {fingerprint}",
+            extra={"request_id": request_id, "fingerprint": fingerprint, "query_plan": plan}
+        )
+
+
+def log_slow_query(conn, shape: str, statement: str, parameters: Any, duration: float, executemany: bool = False):
+    """Log a statement that exceeded slow_query_threshold_ms and schedule EXPLAIN capture"""
+    fingerprint = statement_fingerprint(shape)
+    request_id = request_id_context.get()
+
+    logger.warning(
+        f"Slow query ({duration * 1000:.1f} ms): {shape[:200]}",
+        extra={
+            "request_id": request_id,
+            "duration": duration,
+            "sql": shape,
+            "bind_shape": bind_shape(parameters, executemany),
+            "fingerprint": fingerprint,
+        }
+    )
+
+    if settings.slow_query_explain and not executemany and should_explain(fingerprint):
+        _explain_executor.submit(_explain_and_log, conn.engine, statement, parameters, fingerprint, request_id)
@@ -0,0 +1,33 @@
+from sqlalchemy.orm import Session, Query
+from app.models.song import Song
+from app.models.user import User
+from app.models.genre import Genre
+from app.models.album import Album
+from app.schemas.song import SongWithDetails
+
+
+def song_details_query(db: Session) -> Query:
+    """
+    Songs joined with the columns SongWithDetails needs, so a page of songs
+    is one query instead of one lazy load per artist, genre and album.
+    """
+    return db.query(
+        Song,
+        User.username,
+        Genre.name,
+        Album.title,
+        Album.cover_art_url
+    ).outerjoin(User, Song.artist_id == User.id).outerjoin(
+        Genre, Song.genre_id == Genre.id
+    ).outerjoin(Album, Song.album_id == Album.id)
+
+
+def to_song_details(row) -> SongWithDetails:
+    """Build a SongWithDetails from a song_details_query() row"""
+    song, artist_name, genre_name, album_title, cover_image_url = row
+    details = SongWithDetails.model_validate(song)
+    details.artist_name = artist_name
+    details.genre_name = genre_name
+    details.album_title = album_title
+    details.cover_image_url = cover_image_url
+    return details
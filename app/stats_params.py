@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import HTTPException, Query, status
+from app.rollups import MAX_POINTS, TimeRange
+
+# Range shown when the client gives no start
+DEFAULT_SPANS = {"hour": timedelta(days=2), "day": timedelta(days=30)}
+
+
+def time_range(
+    start: Optional[datetime] = Query(None, alias="from", description="Start of the range (UTC if no offset is given)"),
+    end: Optional[datetime] = Query(None, alias="to", description="End of the range, default now"),
+    granularity: str = Query("day", pattern="^(hour|day)$")
+) -> TimeRange:
+    """Parse ?from=&to=&granularity= into a bounded range of rollup buckets"""
+    end = end or datetime.now(timezone.utc)
+    start = start or end - DEFAULT_SPANS[granularity]
+    time_range = TimeRange(granularity, start, end)
+    if not 0 < len(time_range) <= MAX_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"from must not be after to, and the range must span at most {MAX_POINTS} {granularity}s"
+        )
+    return time_range
+
+
+def day_range(
+    start: Optional[datetime] = Query(None, alias="from", description="Start of the range (UTC if no offset is given)"),
+    end: Optional[datetime] = Query(None, alias="to", description="End of the range, default now")
+) -> TimeRange:
+    """Parse ?from=&to= into a bounded range of days"""
+    return time_range(start, end, "day")
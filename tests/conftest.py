@@ -5,10 +5,15 @@ from httpx import AsyncClient, ASGITransport
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
+from app.config import settings
 from app.database import get_db, Base
 from app.models.user import User, UserRole
 from app.models.genre import Genre
-from app.auth import get_password_hash
+from app.models.song import Song, SongStatus
+from app.auth import get_password_hash, create_access_token
+from app.search import suggest_service, fuzzy_service, search_cache
+from app.response_cache import response_cache
+from app.charts import trending_charts
 import os
 
 
@@ -32,12 +37,56 @@ def override_get_db():
 # Override the database dependency
 app.dependency_overrides[get_db] = override_get_db
 
+# Fail requests that repeat one statement shape too often (N+1 queries)
+settings.n_plus_one_raise = True
+
+
+def create_test_user(username: str, role: UserRole = UserRole.USER):
+    """Create a user directly in the database and return (user_id, auth headers)"""
+    db = TestingSessionLocal()
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        hashed_password=get_password_hash("testpass123"),
+        role=role
+    )
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    
+    token = create_access_token(data={"sub": username})
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+def create_test_songs(artist_id: int, count: int, status: SongStatus = SongStatus.APPROVED):
+    """Create songs directly in the database and return their IDs"""
+    db = TestingSessionLocal()
+    genre = db.query(Genre).first()
+    songs = [
+        Song(
+            title=f"Test Song {i}",
+            artist_id=artist_id,
+            genre_id=genre.id,
+            duration_seconds=180,
+            file_url=f"uploads/songs/test_{artist_id}_{i}.mp3",
+            status=status,
+            play_count=0
+        )
+        for i in range(count)
+    ]
+    db.add_all(songs)
+    db.commit()
+    song_ids = [song.id for song in songs]
+    db.close()
+    return song_ids
+
 
 
 
 
 @pytest_asyncio.fixture
-async def client():
+async def client(tmp_path, monkeypatch):
     """Create a test client"""
     # Create tables
     Base.metadata.create_all(bind=engine)
@@ -60,6 +109,14 @@ async def client():
     db.commit()
     db.close()
     
+    # In-process indexes and caches start over with this test's database
+    suggest_service.index = None
+    fuzzy_service.index = None
+    search_cache.store.clear()
+    trending_charts.reset()
+    response_cache.clear()
+    monkeypatch.setattr(settings, "recommendations_dir", str(tmp_path / "recommendations"))
+    
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
     
@@ -434,4 +434,1629 @@ class TestArtistFunctionality:
         assert "estimated_earnings" in data
         assert "total_plays" in data
         assert "earnings_per_play" in data
-        assert "currency" in data 
\ No newline at end of file
+        assert "currency" in data 
+
+class TestQueryInstrumentation:
+    """Test per-request SQL instrumentation"""
+    
+    @pytest.mark.asyncio
+    async def test_server_timing_header(self, client: AsyncClient):
+        """Test that responses report DB time and statement count"""
+        response = await client.get("/genres")
+        assert response.status_code == 200
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert "1 queries" in response.headers["Server-Timing"]
+    
+    def test_normalize_statement(self):
+        """Test that statement shapes ignore literals and IN list length"""
+        from app.query_stats import normalize_statement
+        
+        first = normalize_statement("SELECT * FROM songs WHERE id IN (?, ?, ?) AND title = 'a'")
+        second = normalize_statement("SELECT *  FROM songs\nWHERE id IN (?) AND title = 'b'")
+        assert first == second
+    
+    def test_n_plus_one_detected(self, client: AsyncClient):
+        """Test that repeating one statement shape past the threshold fails"""
+        from sqlalchemy import text
+        from app.query_stats import track_queries, check_n_plus_one, NPlusOneQueryError
+        from tests.conftest import TestingSessionLocal
+        
+        db = TestingSessionLocal()
+        try:
+            with track_queries() as stats:
+                for genre_id in range(4):
+                    db.execute(text("SELECT name FROM genres WHERE id = :id"), {"id": genre_id})
+        finally:
+            db.close()
+        
+        assert stats.count == 4
+        check_n_plus_one(stats, threshold=4)
+        with pytest.raises(NPlusOneQueryError):
+            check_n_plus_one(stats, threshold=3)
+
+
+class TestSlowQueryLog:
+    """Test slow query logging and EXPLAIN capture"""
+    
+    def test_slow_query_logged(self, client: AsyncClient, caplog, monkeypatch):
+        """Test that statements over the threshold are logged with their shape"""
+        from sqlalchemy import text
+        from app.config import settings
+        from tests.conftest import TestingSessionLocal
+        
+        monkeypatch.setattr(settings, "slow_query_threshold_ms", 0.0001)
+        monkeypatch.setattr(settings, "slow_query_explain", False)
+        
+        db = TestingSessionLocal()
+        try:
+            with caplog.at_level("WARNING", logger="gspotify.slow_queries"):
+                db.execute(text("SELECT name FROM genres WHERE name = :name"), {"name": "Pop"})
+        finally:
+            db.close()
+        
+        record = next(r for r in caplog.records if r.name == "gspotify.slow_queries")
+        assert record.sql == "SELECT name FROM genres WHERE name = ?"
+        assert record.bind_shape == "(str)"
+        assert record.fingerprint
+    
+    def test_capture_query_plan(self, client: AsyncClient):
+        """Test EXPLAIN QUERY PLAN capture and per-fingerprint rate limiting"""
+        from app.slow_query_log import capture_query_plan, should_explain
+        from tests.conftest import engine
+        
+        plan = capture_query_plan(engine, "SELECT * FROM songs WHERE title LIKE ?", ("%a%",))
+        assert plan and any("songs" in line for line in plan)
+        assert capture_query_plan(engine, "DELETE FROM songs", ()) is None
+        
+        assert should_explain("test-fingerprint") is True
+        assert should_explain("test-fingerprint") is False
+
+
+class TestBatchOperations:
+    """Test set-based batch mutation endpoints"""
+    
+    @pytest.mark.asyncio
+    async def test_batch_add_and_remove_playlist_songs(self, client: AsyncClient):
+        """Test adding and removing many playlist songs with per-item results"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        
+        artist_id, _ = create_test_user("batchartist", UserRole.ARTIST)
+        _, headers = create_test_user("batchuser")
+        song_ids = create_test_songs(artist_id, 3)
+        
+        response = await client.post("/playlists", json={"name": "Batch"}, headers=headers)
+        playlist_id = response.json()["id"]
+        
+        response = await client.post(
+            f"/playlists/{playlist_id}/songs/batch",
+            json={"song_ids": song_ids[:2] + [9999]},
+            headers=headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert [item["status"] for item in data["results"]] == ["added", "added", "not_found"]
+        
+        response = await client.post(
+            f"/playlists/{playlist_id}/songs/batch",
+            json={"song_ids": song_ids},
+            headers=headers
+        )
+        statuses = [item["status"] for item in response.json()["results"]]
+        assert statuses == ["already_in_playlist", "already_in_playlist", "added"]
+        
+        response = await client.post(
+            f"/playlists/{playlist_id}/songs/batch-remove",
+            json={"song_ids": [song_ids[0], 9999]},
+            headers=headers
+        )
+        statuses = [item["status"] for item in response.json()["results"]]
+        assert statuses == ["removed", "not_in_playlist"]
+    
+    @pytest.mark.asyncio
+    async def test_batch_like_and_moderation(self, client: AsyncClient):
+        """Test batch likes and batch approval"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        from app.models.song import SongStatus
+        
+        artist_id, _ = create_test_user("modartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("modadmin", UserRole.ADMIN)
+        _, user_headers = create_test_user("moduser")
+        pending_ids = create_test_songs(artist_id, 2, SongStatus.PENDING_APPROVAL)
+        
+        response = await client.post("/songs/likes/batch", json={"song_ids": pending_ids}, headers=user_headers)
+        assert response.json()["succeeded"] == 0
+        
+        response = await client.post(
+            "/admin/songs/batch-approve",
+            json={"song_ids": pending_ids + [9999]},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["succeeded"] == 2
+        
+        response = await client.post("/songs/likes/batch", json={"song_ids": pending_ids}, headers=user_headers)
+        assert response.json()["succeeded"] == 2
+        
+        response = await client.post("/songs/likes/batch-remove", json={"song_ids": pending_ids}, headers=user_headers)
+        assert [item["status"] for item in response.json()["results"]] == ["unliked", "unliked"]
+
+
+class TestPlaylistOrdering:
+    """Test ordered playlists with fractional positions"""
+    
+    def test_fractional_keys(self):
+        """Test that generated keys always sort between their neighbours"""
+        from app.fractional_index import key_between, keys_between
+        
+        keys = keys_between(None, None, 3)
+        assert keys == sorted(keys)
+        middle = key_between(keys[0], keys[1])
+        assert keys[0] < middle < keys[1]
+        assert key_between(None, keys[0]) < keys[0]
+        assert key_between(keys[-1], None) > keys[-1]
+    
+    @pytest.mark.asyncio
+    async def test_move_song(self, client: AsyncClient):
+        """Test that moving a song reorders the playlist"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        
+        artist_id, _ = create_test_user("orderartist", UserRole.ARTIST)
+        _, headers = create_test_user("orderuser")
+        song_ids = create_test_songs(artist_id, 3)
+        
+        response = await client.post("/playlists", json={"name": "Ordered"}, headers=headers)
+        playlist_id = response.json()["id"]
+        for song_id in song_ids:
+            await client.post(f"/playlists/{playlist_id}/songs", json={"song_id": song_id}, headers=headers)
+        
+        response = await client.put(
+            f"/playlists/{playlist_id}/songs/{song_ids[2]}/position",
+            json={"after_song_id": song_ids[0]},
+            headers=headers
+        )
+        assert response.status_code == 200
+        
+        response = await client.get(f"/playlists/{playlist_id}/songs")
+        assert [song["id"] for song in response.json()] == [song_ids[0], song_ids[2], song_ids[1]]
+        
+        response = await client.put(
+            f"/playlists/{playlist_id}/songs/{song_ids[1]}/position",
+            json={"after_song_id": None},
+            headers=headers
+        )
+        response = await client.get(f"/playlists/{playlist_id}/songs?limit=2")
+        assert [song["id"] for song in response.json()] == [song_ids[1], song_ids[0]]
+
+
+class TestPlaylistTracks:
+    """Test the joined, paginated playlist track listing"""
+    
+    @pytest.mark.asyncio
+    async def test_playlist_tracks_single_query(self, client: AsyncClient):
+        """Test that a page of tracks comes with details and no per-row queries"""
+        import json
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        
+        artist_id, _ = create_test_user("tracksartist", UserRole.ARTIST)
+        _, headers = create_test_user("tracksuser")
+        song_ids = create_test_songs(artist_id, 15)
+        
+        response = await client.post("/playlists", json={"name": "Big"}, headers=headers)
+        playlist_id = response.json()["id"]
+        await client.post(f"/playlists/{playlist_id}/songs/batch", json={"song_ids": song_ids}, headers=headers)
+        
+        response = await client.get(f"/playlists/{playlist_id}/songs?skip=5&limit=10")
+        assert response.status_code == 200
+        tracks = response.json()
+        assert [track["id"] for track in tracks] == song_ids[5:15]
+        assert tracks[0]["artist_name"] == "tracksartist"
+        assert tracks[0]["genre_name"] is not None
+        assert '"2 queries"' in response.headers["Server-Timing"]
+        
+        response = await client.get(f"/playlists/{playlist_id}/songs?stream=true")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [track["id"] for track in lines] == song_ids
+
+
+class TestKeysetPagination:
+    """Test SQL-side keyset pagination of the current user's collections"""
+    
+    @pytest.mark.asyncio
+    async def test_liked_songs_cursor(self, client: AsyncClient):
+        """Test walking liked songs page by page with X-Next-Cursor"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        from app.pagination import encode_cursor
+        
+        artist_id, _ = create_test_user("likeartist", UserRole.ARTIST)
+        _, headers = create_test_user("likeuser")
+        song_ids = create_test_songs(artist_id, 5)
+        await client.post("/songs/likes/batch", json={"song_ids": song_ids}, headers=headers)
+        
+        seen = []
+        cursor = None
+        while True:
+            url = "/users/me/liked-songs?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            response = await client.get(url, headers=headers)
+            assert response.status_code == 200
+            page = response.json()
+            seen.extend(song["id"] for song in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        
+        assert seen == list(reversed(song_ids))
+        assert page[0]["artist_name"] == "likeartist"
+        
+        # Cursor values of the wrong type are rejected before reaching the query
+        for values in ([{"a": 1}, 1], ["yesterday", 1], ["2026-01-01 00:00:00", "1"], ["2026-01-01 00:00:00", True]):
+            response = await client.get(f"/users/me/liked-songs?cursor={encode_cursor(*values)}", headers=headers)
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Invalid cursor"
+    
+    @pytest.mark.asyncio
+    async def test_my_playlists_cursor(self, client: AsyncClient):
+        """Test keyset pagination of the user's playlists"""
+        from tests.conftest import create_test_user
+        from app.pagination import encode_cursor
+        
+        _, headers = create_test_user("playlistowner")
+        for i in range(3):
+            await client.post("/playlists", json={"name": f"List {i}"}, headers=headers)
+        
+        response = await client.get("/users/me/playlists?limit=2", headers=headers)
+        assert [p["name"] for p in response.json()] == ["List 2", "List 1"]
+        
+        cursor = response.headers["X-Next-Cursor"]
+        response = await client.get(f"/users/me/playlists?limit=2&cursor={cursor}", headers=headers)
+        assert [p["name"] for p in response.json()] == ["List 0"]
+        
+        response = await client.get("/users/me/playlists?cursor=garbage", headers=headers)
+        assert response.status_code == 400
+        response = await client.get(f"/users/me/playlists?cursor={encode_cursor({'a': 1})}", headers=headers)
+        assert response.status_code == 400
+
+
+class TestBatchGet:
+    """Test multi-get endpoints"""
+    
+    @pytest.mark.asyncio
+    async def test_songs_batch_preserves_order(self, client: AsyncClient):
+        """Test that songs come back in request order with missing IDs reported"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        from app.models.song import SongStatus
+        
+        artist_id, _ = create_test_user("multiartist", UserRole.ARTIST)
+        song_ids = create_test_songs(artist_id, 3)
+        pending_id = create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)[0]
+        
+        ids = [song_ids[2], 9999, song_ids[0], pending_id, song_ids[0]]
+        response = await client.get("/songs/batch?ids=" + ",".join(map(str, ids)))
+        assert response.status_code == 200
+        data = response.json()
+        assert [song["id"] for song in data["items"]] == [song_ids[2], song_ids[0]]
+        assert data["items"][0]["artist_name"] == "multiartist"
+        assert data["missing"] == [9999, pending_id]
+        
+        response = await client.get(f"/artists/batch?ids={artist_id},9999")
+        assert [artist["id"] for artist in response.json()["items"]] == [artist_id]
+        
+        response = await client.get("/songs/batch?ids=a,b")
+        assert response.status_code == 400
+    
+    @pytest.mark.asyncio
+    async def test_playlists_batch(self, client: AsyncClient):
+        """Test playlist multi-get with owner names and song counts"""
+        from tests.conftest import create_test_user
+        
+        _, headers = create_test_user("multiowner")
+        response = await client.post("/playlists", json={"name": "One"}, headers=headers)
+        playlist_id = response.json()["id"]
+        
+        response = await client.get(f"/playlists/batch?ids=9999,{playlist_id}")
+        data = response.json()
+        assert data["items"][0]["owner_name"] == "multiowner"
+        assert data["items"][0]["song_count"] == 0
+        assert data["missing"] == [9999]
+    
+    @pytest.mark.asyncio
+    async def test_albums_batch_counts_released_songs(self, client: AsyncClient):
+        """Test that album song counts leave out songs awaiting approval"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        from app.models.album import Album
+        
+        artist_id, _ = create_test_user("albumartist", UserRole.ARTIST)
+        song_ids = create_test_songs(artist_id, 2) + create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)
+        db = TestingSessionLocal()
+        album = Album(title="Unreleased Demos", artist_id=artist_id)
+        db.add(album)
+        db.flush()
+        for song_id in song_ids:
+            db.get(Song, song_id).album_id = album.id
+        db.commit()
+        album_id = album.id
+        db.close()
+        
+        response = await client.get(f"/albums/batch?ids={album_id}")
+        item = response.json()["items"][0]
+        assert item["artist_name"] == "albumartist"
+        assert item["song_count"] == 2
+
+
+class TestAccountDeletion:
+    """Test background cascading account deletion"""
+    
+    @pytest.mark.asyncio
+    async def test_delete_account_runs_job(self, client: AsyncClient, monkeypatch):
+        """Test that deleting an account tombstones it and removes owned rows in batches"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.config import settings
+        from app.models.user import UserRole
+        
+        monkeypatch.setattr(settings, "deletion_batch_size", 2)
+        artist_id, headers = create_test_user("leavingartist", UserRole.ARTIST)
+        song_ids = create_test_songs(artist_id, 5)
+        _, admin_headers = create_test_user("deletionadmin", UserRole.ADMIN)
+        
+        response = await client.post("/playlists", json={"name": "Mine"}, headers=headers)
+        playlist_id = response.json()["id"]
+        await client.post(f"/playlists/{playlist_id}/songs/batch", json={"song_ids": song_ids}, headers=headers)
+        await client.post("/songs/likes/batch", json={"song_ids": song_ids}, headers=admin_headers)
+        
+        response = await client.delete("/users/me", headers=headers)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        
+        response = await client.get("/users/me", headers=headers)
+        assert response.status_code == 401
+        
+        response = await client.get(f"/admin/deletion-jobs/{job_id}", headers=admin_headers)
+        job = response.json()
+        assert job["status"] == "completed"
+        assert job["user_id"] == artist_id
+        # 5 own songs, 5 likes on them, 5 playlist entries, 1 playlist, 1 user
+        # and 6 search documents (songs and playlist)
+        assert job["rows_deleted"] == 23
+        
+        response = await client.get(f"/songs/{song_ids[0]}")
+        assert response.status_code == 404
+        response = await client.get("/users/me/liked-songs", headers=admin_headers)
+        assert response.json() == []
+    
+    @pytest.mark.asyncio
+    async def test_deleted_listener_plays_become_anonymous(self, client: AsyncClient):
+        """Test that a deleted listener's streams of other artists' songs are kept without the user"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.play_event import PlayEvent
+        
+        artist_id, _ = create_test_user("keptartist", UserRole.ARTIST)
+        song_id, = create_test_songs(artist_id, 1)
+        listener_id, headers = create_test_user("leavinglistener")
+        db = TestingSessionLocal()
+        db.add_all([PlayEvent(user_id=listener_id, song_id=song_id) for _ in range(3)])
+        db.commit()
+        
+        response = await client.delete("/users/me", headers=headers)
+        assert response.status_code == 202
+        plays = db.query(PlayEvent.user_id).filter(PlayEvent.song_id == song_id).all()
+        db.close()
+        assert plays == [(None,)] * 3
+    
+    @pytest.mark.asyncio
+    async def test_deletion_job_invalidates_cached_responses(self, client: AsyncClient):
+        """Test that cached responses and suggestions do not outlive the deleted songs"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import User, UserRole
+        from app.account_deletion import schedule_account_deletion, run_deletion_job
+        
+        artist_id, _ = create_test_user("queuedartist", UserRole.ARTIST)
+        song_id, = create_test_songs(artist_id, 1)
+        db = TestingSessionLocal()
+        job = schedule_account_deletion(db, db.get(User, artist_id))
+        db.close()
+        
+        assert (await client.get(f"/songs/{song_id}")).status_code == 200
+        response = await client.get(f"/songs/?artist_id={artist_id}")
+        assert response.headers["X-Cache"] == "MISS" and len(response.json()) == 1
+        response = await client.get("/search/suggest?q=test%20song&type=song")
+        assert song_id in [suggestion["id"] for suggestion in response.json()["suggestions"]]
+        run_deletion_job(job.id, engine)
+        assert (await client.get(f"/songs/{song_id}")).status_code == 404
+        assert (await client.get(f"/songs/?artist_id={artist_id}")).json() == []
+        # Typeahead forgets the songs without waiting for its periodic rebuild
+        response = await client.get("/search/suggest?q=test%20song&type=song")
+        assert song_id not in [suggestion["id"] for suggestion in response.json()["suggestions"]]
+
+
+class TestPoolTelemetry:
+    """Test connection pool telemetry"""
+    
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, client: AsyncClient):
+        """Test that pool gauges and the checkout histogram are exported"""
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert "db_pool_size " in response.text
+        assert "db_pool_checked_out " in response.text
+        assert 'db_pool_checkout_wait_seconds_bucket{le="+Inf"}' in response.text
+        assert "db_pool_checkout_timeouts_total " in response.text
+        
+        response = await client.get("/health/detailed")
+        pool = response.json()["database_pool"]
+        assert pool["pool"] == "InstrumentedQueuePool"
+        assert "checked_out" in pool
+        assert "checkout_wait_seconds" in pool
+    
+    def test_checkout_timeout_counted(self):
+        """Test that waits and timeouts of an exhausted pool are recorded"""
+        from sqlalchemy import create_engine, exc
+        from app.pool_stats import InstrumentedQueuePool, checkout_timeouts, checkout_wait
+        
+        engine = create_engine(
+            "sqlite://", poolclass=InstrumentedQueuePool,
+            pool_size=1, max_overflow=0, pool_timeout=0.05
+        )
+        timeouts = checkout_timeouts.value()
+        waits = checkout_wait.snapshot()["count"]
+        
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        
+        assert checkout_timeouts.value() == timeouts + 1
+        assert checkout_wait.snapshot()["count"] == waits + 2
+        engine.dispose()
+
+
+class TestHealthProbes:
+    """Test cached background health probes"""
+    
+    @pytest.mark.asyncio
+    async def test_detailed_health_served_from_cache(self, client: AsyncClient):
+        """Test that repeated probes reuse the last background result"""
+        response = await client.get("/health/detailed")
+        components = response.json()["components"]
+        assert set(components) >= {"database", "storage"}
+        assert "latency_ms" in components["database"]
+        
+        response = await client.get("/health/detailed")
+        assert response.json()["components"]["storage"]["checked_at"] == components["storage"]["checked_at"]
+    
+    def test_failed_and_stale_checks(self, monkeypatch):
+        """Test that failing checks and outdated results report unhealthy"""
+        from app.health import HealthProber
+        from app.config import settings
+        
+        def broken():
+            raise RuntimeError("unreachable")
+        
+        prober = HealthProber()
+        prober.register("ok", lambda: None)
+        prober.register("cache", broken)
+        prober.probe()
+        
+        results = prober.results()
+        assert results["ok"]["status"] == "healthy"
+        assert results["cache"]["status"] == "unhealthy"
+        assert results["cache"]["error"] == "unreachable"
+        
+        monkeypatch.setattr(settings, "health_stale_after", -1)
+        assert prober.results()["ok"]["status"] == "unhealthy"
+
+
+class TestFullTextSearch:
+    """Test the full-text search index"""
+    
+    @pytest.mark.asyncio
+    async def test_ranked_song_search(self, client: AsyncClient):
+        """Test that songs match on artist name and lyrics, with title matches first"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        from app.models.lyrics import Lyrics
+        
+        artist_id, _ = create_test_user("moonlighters", UserRole.ARTIST)
+        first, second, pending = create_test_songs(artist_id, 3)
+        db = TestingSessionLocal()
+        db.get(Song, first).title = "Harbor Lights"
+        db.get(Song, second).title = "Quiet Rooms"
+        db.get(Song, pending).status = SongStatus.PENDING_APPROVAL
+        db.add(Lyrics(song_id=second, text="the harbor lights are fading"))
+        db.commit()
+        db.close()
+        
+        response = await client.get("/search?q=harbor light&type=song")
+        assert [song["id"] for song in response.json()["songs"]] == [first, second]
+        
+        response = await client.get("/search?q=moonlight&type=song")
+        songs = response.json()["songs"]
+        assert {song["id"] for song in songs} == {first, second}
+        assert songs[0]["artist_name"] == "moonlighters"
+        
+        response = await client.get("/search?q=moonlighters")
+        assert [artist["username"] for artist in response.json()["artists"]] == ["moonlighters"]
+        
+        response = await client.get('/search?q="*(')
+        assert response.status_code == 200
+        assert response.json()["songs"] == []
+    
+    @pytest.mark.asyncio
+    async def test_index_follows_writes(self, client: AsyncClient):
+        """Test that renames and deletes are reflected without a rebuild"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import User, UserRole
+        from app.models.song import Song
+        
+        artist_id, _ = create_test_user("oldname", UserRole.ARTIST)
+        song_id = create_test_songs(artist_id, 1)[0]
+        db = TestingSessionLocal()
+        db.get(User, artist_id).username = "newname"
+        db.commit()
+        
+        response = await client.get("/search?q=oldname&type=song")
+        assert response.json()["songs"] == []
+        response = await client.get("/search?q=newname&type=song")
+        assert [song["id"] for song in response.json()["songs"]] == [song_id]
+        
+        db.delete(db.get(Song, song_id))
+        db.commit()
+        db.close()
+        response = await client.get("/search?q=newname&type=song")
+        assert response.json()["songs"] == []
+
+
+class TestSuggest:
+    """Test typeahead suggestions"""
+    
+    @pytest.mark.asyncio
+    async def test_suggest_ranking_and_updates(self, client: AsyncClient):
+        """Test prefix-before-infix ranking, popularity and incremental updates"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        
+        artist_id, _ = create_test_user("nightowls", UserRole.ARTIST)
+        _, admin_headers = create_test_user("suggestadmin", UserRole.ADMIN)
+        harbor, lighthouse, twilight = create_test_songs(artist_id, 3)
+        pending = create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)[0]
+        db = TestingSessionLocal()
+        for song_id, title, plays in [
+            (harbor, "Harbor Lights", 5), (lighthouse, "Lighthouse", 50),
+            (twilight, "Twilight Harbor", 90), (pending, "Lightning Rod", 0)
+        ]:
+            song = db.get(Song, song_id)
+            song.title, song.play_count = title, plays
+        db.commit()
+        
+        response = await client.get("/search/suggest?q=ligh&type=song")
+        assert response.status_code == 200
+        suggestions = response.json()["suggestions"]
+        assert [s["text"] for s in suggestions] == ["Lighthouse", "Harbor Lights", "Twilight Harbor"]
+        assert suggestions[0]["artist_name"] == "nightowls"
+        
+        response = await client.get("/search/suggest?q=ni")
+        assert [(s["type"], s["text"]) for s in response.json()["suggestions"]] == [("artist", "nightowls")]
+        
+        await client.post("/admin/songs/batch-approve", json={"song_ids": [pending]}, headers=admin_headers)
+        db.get(Song, harbor).title = "Harbour Nights"
+        db.commit()
+        db.close()
+        
+        response = await client.get("/search/suggest?q=light&type=song")
+        texts = [s["text"] for s in response.json()["suggestions"]]
+        assert "Lightning Rod" in texts
+        assert "Harbor Lights" not in texts
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_rebuilds(self, client: AsyncClient, monkeypatch):
+        """Test that a first request during the scheduled build waits for it instead of building again"""
+        import threading
+        import time
+        from tests.conftest import engine
+        from app.search import suggest as suggest_module
+        from app.search.suggest import SuggestService
+        
+        service = SuggestService()
+        builds, started = [], threading.Event()
+        build_index = suggest_module.build_index
+        
+        def slow_build(conn):
+            builds.append(threading.get_ident())
+            started.set()
+            time.sleep(0.2)
+            return build_index(conn)
+        
+        monkeypatch.setattr(suggest_module, "build_index", slow_build)
+        errors = []
+        
+        def run(target):
+            try:
+                target(engine)
+            except Exception as e:
+                errors.append(e)
+        
+        scheduled = threading.Thread(target=run, args=(service.rebuild,))
+        scheduled.start()
+        started.wait()
+        requests = [threading.Thread(target=run, args=(service.ensure_ready,)) for _ in range(2)]
+        for thread in requests:
+            thread.start()
+        second = threading.Thread(target=run, args=(service.rebuild,))
+        second.start()
+        for thread in [scheduled, *requests, second]:
+            thread.join()
+        
+        assert errors == []
+        assert len(builds) == 2  # the scheduled build and the explicit second rebuild, one after the other
+        assert service.index is not None and service._replay is None
+    
+    def test_normalization(self):
+        """Test accent and punctuation folding"""
+        from app.search.suggest import SuggestIndex
+        
+        index = SuggestIndex()
+        index.add("artist", 1, "Beyoncé")
+        index.add("song", 2, "Don't Stop-Me Now")
+        assert [s["id"] for s in index.suggest("beyon")] == [1]
+        assert [s["id"] for s in index.suggest("stop me")] == [2]
+        index.remove("artist", 1)
+        assert index.suggest("beyon") == []
+
+
+class TestFuzzySearch:
+    """Test typo-tolerant search fallback"""
+    
+    @pytest.mark.asyncio
+    async def test_search_corrects_misspellings(self, client: AsyncClient):
+        """Test that a query with no matches is retried with corrected words"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        
+        artist_id, _ = create_test_user("moonwalkers", UserRole.ARTIST)
+        song_id = create_test_songs(artist_id, 1)[0]
+        pending_id = create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)[0]
+        db = TestingSessionLocal()
+        db.get(Song, song_id).title = "Midnight Serenade"
+        db.get(Song, pending_id).title = "Crimson Lullaby"
+        db.commit()
+        
+        response = await client.get("/search?q=midnigth%20serenda&type=song")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["corrected_query"] == "midnight serenade"
+        assert [song["id"] for song in data["songs"]] == [song_id]
+        
+        response = await client.get("/search?q=moonwalkres")
+        assert response.json()["corrected_query"] == "moonwalkers"
+        assert [artist["id"] for artist in response.json()["artists"]] == [artist_id]
+        
+        # Exact matches are not rewritten; words added after the build are picked up
+        response = await client.get("/search?q=midnight&type=song")
+        assert "corrected_query" not in response.json()
+        db.get(Song, song_id).title = "Velvet Thunder"
+        db.commit()
+        db.close()
+        response = await client.get("/search?q=velvet%20thunedr&type=song")
+        assert response.json()["corrected_query"] == "velvet thunder"
+        
+        # Words of unreleased titles are never suggested, neither from the build nor from edits
+        response = await client.get("/search?q=crimsn%20lullabby&type=song")
+        assert "corrected_query" not in response.json()
+        db = TestingSessionLocal()
+        db.get(Song, pending_id).title = "Amber Horizon"
+        db.commit()
+        response = await client.get("/search?q=ambr%20horizn&type=song")
+        assert "corrected_query" not in response.json()
+        db.get(Song, pending_id).status = SongStatus.APPROVED
+        db.commit()
+        db.close()
+        response = await client.get("/search?q=ambr%20horizn&type=song")
+        assert response.json()["corrected_query"] == "amber horizon"
+    
+    @pytest.mark.asyncio
+    async def test_search_during_scheduled_build_waits(self, client: AsyncClient, monkeypatch):
+        """Test that the first fuzzy search during the scheduled build does not build a second index"""
+        import threading
+        import time
+        from tests.conftest import engine
+        from app.search import fuzzy as fuzzy_module
+        from app.search.fuzzy import FuzzyService
+        
+        service = FuzzyService()
+        builds, started = [], threading.Event()
+        catalog_vocabulary = fuzzy_module.catalog_vocabulary
+        
+        def slow_vocabulary(conn):
+            builds.append(threading.get_ident())
+            started.set()
+            time.sleep(0.2)
+            return catalog_vocabulary(conn)
+        
+        monkeypatch.setattr(fuzzy_module, "catalog_vocabulary", slow_vocabulary)
+        scheduled = threading.Thread(target=service.rebuild, args=(engine,))
+        scheduled.start()
+        started.wait()
+        service.ensure_ready(engine)
+        scheduled.join()
+        assert len(builds) == 1
+        assert service.index is not None
+    
+    def test_deletion_index_lookup(self):
+        """Test edit distances, frequency tie-breaking and the vocabulary cap"""
+        from app.search.fuzzy import DeletionIndex, edit_distance
+        
+        assert edit_distance("thunedr", "thunder", 2) == 1
+        assert edit_distance("kitten", "sitting", 2) == 3
+        
+        index = DeletionIndex({"light": 10, "night": 3, "might": 2, "lightning": 1}, max_terms=3)
+        assert "lightning" not in index
+        assert index.correct("lihgt") == "light"
+        assert index.correct("nighr") == "night"
+        assert [term for term, _, _ in index.lookup("sight")] == ["light", "night", "might"]
+        assert index.correct("xyzzy") is None
+        assert not index.add("lightning")
+        
+        index = DeletionIndex({"highway": 1}, max_terms=10)
+        index.add("harbour")
+        assert index.correct("harbuor") == "harbour"
+        assert index.correct("higwhay") == "highway"
+
+
+class TestLyricsSearch:
+    """Test lyrics phrase search"""
+    
+    @pytest.mark.asyncio
+    async def test_phrase_search_with_snippets(self, client: AsyncClient):
+        """Test phrase matching, ranking, snippets and index updates"""
+        from tests.conftest import create_test_user, create_test_songs
+        from app.models.user import UserRole
+        from app.models.song import SongStatus
+        
+        artist_id, headers = create_test_user("lyricist", UserRole.ARTIST)
+        rain, dance, unreleased = create_test_songs(artist_id, 2) + create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)
+        lyrics = {
+            rain: "We walked in the pouring rain\nDancing in the rain <again> & again",
+            dance: "Rain in the city, dancing in the rain, in the rain until dawn",
+            unreleased: "Dancing in the rain all night",
+        }
+        for song_id, text in lyrics.items():
+            response = await client.put(f"/artist/songs/{song_id}/lyrics", json={"text": text}, headers=headers)
+            assert response.status_code == 200
+        
+        response = await client.get("/search/lyrics?q=in%20the%20rain")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 2
+        assert [(r["song"]["id"], r["matches"]) for r in data["results"]] == [(dance, 2), (rain, 1)]
+        assert data["results"][1]["snippet"] == (
+            "We walked in the pouring rain Dancing <mark>in</mark> <mark>the</mark> <mark>rain</mark> &lt;again&gt; &amp; again"
+        )
+        
+        # Word order matters for phrases only
+        response = await client.get("/search/lyrics?q=rain%20the")
+        assert response.json()["total"] == 0
+        response = await client.get("/search/lyrics?q=rain%20the&phrase=false")
+        assert response.json()["total"] == 2
+        
+        await client.put(f"/artist/songs/{rain}/lyrics", json={"text": "Sunshine on the hill"}, headers=headers)
+        response = await client.get("/search/lyrics?q=in%20the%20rain")
+        assert [r["song"]["id"] for r in response.json()["results"]] == [dance]
+        response = await client.get("/search/lyrics?q=SUNSHINE")
+        assert response.json()["results"][0]["snippet"] == "<mark>Sunshine</mark> on the hill"
+    
+    def test_position_encoding(self):
+        """Test varint delta encoding of positions"""
+        from app.search.lyrics import encode_positions, decode_positions
+        
+        positions = [0, 1, 5, 127, 128, 300, 20000, 20001]
+        encoded = encode_positions(positions)
+        assert decode_positions(encoded) == positions
+        assert len(encode_positions(range(100))) == 100
+
+
+class TestSearchCache:
+    """Test search result caching"""
+    
+    @pytest.mark.asyncio
+    async def test_cached_results_invalidated_by_catalog_changes(self, client: AsyncClient):
+        """Test hits for equivalent queries and invalidation on approval and renames"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole, User
+        from app.models.song import Song, SongStatus
+        from app.search.cache import cache_requests
+        
+        artist_id, _ = create_test_user("cachedartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("cacheadmin", UserRole.ADMIN)
+        approved, pending = create_test_songs(artist_id, 1) + create_test_songs(artist_id, 1, SongStatus.PENDING_APPROVAL)
+        db = TestingSessionLocal()
+        db.get(Song, approved).title = "Paper Moon"
+        db.get(Song, pending).title = "Paper Planes"
+        db.commit()
+        
+        hits = cache_requests.value(result="hit")
+        first = await client.get("/search?q=paper&type=song")
+        second = await client.get("/search?q=PAPER!&type=song")
+        assert first.json() == second.json()
+        assert [song["id"] for song in second.json()["songs"]] == [approved]
+        assert cache_requests.value(result="hit") == hits + 1
+        
+        # Bulk approval bypasses the ORM but still bumps the catalog version
+        await client.post("/admin/songs/batch-approve", json={"song_ids": [pending]}, headers=admin_headers)
+        response = await client.get("/search?q=paper&type=song")
+        assert sorted(song["id"] for song in response.json()["songs"]) == [approved, pending]
+        
+        db.get(User, artist_id).username = "renamedartist"
+        db.commit()
+        db.close()
+        response = await client.get("/search?q=paper&type=song")
+        assert {song["artist_name"] for song in response.json()["songs"]} == {"renamedartist"}
+        assert cache_requests.value(result="hit") == hits + 1
+    
+    def test_local_cache_memory_budget(self):
+        """Test LRU eviction by size and expiry"""
+        from app.cache_store import LocalCache
+        
+        cache = LocalCache(max_bytes=100)
+        cache.set("a", b"x" * 40, ttl=60)
+        cache.set("b", b"x" * 40, ttl=60)
+        assert cache.get("a") is not None  # "b" is now least recently used
+        cache.set("c", b"x" * 40, ttl=60)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] <= 100
+        
+        cache.set("d", b"x" * 200, ttl=60)
+        assert cache.get("d") is None
+        cache.set("e", b"x", ttl=-1)
+        assert cache.get("e") is None
+
+
+class TestFacets:
+    """Test facet counts for search and browse"""
+    
+    @pytest.mark.asyncio
+    async def test_search_and_browse_facets(self, client: AsyncClient):
+        """Test counts per genre, artist and album over all matches, not one page"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        from app.models.genre import Genre
+        from app.models.album import Album
+        from app.models.playlist import Playlist
+        from app.search import catalog_version, BROWSE
+        
+        first_id, _ = create_test_user("facetone", UserRole.ARTIST)
+        second_id, _ = create_test_user("facettwo", UserRole.ARTIST)
+        songs = create_test_songs(first_id, 3) + create_test_songs(second_id, 2)
+        pending = create_test_songs(second_id, 1, SongStatus.PENDING_APPROVAL)
+        db = TestingSessionLocal()
+        jazz = Genre(name="Facet Jazz")
+        album = Album(title="Facet Album", artist_id=first_id)
+        db.add_all([jazz, album])
+        db.flush()
+        for song_id in songs + pending:
+            db.get(Song, song_id).title = f"Facet Tune {song_id}"
+        db.get(Song, songs[0]).album_id = album.id
+        db.get(Song, songs[3]).genre_id = jazz.id
+        db.commit()
+        album_id = album.id
+        default_genre = db.get(Song, songs[1]).genre.name
+        db.close()
+        
+        response = await client.get("/search?q=facet%20tune&type=song&limit=2&facets=true")
+        assert len(response.json()["songs"]) == 2
+        facets = response.json()["facets"]
+        assert facets["total"] == 5
+        assert [(value["name"], value["count"]) for value in facets["facets"]["artist"]] == [
+            ("facetone", 3), ("facettwo", 2)
+        ]
+        assert [(value["name"], value["count"]) for value in facets["facets"]["genre"]] == [
+            (default_genre, 4), ("Facet Jazz", 1)
+        ]
+        assert facets["facets"]["album"] == [{"id": album_id, "name": "Facet Album", "count": 1}]
+        assert "facets" not in (await client.get("/search?q=facet%20tune&type=song")).json()
+        
+        response = await client.get(f"/songs/facets?artist_id={second_id}&limit=1")
+        assert response.status_code == 200
+        assert response.json()["total"] == 2
+        # One song in each genre: ties go to the lower id, the default genre
+        assert [(value["name"], value["count"]) for value in response.json()["facets"]["genre"]] == [(default_genre, 1)]
+        
+        # Served from the cache until the catalog changes
+        db = TestingSessionLocal()
+        db.get(Song, pending[0]).status = SongStatus.APPROVED
+        db.commit()
+        db.close()
+        response = await client.get(f"/songs/facets?artist_id={second_id}&limit=1")
+        assert response.json()["total"] == 3
+        
+        # Playlist edits change search results, not browse counts
+        db = TestingSessionLocal()
+        search_version, browse_version = catalog_version(db), catalog_version(db, BROWSE)
+        db.add(Playlist(name="Facet Mix", owner_id=second_id))
+        db.commit()
+        assert catalog_version(db) == search_version + 1
+        assert catalog_version(db, BROWSE) == browse_version
+        db.close()
+
+
+class TestSimilarSongs:
+    """Test item-item recommendations from likes and playlists"""
+    
+    @pytest.mark.asyncio
+    async def test_similar_songs_from_co_occurrence(self, client: AsyncClient):
+        """Test neighbours ranked by shared listeners, served after a rebuild"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        from app.models.song import Song, SongStatus
+        from app.models.liked_song import LikedSong
+        from app.models.playlist import Playlist, PlaylistSong
+        from app.recommendations import similar_songs_service
+        
+        artist_id, _ = create_test_user("similarartist", UserRole.ARTIST)
+        seed, close, far, lonely = create_test_songs(artist_id, 4)
+        listeners = [create_test_user(f"listener{i}", UserRole.USER)[0] for i in range(3)]
+        db = TestingSessionLocal()
+        # seed+close share three baskets, seed+far two; lonely is only ever alone
+        db.add_all([LikedSong(user_id=user_id, song_id=seed) for user_id in listeners])
+        db.add_all([LikedSong(user_id=user_id, song_id=close) for user_id in listeners[:2]])
+        db.add_all([LikedSong(user_id=listeners[2], song_id=far), LikedSong(user_id=listeners[0], song_id=lonely)])
+        playlist = Playlist(name="Mix", owner_id=listeners[0])
+        db.add(playlist)
+        db.flush()
+        db.add_all([
+            PlaylistSong(playlist_id=playlist.id, song_id=song_id, position=position)
+            for song_id, position in [(seed, "a"), (close, "b"), (far, "c")]
+        ])
+        db.commit()
+        db.close()
+        
+        response = await client.get(f"/songs/{seed}/similar")
+        assert response.status_code == 200
+        assert response.json() == []  # No model yet
+        
+        model = similar_songs_service.rebuild(engine)
+        assert lonely not in model.song_ids
+        response = await client.get(f"/songs/{seed}/similar")
+        results = response.json()
+        assert [result["song"]["id"] for result in results] == [close, far]
+        assert results[0]["score"] > results[1]["score"]
+        assert results[0]["song"]["artist_name"] == "similarartist"
+        
+        db = TestingSessionLocal()
+        db.get(Song, close).status = SongStatus.REJECTED
+        db.commit()
+        db.close()
+        response = await client.get(f"/songs/{seed}/similar?limit=1")
+        assert [result["song"]["id"] for result in response.json()] == []
+        assert (await client.get(f"/songs/{close}/similar")).status_code == 404
+    
+    def test_build_model_partitions(self):
+        """Test that splitting the songs into partitions gives the same model"""
+        import numpy as np
+        from app.recommendations import build_model
+        
+        rng = np.random.default_rng(7)
+        baskets = rng.integers(0, 200, 5_000)
+        songs = rng.integers(0, 300, 5_000)
+        whole = build_model(baskets, songs, top_k=5, min_count=2)
+        split = build_model(baskets, songs, top_k=5, min_count=2, pairs_per_partition=500)
+        assert len(whole) > 0
+        for array in ["song_ids", "offsets", "neighbours", "scores"]:
+            assert np.array_equal(getattr(whole, array), getattr(split, array))
+        
+        song_id = int(whole.song_ids[0])
+        neighbours = whole.similar(song_id, 3)
+        assert len(neighbours) == 3
+        assert [score for _, score in neighbours] == sorted((score for _, score in neighbours), reverse=True)
+        assert whole.similar(10_000, 3) == []
+
+
+class TestRecommendations:
+    """Test personal recommendations from matrix factorization"""
+    
+    @pytest.mark.asyncio
+    async def test_recommendations_exclude_liked_songs(self, client: AsyncClient, monkeypatch):
+        """Test plays are recorded per user and recommendations follow taste clusters"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        from app.models.liked_song import LikedSong
+        from app.models.play_event import PlayEvent
+        from app.local_file_service import local_file_service
+        from app.recommendations import recommendation_service
+        from app.config import settings
+        
+        monkeypatch.setattr(settings, "als_factors", 2)
+        artist_id, _ = create_test_user("alsartist", UserRole.ARTIST)
+        rock, jazz = create_test_songs(artist_id, 4), create_test_songs(artist_id, 4)
+        listeners = [create_test_user(f"alsuser{i}", UserRole.USER) for i in range(8)]
+        db = TestingSessionLocal()
+        for i, (user_id, _) in enumerate(listeners):
+            group = rock if i < 4 else jazz
+            # Everyone likes three songs of their group; the fourth is left to recommend
+            db.add_all([LikedSong(user_id=user_id, song_id=song_id) for song_id in group[:3] if (song_id + i) % 4])
+            db.add(PlayEvent(user_id=user_id, song_id=group[3 if i % 2 else 0]))
+        db.commit()
+        db.close()
+        
+        # Streams are recorded against the listener when a token is sent, anonymously otherwise
+        monkeypatch.setattr(local_file_service, "file_exists", lambda path: True)
+        user_id, headers = listeners[0]
+        assert (await client.get(f"/songs/{rock[1]}/stream", headers=headers)).status_code in (302, 307)
+        assert (await client.get(f"/songs/{rock[1]}/stream")).status_code in (302, 307)
+        db = TestingSessionLocal()
+        plays = db.query(PlayEvent.user_id).filter(PlayEvent.song_id == rock[1]).all()
+        liked = {song_id for (song_id,) in db.query(LikedSong.song_id).filter(LikedSong.user_id == user_id)}
+        db.close()
+        assert sorted(plays, key=str) == sorted([(user_id,), (None,)], key=str)
+        
+        # Before training: most played songs
+        response = await client.get("/users/me/recommendations?limit=3", headers=headers)
+        assert response.status_code == 200
+        assert all(item["score"] is None for item in response.json())
+        
+        recommendation_service.rebuild(engine)
+        response = await client.get("/users/me/recommendations?limit=3", headers=headers)
+        results = response.json()
+        assert results and all(item["score"] is not None for item in results)
+        assert not liked & {item["song"]["id"] for item in results}
+        assert results[0]["song"]["id"] in rock
+    
+    def test_concurrent_builds_keep_the_current_one(self, tmp_path, monkeypatch):
+        """Test that saving removes only the replaced build, and a vanished build keeps the old model"""
+        import time
+        import numpy as np
+        from app.config import settings
+        from app.recommendations.als import FactorModel, RecommendationService
+        
+        monkeypatch.setattr(settings, "recommendations_dir", str(tmp_path))
+        
+        def model(factor):
+            return FactorModel(np.array([1]), np.full((1, 2), factor, np.float32), np.array([5]), np.ones((1, 2), np.float32))
+        
+        def builds():
+            return {path.name.split(".")[0] for path in tmp_path.glob("als-*.npy")}
+        
+        model(1).save(tmp_path)
+        first = builds()
+        # Another worker's arrays, written but not yet pointed at by the manifest
+        racing = f"als-{time.time_ns()}"
+        for name in ("user_ids", "user_factors", "song_ids", "song_factors"):
+            np.save(tmp_path / f"{racing}.{name}.npy", np.zeros(1))
+        stale = f"als-{time.time_ns() - int(2 * settings.als_rebuild_interval * 1e9)}"
+        np.save(tmp_path / f"{stale}.user_ids.npy", np.zeros(1))
+        model(2).save(tmp_path)
+        current = builds() - first - {racing}
+        assert builds() == current | {racing}
+        
+        service = RecommendationService()
+        assert service.get_model().user_factors[0, 0] == 2
+        # The manifest moves to a build whose files are gone: the mapped model keeps serving
+        (tmp_path / "als.json").write_text('{"stamp": "als-1", "factors": 2}')
+        assert service.get_model().user_factors[0, 0] == 2
+    
+    def test_conjugate_gradient_matches_exact_solve(self, monkeypatch):
+        """Test one ALS half-step against the closed-form least squares solution"""
+        import numpy as np
+        from app.recommendations import als
+        
+        rng = np.random.default_rng(0)
+        preferences = (rng.random((30, 15)) < 0.3).astype(np.float32)
+        rows, columns = np.nonzero(preferences)
+        csr = als._Csr(rows, columns, preferences[rows, columns], 30)
+        Y = rng.standard_normal((15, 4)).astype(np.float32)
+        X = np.zeros((30, 4), np.float32)
+        # CG is exact after as many steps as there are factors (up to rounding)
+        monkeypatch.setattr(als, "CG_STEPS", 4)
+        als._solve(csr, X, Y, 0.05, 10.0)
+        
+        confidence = 1 + 10.0 * preferences
+        exact = np.stack([
+            np.linalg.solve(Y.T @ np.diag(confidence[u]) @ Y + 0.05 * np.eye(4), Y.T @ (confidence[u] * (preferences[u] > 0)))
+            for u in range(30)
+        ])
+        assert np.abs(X - exact).max() < 1e-3
+
+
+class TestTrendingCharts:
+    """Test decayed play-count charts"""
+    
+    @pytest.mark.asyncio
+    async def test_recent_plays_outrank_old_ones(self, client: AsyncClient, monkeypatch):
+        """Test old plays decay, genre charts and plays arriving after the first load"""
+        from datetime import datetime, timedelta, timezone
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal
+        from app.config import settings
+        from app.models.user import UserRole
+        from app.models.song import Song
+        from app.models.genre import Genre
+        from app.models.play_event import PlayEvent
+        from app.local_file_service import local_file_service
+        
+        monkeypatch.setattr(settings, "trending_refresh_interval", 0)
+        artist_id, _ = create_test_user("chartartist", UserRole.ARTIST)
+        old_hit, new_hit, jazz_song = create_test_songs(artist_id, 3)
+        now = datetime.now(timezone.utc)
+        db = TestingSessionLocal()
+        jazz = db.query(Genre).filter(Genre.name == "Jazz").first()
+        db.get(Song, jazz_song).genre_id = jazz.id
+        # Ten plays three half-lives ago count as 1.25; three plays now count as 3
+        db.add_all([PlayEvent(song_id=old_hit, played_at=now - timedelta(days=3)) for _ in range(10)])
+        db.add_all([PlayEvent(song_id=new_hit, played_at=now - timedelta(minutes=1)) for _ in range(3)])
+        db.add(PlayEvent(song_id=jazz_song, played_at=now - timedelta(minutes=1)))
+        db.commit()
+        jazz_id = jazz.id
+        db.close()
+        
+        response = await client.get("/charts/trending")
+        assert response.status_code == 200
+        results = response.json()
+        assert [item["song"]["id"] for item in results] == [new_hit, old_hit, jazz_song]
+        assert results[0]["score"] == pytest.approx(3, rel=0.01)
+        assert results[1]["score"] == pytest.approx(1.25, rel=0.01)
+        
+        response = await client.get(f"/charts/trending?genre_id={jazz_id}")
+        assert [item["song"]["id"] for item in response.json()] == [jazz_song]
+        
+        # New streams are folded in on the next refresh
+        monkeypatch.setattr(local_file_service, "file_exists", lambda path: True)
+        for _ in range(4):
+            assert (await client.get(f"/songs/{jazz_song}/stream")).status_code in (302, 307)
+        response = await client.get("/charts/trending?limit=1")
+        assert [item["song"]["id"] for item in response.json()] == [jazz_song]
+        
+        response = await client.get("/charts/trending?genre_id=9999")
+        assert response.status_code == 404
+    
+    def test_top_k_matches_full_sort(self):
+        """Test the heap-maintained top songs against sorting every score"""
+        import random
+        from app.charts import TopK
+        
+        rng = random.Random(0)
+        top, scores = TopK(10), {}
+        for _ in range(5000):
+            song_id = rng.randrange(200)
+            scores[song_id] = scores.get(song_id, 0) + rng.random()
+            top.offer(song_id, scores[song_id])
+        expected = sorted(scores.items(), key=lambda item: -item[1])[:10]
+        assert top.top(10) == expected
+
+
+class TestSongRadio:
+    """Test endless radio queues walked from the similarity graph"""
+    
+    @pytest.mark.asyncio
+    async def test_radio_pages_never_repeat(self, client: AsyncClient, monkeypatch):
+        """Test cursor pages: no repeats, artists spaced out, replayable, ending when exhausted"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.config import settings
+        from app.models.user import UserRole
+        from app.models.liked_song import LikedSong
+        from app.recommendations import similar_songs_service
+        from app.pagination import decode_cursor, encode_cursor
+        
+        monkeypatch.setattr(settings, "radio_artist_spacing", 2)
+        songs, artist_of = [], {}
+        for name in ["radioa", "radiob", "radioc"]:
+            artist_id, _ = create_test_user(name, UserRole.ARTIST)
+            for song_id in create_test_songs(artist_id, 4):
+                songs.append(song_id)
+                artist_of[song_id] = artist_id
+        listeners = [create_test_user(f"radiofan{i}", UserRole.USER)[0] for i in range(3)]
+        db = TestingSessionLocal()
+        db.add_all([LikedSong(user_id=user_id, song_id=song_id) for user_id in listeners for song_id in songs])
+        db.commit()
+        db.close()
+        similar_songs_service.rebuild(engine)
+        
+        seed = songs[0]
+        queue, cursor, pages, cursors = [], None, 0, []
+        while True:
+            url = f"/songs/{seed}/radio?limit=4" + (f"&cursor={cursor}" if cursor else "")
+            response = await client.get(url)
+            assert response.status_code == 200
+            page = [song["id"] for song in response.json()]
+            if cursor:
+                # Replaying a cursor gives the same page
+                assert [song["id"] for song in (await client.get(url)).json()] == page
+            queue += page
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            cursors.append(cursor)
+        
+        # Every other song once, never the seed; the graph runs out on the third page
+        assert pages == 3
+        assert sorted(queue) == sorted(songs[1:])
+        artists = [artist_of[seed]] + [artist_of[song_id] for song_id in queue]
+        assert all(a != b for a, b in zip(artists[:8], artists[1:8]))
+        
+        # A cursor only continues the radio it came from
+        response = await client.get(f"/songs/{songs[1]}/radio?cursor={cursors[0]}")
+        assert response.status_code == 400
+        # Tampered cursors are rejected, not walked
+        values = decode_cursor(cursors[0], 6)
+        for trail in ([], [2**40]):
+            response = await client.get(f"/songs/{seed}/radio?cursor={encode_cursor(*values[:2], trail, *values[3:])}")
+            assert response.status_code == 400
+        assert similar_songs_service.get_model().similar(2**40, 5) == []
+        assert similar_songs_service.get_model().artists_of([2**40, seed]) == [None, artist_of[seed]]
+        response = await client.get("/songs/99999/radio")
+        assert response.status_code == 404
+
+
+class TestStatsRollups:
+    """Test hourly and daily analytics rollups"""
+    
+    @pytest.mark.asyncio
+    async def test_rollups_fill_incrementally(self, client: AsyncClient):
+        """Test hour and day buckets, late plays inside the reopened window, and range limits"""
+        from datetime import datetime, timedelta, timezone
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        from app.models.liked_song import LikedSong
+        from app.models.play_event import PlayEvent
+        from app.rollups import refresh_rollups
+        
+        artist_id, artist_headers = create_test_user("statsartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("statsadmin", UserRole.ADMIN)
+        fan_id, _ = create_test_user("statsfan", UserRole.USER)
+        hit, other = create_test_songs(artist_id, 2)
+        hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        db = TestingSessionLocal()
+        db.add_all([PlayEvent(song_id=hit, played_at=hour - timedelta(days=3, minutes=-5)) for _ in range(4)])
+        db.add_all([PlayEvent(song_id=hit, played_at=hour - timedelta(minutes=30)) for _ in range(2)])
+        db.add(PlayEvent(song_id=other, played_at=hour))
+        db.add(LikedSong(user_id=fan_id, song_id=hit, liked_at=hour + timedelta(seconds=1)))
+        db.commit()
+        db.close()
+        
+        refresh_rollups(engine)
+        frm = (hour - timedelta(hours=1)).isoformat().replace("+00:00", "Z")
+        response = await client.get(f"/artist/dashboard/timeseries?granularity=hour&from={frm}", headers=artist_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["entity_type"] == "artist"
+        assert [(p["plays"], p["likes"]) for p in body["points"]] == [(2, 0), (1, 1)]
+        
+        response = await client.get(f"/artist/dashboard/timeseries?granularity=day&song_id={hit}", headers=artist_headers)
+        points = response.json()["points"]
+        assert len(points) == 31
+        assert sorted(p["plays"] for p in points if p["plays"]) == [2, 4]
+        
+        # A play committed late into an already aggregated hour is counted on the next run
+        db = TestingSessionLocal()
+        db.add(PlayEvent(song_id=other, played_at=hour - timedelta(minutes=10)))
+        db.commit()
+        db.close()
+        refresh_rollups(engine)
+        response = await client.get(
+            f"/admin/dashboard/timeseries?granularity=hour&from={frm}", headers=admin_headers
+        )
+        assert [(p["plays"], p["likes"]) for p in response.json()["points"]] == [(3, 0), (1, 1)]
+        
+        response = await client.get("/artist/dashboard/timeseries?song_id=99999", headers=artist_headers)
+        assert response.status_code == 404
+        response = await client.get(
+            "/admin/dashboard/timeseries?granularity=hour&from=2020-01-01T00:00:00", headers=admin_headers
+        )
+        assert response.status_code == 400
+
+
+class TestEarnings:
+    """Test monthly earnings statements"""
+    
+    @pytest.mark.asyncio
+    async def test_close_periods_into_statements(self, client: AsyncClient):
+        """Test rates changing mid-month, closed months, pending plays and idempotent reruns"""
+        from datetime import date, datetime, time, timedelta, timezone
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        from app.models.play_event import PlayEvent
+        from app.models.earnings import EarningsStatement
+        from app.rollups import refresh_rollups
+        from app.earnings import close_earnings_periods, next_period
+        
+        artist_id, artist_headers = create_test_user("earningsartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("earningsadmin", UserRole.ADMIN)
+        early, late = create_test_songs(artist_id, 2)
+        today = date.today()
+        month = (today.replace(day=1) - timedelta(days=40)).replace(day=1)
+        at = lambda day: datetime.combine(day, time(12), tzinfo=timezone.utc)
+        
+        for effective_from, rate in [(month, "0.5"), (month.replace(day=15), "0.25")]:
+            response = await client.post(
+                "/admin/payout-rates",
+                json={"effective_from": effective_from.isoformat(), "rate_per_play": rate},
+                headers=admin_headers
+            )
+            assert response.status_code == 201
+        
+        db = TestingSessionLocal()
+        db.add_all([PlayEvent(song_id=early, played_at=at(month.replace(day=2))) for _ in range(3)])
+        db.add_all([PlayEvent(song_id=late, played_at=at(month.replace(day=20))) for _ in range(2)])
+        db.add(PlayEvent(song_id=late, played_at=datetime.now(timezone.utc) - timedelta(minutes=1)))
+        db.commit()
+        db.close()
+        
+        refresh_rollups(engine)
+        close_earnings_periods(engine)
+        response = await client.get("/artist/dashboard/earnings", headers=artist_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["settled_plays"], data["settled_earnings"]) == (5, 2.0)
+        assert (data["pending_plays"], data["pending_earnings"]) == (1, 0.25)
+        assert (data["total_plays"], data["estimated_earnings"], data["earnings_per_play"]) == (6, 2.25, 0.25)
+        assert [s["period_start"] for s in data["statements"]] == [month.isoformat()]
+        
+        statement_id = data["statements"][0]["id"]
+        response = await client.get(f"/artist/dashboard/earnings/statements/{statement_id}", headers=artist_headers)
+        assert response.status_code == 200
+        assert [(l["song_id"], l["plays"], l["amount"]) for l in response.json()["lines"]] == [(early, 3, 1.5), (late, 2, 0.5)]
+        
+        # Closed months can no longer be repriced, and closing again rewrites nothing
+        response = await client.post(
+            "/admin/payout-rates",
+            json={"effective_from": next_period(month).isoformat(), "rate_per_play": "1"},
+            headers=admin_headers
+        )
+        assert response.status_code == 400
+        close_earnings_periods(engine)
+        db = TestingSessionLocal()
+        assert db.query(EarningsStatement).count() == 1
+        db.close()
+        
+        response = await client.get(f"/artist/dashboard/earnings/statements/{statement_id + 1}", headers=artist_headers)
+        assert response.status_code == 404
+
+
+class TestUniqueListeners:
+    """Test HyperLogLog unique-listener counts"""
+    
+    def test_sketch_estimates_and_merges(self):
+        """Test the estimate stays within a few percent and merging gives the union"""
+        from app.hll import HyperLogLog
+        
+        first, second = HyperLogLog(), HyperLogLog()
+        first.add_many(range(50_000))
+        second.add_many(range(25_000, 75_000))
+        first.add_many(range(1000))
+        assert abs(first.count() - 50_000) < 50_000 * 0.04
+        first.merge(second)
+        assert abs(first.count() - 75_000) < 75_000 * 0.04
+        assert HyperLogLog().count() == 0
+        restored = HyperLogLog.from_bytes(first.to_bytes())
+        assert restored.count() == first.count()
+        assert len(second.to_bytes()) < 8192
+    
+    @pytest.mark.asyncio
+    async def test_listeners_per_day_and_range(self, client: AsyncClient):
+        """Test daily and range counts of signed-in listeners, anonymous plays and reruns"""
+        from datetime import datetime, timedelta, timezone
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import User, UserRole
+        from app.models.play_event import PlayEvent
+        from app.rollups import refresh_rollups
+        
+        artist_id, artist_headers = create_test_user("listenersartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("listenersadmin", UserRole.ADMIN)
+        hit, other = create_test_songs(artist_id, 2)
+        now = datetime.now(timezone.utc)
+        db = TestingSessionLocal()
+        fans = [User(username=f"fan{i}", email=f"fan{i}@example.com", hashed_password="x") for i in range(300)]
+        db.add_all(fans)
+        db.flush()
+        for fan in fans:
+            db.add_all([PlayEvent(user_id=fan.id, song_id=hit, played_at=now - timedelta(minutes=1)) for _ in range(2)])
+        for fan in fans[:100]:
+            db.add(PlayEvent(user_id=fan.id, song_id=other, played_at=now - timedelta(days=1)))
+        db.add_all([PlayEvent(user_id=None, song_id=hit, played_at=now - timedelta(minutes=1)) for _ in range(5)])
+        db.commit()
+        db.close()
+        
+        refresh_rollups(engine)
+        refresh_rollups(engine)
+        frm = (now - timedelta(days=2)).isoformat().replace("+00:00", "Z")
+        response = await client.get(f"/artist/dashboard/listeners?from={frm}", headers=artist_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["entity_type"] == "artist"
+        # Estimates: a few register collisions are expected even at these sizes
+        close_to = lambda estimate, exact: abs(estimate - exact) <= exact * 0.05
+        first_day, yesterday, today = [p["listeners"] for p in body["points"]]
+        assert first_day == 0 and close_to(yesterday, 100) and close_to(today, 300)
+        assert close_to(body["unique_listeners"], 300)
+        
+        response = await client.get(f"/artist/dashboard/listeners?song_id={other}&from={frm}", headers=artist_headers)
+        assert response.json()["unique_listeners"] == yesterday
+        response = await client.get(f"/admin/dashboard/listeners?from={frm}", headers=admin_headers)
+        assert response.json()["unique_listeners"] == body["unique_listeners"]
+        response = await client.get("/artist/dashboard/listeners?song_id=99999", headers=artist_headers)
+        assert response.status_code == 404
+
+
+class TestAnalyticsExport:
+    """Test the columnar export"""
+    
+    @pytest.mark.asyncio
+    async def test_export_incremental_chunks(self, client: AsyncClient, tmp_path):
+        """Test chunked npz output, the watermark of event tables and snapshots of the catalog"""
+        import os
+        from datetime import datetime, timedelta, timezone
+        import numpy as np
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        from app.models.play_event import PlayEvent
+        from app.models.liked_song import LikedSong
+        from app.export import Exporter
+        
+        artist_id, _ = create_test_user("exportartist", UserRole.ARTIST)
+        fan_id, _ = create_test_user("exportfan", UserRole.USER)
+        songs = create_test_songs(artist_id, 3)
+        hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+        db = TestingSessionLocal()
+        db.add_all([
+            PlayEvent(user_id=fan_id if i % 2 else None, song_id=songs[i % 3], played_at=hour_ago) for i in range(5)
+        ])
+        db.add_all([LikedSong(user_id=fan_id, song_id=song_id) for song_id in songs[:2]])
+        db.commit()
+        db.close()
+        
+        exporter = Exporter(engine, str(tmp_path), chunk_rows=2, fmt="npz")
+        counts = exporter.export()
+        assert counts["play_events"] == 5 and counts["songs"] == 3 and counts["likes"] == 2
+        files = exporter.manifest["tables"]["play_events"]["files"]
+        assert [f["rows"] for f in files] == [2, 2, 1]
+        chunks = [np.load(os.path.join(tmp_path, f["path"])) for f in files]
+        assert np.concatenate([c["song_id"] for c in chunks]).tolist() == [songs[i % 3] for i in range(5)]
+        assert np.concatenate([c["user_id_null"] for c in chunks]).tolist() == [True, False, True, False, True]
+        assert chunks[0]["played_at"].dtype == np.dtype("datetime64[us]")
+        snapshot = exporter.manifest["tables"]["songs"]["files"]
+        assert np.load(os.path.join(tmp_path, snapshot[0]["path"]))["status"].tolist() == ["approved", "approved"]
+        assert "email" not in np.load(os.path.join(tmp_path, exporter.manifest["tables"]["users"]["files"][0]["path"]))
+        
+        # A second run, even from a new process, only appends the settled new plays; a play
+        # too recent to be sure every lower id has committed waits for a later run
+        db = TestingSessionLocal()
+        db.add(PlayEvent(user_id=fan_id, song_id=songs[0], played_at=hour_ago))
+        db.add(PlayEvent(user_id=fan_id, song_id=songs[1]))
+        db.query(LikedSong).filter(LikedSong.song_id == songs[0]).delete()
+        db.commit()
+        db.close()
+        exporter = Exporter(engine, str(tmp_path), chunk_rows=2, fmt="npz")
+        counts = exporter.export(["play_events", "songs", "likes"])
+        assert counts == {"play_events": 1, "songs": 3, "likes": 1}
+        assert len(exporter.manifest["tables"]["play_events"]["files"]) == 4
+        assert all(os.path.exists(os.path.join(tmp_path, f["path"])) for f in exporter.manifest["tables"]["songs"]["files"])
+        # Likes are a snapshot, so the unlike shows
+        likes = exporter.manifest["tables"]["likes"]["files"]
+        assert np.load(os.path.join(tmp_path, likes[0]["path"]))["song_id"].tolist() == [songs[1]]
+        
+        assert exporter.export(["play_events"], full=True) == {"play_events": 6}
+        assert len(os.listdir(os.path.join(tmp_path, "play_events"))) == 3
+
+
+class TestResponseCache:
+    """Test the response cache of public catalog GETs"""
+    
+    @pytest.mark.asyncio
+    async def test_cached_until_tag_invalidated(self, client: AsyncClient):
+        """Test hits, invalidation by the mutating routes, and invalidations from other workers"""
+        from tests.conftest import create_test_user, create_test_songs, TestingSessionLocal, engine
+        from app.models.user import UserRole
+        import time
+        from app.models.cache_invalidation import CacheInvalidation
+        from app.response_cache import response_cache
+        
+        artist_id, _ = create_test_user("cacheartist", UserRole.ARTIST)
+        _, admin_headers = create_test_user("cacheadmin", UserRole.ADMIN)
+        song_id, = create_test_songs(artist_id, 1)
+        
+        first = await client.get("/genres")
+        assert first.headers["X-Cache"] == "MISS"
+        second = await client.get("/genres")
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+        
+        response = await client.post("/admin/genres", json={"name": "Cachewave"}, headers=admin_headers)
+        assert response.status_code == 201
+        response = await client.get("/genres")
+        assert response.headers["X-Cache"] == "MISS"
+        assert "Cachewave" in [genre["name"] for genre in response.json()]
+        
+        # Query parameters are part of the key, whatever their order
+        await client.get(f"/songs/?artist_id={artist_id}&limit=5")
+        response = await client.get(f"/songs/?limit=5&artist_id={artist_id}")
+        assert response.headers["X-Cache"] == "HIT"
+        
+        assert (await client.get(f"/songs/{song_id}")).headers["X-Cache"] == "MISS"
+        assert (await client.get(f"/songs/{song_id}")).headers["X-Cache"] == "HIT"
+        response = await client.post(f"/admin/songs/{song_id}/reject", headers=admin_headers)
+        assert response.status_code == 200
+        assert (await client.get(f"/songs/{song_id}")).status_code == 404
+        assert (await client.get(f"/songs/?limit=5&artist_id={artist_id}")).json() == []
+        
+        # Another worker's change arrives through cache_invalidations
+        await client.get("/genres")
+        db = TestingSessionLocal()
+        db.add(CacheInvalidation(tag="genres"))
+        db.commit()
+        db.close()
+        assert (await client.get("/genres")).headers["X-Cache"] == "HIT"
+        response_cache.sync(engine)
+        assert (await client.get("/genres")).headers["X-Cache"] == "MISS"
+        
+        # A response built while one of its own tags was invalidated is not stored...
+        started_at = time.time()
+        response_cache.invalidate("genres")
+        response_cache.set("/stale?", b"[]", "application/json", ["genres"], 30, started_at)
+        assert response_cache.get("/stale?") is None
+        
+        # ...but invalidating unrelated tags does not keep it out
+        started_at = time.time()
+        response_cache.invalidate("song:999")
+        response_cache.set("/fresh?", b"[]", "application/json", ["genres"], 30, started_at)
+        assert response_cache.get("/fresh?") == (b"[]", "application/json")
+    
+    def test_shared_store_drops_responses_built_before_an_invalidation(self):
+        """Test that with a shared store, a hit is dropped once one of its tags is invalidated"""
+        import time
+        from app.response_cache import ResponseCache
+        
+        class SharedStore:
+            name = "redis"
+            
+            def __init__(self):
+                self.values = {}
+            
+            def get(self, key):
+                return self.values.get(key)
+            
+            def get_many(self, keys):
+                return [self.values.get(key) for key in keys]
+            
+            def set(self, key, value, ttl):
+                self.values[key] = value
+            
+            def delete(self, *keys):
+                for key in keys:
+                    self.values.pop(key, None)
+            
+            def stats(self):
+                return {}
+        
+        store = SharedStore()
+        writer, reader = ResponseCache(), ResponseCache()
+        writer._store = reader._store = store
+        
+        reader.set("/genres?", b"[]", "application/json", ["genres"], 30, time.time() - 1)
+        assert writer.get("/genres?") == (b"[]", "application/json")
+        writer.invalidate("song:1")
+        assert reader.get("/genres?") is not None
+        writer.invalidate("genres")
+        assert reader.get("/genres?") is None
+        assert "/genres?" not in store.values
+    
+    @pytest.mark.asyncio
+    async def test_cached_responses_keep_cors_headers(self, client: AsyncClient):
+        """Test that hits get the CORS headers of the requesting origin"""
+        for expected in ("MISS", "HIT"):
+            response = await client.get("/genres", headers={"Origin": "http://localhost:3000"})
+            assert response.headers["X-Cache"] == expected
+            assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+        response = await client.get("/genres", headers={"Origin": "http://localhost:8080"})
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.headers["access-control-allow-origin"] == "http://localhost:8080"